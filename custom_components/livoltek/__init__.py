@@ -1,33 +1,60 @@
 """The Livoltek integration."""
 from __future__ import annotations
-from datetime import timedelta
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceInfo
 
 from .const import (
+    CONF_FLEET_MODE,
+    CONF_REQUEST_BUDGET,
+    CONF_SECUID_ID,
+    CONF_SITE_ID,
+    DEFAULT_REQUEST_BUDGET,
     DOMAIN,
     PLATFORMS,
 )
 from .coordinator import LivoltekDataUpdateCoordinator
-
-from pylivoltek.api import DefaultApi
-from pylivoltek.models import DeviceDetails
-
-from .helper import (
-    async_update_devices,
-)
-from homeassistant.util import Throttle
-
-MIN_TIME_BETWEEN_UPDATES = timedelta(minutes=15)
+from .devices import DeviceDetailsCache
+from .fleet import async_join_fleet
+from .helper import get_api_host
+from .snapshot import SnapshotStore
+from .statistics import LivoltekStatistics
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Livoltek from a config entry."""
-    coordinator = LivoltekDataUpdateCoordinator(hass, entry)
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
+    fleet_mode = entry.options.get(CONF_FLEET_MODE, False)
+    coordinator = LivoltekDataUpdateCoordinator(hass, entry, fleet_managed=fleet_mode)
+
+    # In fleet mode every refresh, the first one included, waits for the
+    # account's request budget.
+    if fleet_mode:
+        entry.async_on_unload(
+            async_join_fleet(
+                hass,
+                get_api_host(entry),
+                str(entry.data[CONF_SECUID_ID]),
+                entry.entry_id,
+                coordinator,
+                entry.options.get(CONF_REQUEST_BUDGET, DEFAULT_REQUEST_BUDGET),
+            )
+        )
 
-    await coordinator.async_config_entry_first_refresh()
+    # With a saved snapshot the entities start from it and setup does not
+    # wait for the Livoltek cloud.
+    if await coordinator.async_restore():
+        if coordinator.fleet is not None:
+            coordinator.fleet.async_poll_soon(entry.entry_id)
+        else:
+            entry.async_create_background_task(
+                hass, coordinator.async_refresh(), f"{DOMAIN} refresh {entry.entry_id}"
+            )
+    elif coordinator.fleet is not None:
+        await coordinator.fleet.async_first_refresh(entry.entry_id)
+    else:
+        await coordinator.async_config_entry_first_refresh()
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -38,40 +65,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload Livoltek config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        del hass.data[DOMAIN][entry.entry_id]
+        coordinator: LivoltekDataUpdateCoordinator = hass.data[DOMAIN].pop(
+            entry.entry_id
+        )
+        await coordinator.async_shutdown()
     return unload_ok
 
 
-class LivoltekInverterDevice:
-    """Representation of a Livoltek Inverter Device."""
-
-    def __init__(
-        self, api: DefaultApi, device: DeviceDetails, hass: HomeAssistant
-    ) -> None:
-        """Initialize the inverter device."""
-        self._api = api
-        self._device = device
-        self._hass = hass
-
-    @Throttle(MIN_TIME_BETWEEN_UPDATES)
-    async def async_update(self) -> None:
-        """Retrieve latest state."""
-        await async_update_devices(self._api, self._hass)
-
-    @property
-    def device(self) -> DeviceDetails:
-        """Return the device."""
-        return self._device
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return a device description for device registry."""
-
-        return DeviceInfo(
-            identifiers={(DOMAIN, self.device.id)},
-            manufacturer=self.device.device_manufacturer,
-            name=self.device.inverter_sn,
-            model=self.device.product_type,
-            sw_version=self.device.firmware_version,
-            serial_number=self.device.inverter_sn,
-        )
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete everything stored for a removed entry."""
+    await DeviceDetailsCache(hass, entry.entry_id).async_remove()
+    await SnapshotStore(hass, entry.entry_id).async_remove()
+    await LivoltekStatistics(
+        hass, entry.entry_id, str(entry.data[CONF_SITE_ID])
+    ).async_remove()
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
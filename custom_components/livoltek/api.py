@@ -0,0 +1,457 @@
+"""Asynchronous client for the Livoltek cloud API."""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextvars import ContextVar
+import math
+from time import monotonic
+from typing import Any, Protocol
+
+import aiohttp
+
+from .const import API_REQUEST_TIMEOUT, LISTING_PAGE_SIZE, MAX_CONCURRENT_REQUESTS
+from .latency import LatencyTracker
+
+# When set, the body size of every response received in the current context
+# is appended to the list, so callers can measure what a fetch transferred.
+response_sizes: ContextVar[list[int] | None] = ContextVar(
+    "livoltek_response_sizes", default=None
+)
+
+
+class LivoltekError(Exception):
+    """Base exception for Livoltek API errors."""
+
+
+class LivoltekConnectionError(LivoltekError):
+    """Raised when the Livoltek API cannot be reached or answers badly."""
+
+
+class LivoltekNotFoundError(LivoltekConnectionError):
+    """Raised when the Livoltek API has no such resource, answering HTTP 404."""
+
+
+class LivoltekAuthenticationError(LivoltekError):
+    """Raised when the Livoltek API rejects the credentials or token."""
+
+
+class LivoltekCircuitOpenError(LivoltekConnectionError):
+    """Raised instead of sending a request to a server that keeps failing."""
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        """Initialize the error with the seconds left until the next attempt."""
+        super().__init__(f"{host} is unavailable, next attempt in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class TokenProvider(Protocol):
+    """Source of access tokens shared between clients."""
+
+    async def async_get_token(self) -> str:
+        """Return a usable access token."""
+
+    def invalidate(self, token: str | None) -> None:
+        """Forget a token the server rejected."""
+
+
+class RequestLimiter(Protocol):
+    """Budget of requests shared between clients."""
+
+    async def async_acquire(self, requests: int) -> None:
+        """Wait until ``requests`` requests may be sent, then spend them."""
+
+
+class CircuitBreaker(Protocol):
+    """Gate in front of a server, shared between clients."""
+
+    @property
+    def is_open(self) -> bool:
+        """Return whether a request sent now would be refused."""
+
+    def before_request(self) -> None:
+        """Raise LivoltekCircuitOpenError if no request may be sent now."""
+
+    def record_success(self) -> None:
+        """Note that the server answered."""
+
+    def record_failure(self) -> None:
+        """Note that the server could not be reached or failed."""
+
+    def release(self) -> None:
+        """Note that a request was cancelled before it finished."""
+
+
+class LivoltekClient:
+    """Client for the endpoints described in openapi.yaml.
+
+    Requests go through the aiohttp session handed in by the caller, which in
+    Home Assistant is the shared, pooled client session. When a token provider
+    is given, the client asks it for a token before each request. When a
+    circuit breaker is given, every request is reported to it and none are
+    sent while it is open. When a request limiter is given, every request,
+    logins and hedged copies included, waits for it before being sent.
+
+    GET timeouts follow the observed latency of each endpoint. With
+    ``hedge`` set, a GET still running past its endpoint's p95 is sent a
+    second time and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        host: str,
+        token: str | None = None,
+        request_timeout: float = API_REQUEST_TIMEOUT,
+        *,
+        token_provider: TokenProvider | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        request_limiter: RequestLimiter | None = None,
+        hedge: bool = False,
+    ) -> None:
+        """Initialize the client."""
+        self._session = session
+        self.host = host.rstrip("/")
+        self.token = token
+        self._timeout = aiohttp.ClientTimeout(total=request_timeout)
+        self._token_provider = token_provider
+        self.circuit_breaker = circuit_breaker
+        self.request_limiter = request_limiter
+        self.hedge = hedge
+        self.latency: defaultdict[str, LatencyTracker] = defaultdict(LatencyTracker)
+        self.hedged_requests = 0
+
+    @property
+    def token_provider(self) -> TokenProvider | None:
+        """Return the source of the client's tokens, if there is one."""
+        return self._token_provider
+
+    async def async_ensure_token(self) -> str | None:
+        """Fetch the current token from the provider, if there is one."""
+        if self._token_provider is not None:
+            self.token = await self._token_provider.async_get_token()
+        return self.token
+
+    def close(self) -> None:
+        """Forget the cached token; the shared session is left open."""
+        self.token = None
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: dict[str, Any] | None = None,
+        json: dict[str, Any] | None = None,
+        authenticated: bool = True,
+        timeout: float | None = None,
+    ) -> dict[str, Any]:
+        """Perform a request and return the decoded JSON envelope."""
+        headers = {"Accept": "application/json"}
+        if authenticated and self.token:
+            headers["Authorization"] = self.token
+
+        if self.request_limiter is not None:
+            await self.request_limiter.async_acquire(1)
+
+        breaker = self.circuit_breaker
+        if breaker is not None:
+            breaker.before_request()
+
+        # Any answer short of a server error shows the server is up.
+        answered = cancelled = False
+        try:
+            async with self._session.request(
+                method,
+                f"{self.host}{path}",
+                params=params,
+                json=json,
+                headers=headers,
+                timeout=(
+                    self._timeout
+                    if timeout is None
+                    else aiohttp.ClientTimeout(total=timeout)
+                ),
+            ) as resp:
+                answered = resp.status < 500
+                if resp.status in (401, 403):
+                    raise LivoltekAuthenticationError(
+                        f"{path} returned HTTP {resp.status}"
+                    )
+                if resp.status == 404:
+                    raise LivoltekNotFoundError(f"{path} returned HTTP 404")
+                resp.raise_for_status()
+                body = await resp.read()
+                if (sizes := response_sizes.get()) is not None:
+                    sizes.append(len(body))
+                payload = await resp.json(content_type=None)
+        except aiohttp.ClientResponseError as err:
+            # The error's own text has the full URL, user token included.
+            raise LivoltekConnectionError(
+                f"{path} returned HTTP {err.status}"
+            ) from err
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise LivoltekConnectionError(f"Error requesting {path}: {err}") from err
+        except ValueError as err:
+            raise LivoltekConnectionError(f"Invalid JSON from {path}") from err
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            if breaker is not None:
+                if answered:
+                    breaker.record_success()
+                elif cancelled:
+                    breaker.release()
+                else:
+                    breaker.record_failure()
+
+        if not isinstance(payload, dict):
+            raise LivoltekConnectionError(f"Unexpected response from {path}")
+
+        return payload
+
+    async def _get(
+        self, endpoint: str, path: str, user_token: str, **params: Any
+    ) -> dict[str, Any]:
+        """GET an authenticated endpoint and return the whole envelope.
+
+        ``endpoint`` names the latency tracker the request is timed with.
+        """
+        await self.async_ensure_token()
+        params = {"userToken": user_token, **params}
+
+        try:
+            payload = await self._hedged_get(endpoint, path, params)
+        except LivoltekAuthenticationError:
+            if self._token_provider is None:
+                raise
+            # The token was revoked early; log in once more and retry.
+            self._token_provider.invalidate(self.token)
+            await self.async_ensure_token()
+            payload = await self._timed_get(endpoint, path, params)
+
+        return payload
+
+    async def _timed_get(
+        self, endpoint: str, path: str, params: dict[str, Any]
+    ) -> dict[str, Any]:
+        """GET with the timeout of the endpoint and record how long it took."""
+        tracker = self.latency[endpoint]
+        timeout = tracker.timeout()
+        start = monotonic()
+        try:
+            payload = await self._request("GET", path, params=params, timeout=timeout)
+        except LivoltekConnectionError as err:
+            if isinstance(err.__cause__, asyncio.TimeoutError):
+                tracker.add(timeout)
+            raise
+        tracker.add(monotonic() - start)
+        return payload
+
+    async def _hedged_get(
+        self, endpoint: str, path: str, params: dict[str, Any]
+    ) -> dict[str, Any]:
+        """GET, sending a second request if the first is slower than usual."""
+        delay = self.latency[endpoint].hedge_delay()
+        if not self.hedge or delay is None:
+            return await self._timed_get(endpoint, path, params)
+
+        first = asyncio.create_task(self._timed_get(endpoint, path, params))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged_requests += 1
+                tasks.append(
+                    asyncio.create_task(self._timed_get(endpoint, path, params))
+                )
+
+            for count, next_done in enumerate(asyncio.as_completed(tasks), 1):
+                try:
+                    return await next_done
+                except LivoltekConnectionError:
+                    # A failed request still leaves the other one to wait for.
+                    if count == len(tasks):
+                        raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get_data(
+        self, endpoint: str, path: str, user_token: str, **params: Any
+    ) -> Any:
+        """GET an authenticated endpoint and return its ``data`` member."""
+        return (await self._get(endpoint, path, user_token, **params)).get("data")
+
+    async def async_login(self, secuid: str, api_key: str) -> str:
+        """Log in and remember the returned token."""
+        payload = await self._request(
+            "POST",
+            "/hess/api/login",
+            json={"secuid": secuid, "key": api_key},
+            authenticated=False,
+        )
+
+        if payload.get("message") != "SUCCESS":
+            raise LivoltekAuthenticationError(payload.get("message") or "login_failed")
+
+        token = payload.get("data")
+        if isinstance(token, dict):
+            token = token.get("data")
+
+        self.token = token or ""
+        return self.token
+
+    async def async_get_sites(
+        self, user_token: str, page: int = 1, size: int = 10
+    ) -> dict[str, Any]:
+        """Return one page of the user's sites as ``{"count", "list"}``."""
+        return (
+            await self._get_data(
+                "userSites",
+                "/hess/api/userSites/list",
+                user_token,
+                page=page,
+                size=size,
+            )
+            or {}
+        )
+
+    def async_iter_sites(
+        self, user_token: str, size: int = LISTING_PAGE_SIZE
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Yield every site of the user, fetching all pages."""
+        return _async_iter_pages(
+            lambda page: self.async_get_sites(user_token, page, size), size
+        )
+
+    async def async_get_site_overview(
+        self, user_token: str, site_id: str
+    ) -> dict[str, Any]:
+        """Return the generation overview of a site."""
+        return await self._get_data(
+            "overview", f"/hess/api/site/{site_id}/overview", user_token
+        )
+
+    async def async_get_cur_power_flow(
+        self, user_token: str, site_id: str
+    ) -> dict[str, Any]:
+        """Return the current power flow of a site."""
+        return await self._get_data(
+            "curPowerflow", f"/hess/api/site/{site_id}/curPowerflow", user_token
+        )
+
+    async def async_get_device_list(
+        self, user_token: str, site_id: str, page: int = 1, size: int = 10
+    ) -> dict[str, Any]:
+        """Return one page of a site's devices as ``{"count", "list"}``."""
+        return (
+            await self._get_data(
+                "deviceList",
+                f"/hess/api/device/{site_id}/list",
+                user_token,
+                page=page,
+                size=size,
+            )
+            or {}
+        )
+
+    def async_iter_device_list(
+        self, user_token: str, site_id: str, size: int = LISTING_PAGE_SIZE
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Yield every device of a site, fetching all pages."""
+        return _async_iter_pages(
+            lambda page: self.async_get_device_list(user_token, site_id, page, size),
+            size,
+        )
+
+    async def async_get_device_details(
+        self, user_token: str, site_id: str, serial_number: str
+    ) -> dict[str, Any]:
+        """Return the details of a single device."""
+        return await self._get_data(
+            "details", f"/hess/api/device/{site_id}/{serial_number}/details", user_token
+        )
+
+    async def async_get_device_generation(
+        self, user_token: str, device_id: str
+    ) -> dict[str, Any]:
+        """Return the lifetime generation counters of a device.
+
+        The counters are documented at the top level of the response, not in
+        ``data``; both layouts are accepted.
+        """
+        payload = await self._get(
+            "realElectricity",
+            f"/hess/api/device/{device_id}/realElectricity",
+            user_token,
+        )
+        data = payload.get("data")
+        return data if isinstance(data, dict) else payload
+
+    async def async_get_energy_storage(
+        self, user_token: str, site_id: str
+    ) -> dict[str, Any] | None:
+        """Return the battery status and history of a site."""
+        return await self._get_data("ESS", f"/hess/api/site/{site_id}/ESS", user_token)
+
+    async def async_get_recent_grid(
+        self, user_token: str, site_id: str
+    ) -> list[dict[str, Any]]:
+        """Return the recent daily grid import/export totals."""
+        return (
+            await self._get_data(
+                "reissueUtilityEnergy",
+                f"/hess/api/site/{site_id}/reissueUtilityEnergy",
+                user_token,
+            )
+            or []
+        )
+
+    async def async_get_recent_solar(
+        self, user_token: str, site_id: str
+    ) -> list[dict[str, Any]]:
+        """Return the recent daily solar generation totals."""
+        return (
+            await self._get_data(
+                "reissueSolarEnergy",
+                f"/hess/api/site/{site_id}/reissueSolarEnergy",
+                user_token,
+            )
+            or []
+        )
+
+
+async def _async_iter_pages(
+    get_page: Callable[[int], Awaitable[dict[str, Any]]], size: int
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield the items of a paged ``{"count", "list"}`` listing.
+
+    The first page gives the total count. The remaining pages are requested
+    concurrently and their items are yielded in the order the pages arrive.
+    """
+    first = await get_page(1)
+    for item in first.get("list") or []:
+        yield item
+
+    try:
+        pages = math.ceil(int(first.get("count") or 0) / size)
+    except (TypeError, ValueError):
+        pages = 1
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def _limited(page: int) -> dict[str, Any]:
+        async with semaphore:
+            return await get_page(page)
+
+    tasks = [asyncio.create_task(_limited(page)) for page in range(2, pages + 1)]
+    try:
+        for next_page in asyncio.as_completed(tasks):
+            for item in (await next_page).get("list") or []:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,119 @@
+"""Account-scoped access token handling for the Livoltek integration."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import time
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .api import CircuitBreaker, LivoltekClient, RequestLimiter
+from .breaker import async_get_circuit_breaker
+from .const import DATA_TOKEN_BROKERS, LOGGER, TOKEN_REFRESH_MARGIN
+
+
+def decode_token_expiry(token: str | None) -> float | None:
+    """Return the ``exp`` claim of a JWT as a timestamp, without verifying it."""
+    if not token:
+        return None
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload))["exp"]
+        return float(exp)
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class LivoltekTokenBroker:
+    """Hand out one access token to every user of a Livoltek account.
+
+    Config entries for different sites of the same account, and the config
+    flow, all ask the broker for a token. Concurrent callers wait for a single
+    login, and the token is reused until it is close to its expiry.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        host: str,
+        secuid: str,
+        api_key: str,
+        circuit_breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """Initialize the broker."""
+        self._session = session
+        self.host = host
+        self.secuid = secuid
+        self.api_key = api_key
+        self._circuit_breaker = circuit_breaker
+        # The request budget of the account's fleet, while it has one.
+        self.request_limiter: RequestLimiter | None = None
+        self._lock = asyncio.Lock()
+        self.token: str | None = None
+        self.token_expires_at: float | None = None
+        self.token_obtained_at: float | None = None
+
+    @property
+    def token_valid(self) -> bool:
+        """Return whether the cached token can be handed out as is."""
+        if not self.token:
+            return False
+        if self.token_expires_at is None:
+            return True
+        return self.token_expires_at - time.time() > TOKEN_REFRESH_MARGIN
+
+    async def async_get_token(self) -> str:
+        """Return a usable token, logging in at most once for all callers."""
+        if self.token_valid:
+            return self.token
+
+        async with self._lock:
+            if not self.token_valid:
+                LOGGER.debug("Logging in to Livoltek account %s", self.secuid)
+                client = LivoltekClient(
+                    self._session,
+                    self.host,
+                    circuit_breaker=self._circuit_breaker,
+                    request_limiter=self.request_limiter,
+                )
+                token = await client.async_login(self.secuid, self.api_key)
+                self.token = token
+                self.token_expires_at = decode_token_expiry(token)
+                self.token_obtained_at = time.time()
+
+        return self.token
+
+    @callback
+    def invalidate(self, token: str | None) -> None:
+        """Drop the cached token if it is the one the server just rejected."""
+        if token == self.token:
+            self.token = None
+            self.token_expires_at = None
+
+
+@callback
+def async_get_token_broker(
+    hass: HomeAssistant, host: str, secuid: str, api_key: str
+) -> LivoltekTokenBroker:
+    """Return the shared token broker for a host and secuid."""
+    brokers: dict[tuple[str, str], LivoltekTokenBroker] = hass.data.setdefault(
+        DATA_TOKEN_BROKERS, {}
+    )
+    key = (host, secuid)
+
+    broker = brokers.get(key)
+    if broker is None or broker.api_key != api_key:
+        broker = brokers[key] = LivoltekTokenBroker(
+            async_get_clientsession(hass),
+            host,
+            secuid,
+            api_key,
+            async_get_circuit_breaker(hass, host),
+        )
+
+    return broker
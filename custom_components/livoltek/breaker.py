@@ -0,0 +1,127 @@
+"""Per-server circuit breaker for the Livoltek cloud API."""
+from __future__ import annotations
+
+import random
+from time import monotonic
+
+from homeassistant.core import HomeAssistant, callback
+
+from .api import LivoltekCircuitOpenError
+from .const import (
+    CIRCUIT_BASE_BACKOFF,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_MAX_BACKOFF,
+    DATA_CIRCUIT_BREAKERS,
+    LOGGER,
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class LivoltekCircuitBreaker:
+    """Stop sending requests to a server that keeps failing.
+
+    After ``threshold`` consecutive failures the circuit opens and requests
+    fail at once. When the backoff has passed, a single probe request is let
+    through: its success closes the circuit, its failure opens it again for
+    twice as long. The backoff is jittered so clients sharing a server do
+    not probe it in step.
+
+    Only transport errors and server errors count as failures. An answer
+    such as a rejected token shows the server is up, and is a success.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        base_backoff: float = CIRCUIT_BASE_BACKOFF,
+        max_backoff: float = CIRCUIT_MAX_BACKOFF,
+    ) -> None:
+        """Initialize a closed circuit."""
+        self.host = host
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """Return whether a request sent now would be refused."""
+        if self.state == STATE_CLOSED:
+            return False
+        if self.state == STATE_HALF_OPEN:
+            return self._probing
+        return monotonic() < self.retry_at
+
+    def before_request(self) -> None:
+        """Let a request through, or raise LivoltekCircuitOpenError.
+
+        Once the backoff has passed, the first caller becomes the probe and
+        everyone else is refused until it finishes.
+        """
+        if self.state == STATE_CLOSED:
+            return
+        now = monotonic()
+        if self._probing or now < self.retry_at:
+            raise LivoltekCircuitOpenError(self.host, max(self.retry_at - now, 0.0))
+        self.state = STATE_HALF_OPEN
+        self._probing = True
+
+    def record_success(self) -> None:
+        """Close the circuit after the server answered."""
+        if self.state != STATE_CLOSED:
+            LOGGER.info("Livoltek API at %s is reachable again", self.host)
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the circuit when needed.
+
+        The circuit opens when the threshold is reached while closed, or when
+        the probe fails. Requests sent before it opened that fail while it is
+        open do not extend the backoff.
+        """
+        if self.state == STATE_OPEN:
+            return
+        self.failures += 1
+        if self.state == STATE_CLOSED and self.failures < self.threshold:
+            return
+
+        self.trips += 1
+        backoff = min(self.base_backoff * 2 ** (self.trips - 1), self.max_backoff)
+        backoff = random.uniform(backoff / 2, backoff)
+        self.state = STATE_OPEN
+        self.retry_at = monotonic() + backoff
+        self._probing = False
+        LOGGER.warning(
+            "Livoltek API at %s failed %s times in a row, pausing requests for %.0fs",
+            self.host,
+            self.failures,
+            backoff,
+        )
+
+    def release(self) -> None:
+        """Let another request probe after this one was cancelled."""
+        self._probing = False
+
+
+@callback
+def async_get_circuit_breaker(
+    hass: HomeAssistant, host: str
+) -> LivoltekCircuitBreaker:
+    """Return the circuit breaker shared by every client of a server."""
+    breakers: dict[str, LivoltekCircuitBreaker] = hass.data.setdefault(
+        DATA_CIRCUIT_BREAKERS, {}
+    )
+    if (breaker := breakers.get(host)) is None:
+        breaker = breakers[host] = LivoltekCircuitBreaker(host)
+    return breaker
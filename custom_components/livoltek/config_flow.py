@@ -1,27 +1,27 @@
 """Config flow to configure the Livoltek integration."""
 from __future__ import annotations
 
-import asyncio
 from collections.abc import Mapping
 from typing import Any
 
-from pylivoltek import ApiClient, Configuration
-from pylivoltek.api import DefaultApi
-from pylivoltek.models import Site
-from pylivoltek.rest import ApiException
-
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigEntry, ConfigFlow
+from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
 from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.selector import (
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
     SelectSelector,
     SelectSelectorConfig,
     SelectSelectorMode,
     SelectOptionDict,
 )
 
+from .api import LivoltekClient, LivoltekError
 from .helper import async_get_login_token
 
 from homeassistant.exceptions import (
@@ -29,20 +29,30 @@ from homeassistant.exceptions import (
 )
 
 from .const import (
-    API_REQUEST_TIMEOUT,
+    CONF_FLEET_MODE,
+    CONF_HEDGE_REQUESTS,
+    CONF_MAX_STALENESS,
+    CONF_REQUEST_BUDGET,
     CONF_SECUID_ID,
     CONF_EMEA_ID,
     CONF_SITE_ID,
+    CONF_SITE_TIMEZONE,
     CONF_USERTOKEN_ID,
     DOMAIN,
     LOGGER,
     LIVOLTEK_EMEA_SERVER,
     LIVOLTEK_GLOBAL_SERVER,
+    DEFAULT_MAX_STALENESS,
     DEFAULT_NAME,
+    DEFAULT_REQUEST_BUDGET,
+    MAX_MAX_STALENESS,
+    MAX_REQUEST_BUDGET,
 )
 
 
-async def validate_input(secuid: str, api_key: str, emea: bool) -> str:
+async def validate_input(
+    hass: HomeAssistant, secuid: str, api_key: str, emea: bool
+) -> str:
     """Try using the give system id & api key against the Livoltek API."""
 
     if emea:
@@ -53,7 +63,7 @@ async def validate_input(secuid: str, api_key: str, emea: bool) -> str:
     api_key = api_key.replace("\\r", "\r")
     api_key = api_key.replace("\\n", "\n")
 
-    token = await async_get_login_token(host, api_key, secuid)
+    token = await async_get_login_token(hass, host, api_key, secuid)
 
     # Check token is not empty
     if not token:
@@ -72,37 +82,24 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
 
     data: dict[str, Any] | None
     access_token: str
+    sites: list[dict[str, Any]]
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> LivoltekOptionsFlow:
+        """Get the options flow for this handler."""
+        return LivoltekOptionsFlow()
 
     async def get_sites(
         self, host: str, access_token: str, user_token: str
-    ) -> list[Site]:
-        """Get the login token for the Livoltek API."""
-        config = Configuration()
-        config.host = host
-
-        api_client = ApiClient(config)
-        api_client.set_default_header("Authorization", access_token)
-        api = DefaultApi(api_client)
-
-        loop = asyncio.get_running_loop()
-        user_sites = await loop.run_in_executor(
-            None,
-            lambda: api.hess_api_user_sites_list_get(
-                user_token,
-                1,
-                10,
-                _preload_content=True,
-                _request_timeout=API_REQUEST_TIMEOUT,
-            ),
-        )
-        if not user_sites:
-            LOGGER.warning("Livoltek API returned empty response for sites list")
-            return []
-        if user_sites.data is None:
-            LOGGER.warning("Livoltek API returned empty site data")
-            return []
+    ) -> list[dict[str, Any]]:
+        """Get every site the user token can see."""
+        client = LivoltekClient(async_get_clientsession(self.hass), host, access_token)
+        sites = [site async for site in client.async_iter_sites(user_token)]
+        if not sites:
+            LOGGER.warning("Livoltek API returned no sites")
 
-        return user_sites.data.list or []
+        return sites
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
@@ -113,13 +110,14 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             try:
                 self.access_token = await validate_input(
+                    self.hass,
                     api_key=user_input[CONF_API_KEY],
                     secuid=user_input[CONF_SECUID_ID],
                     emea=user_input[CONF_EMEA_ID],
                 )
             except ConfigEntryAuthFailed:
                 errors["base"] = "invalid_auth"
-            except ApiException:
+            except LivoltekError:
                 LOGGER.exception("Cannot connect to Livoltek")
                 errors["base"] = "cannot_connect"
             else:
@@ -164,12 +162,17 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
                     raise ConfigEntryAuthFailed("empty_site")
             except ConfigEntryAuthFailed:
                 errors["base"] = "invalid_auth"
-            except ApiException:
-                LOGGER.exception("Cannot connect to Livoltek")
-                errors["base"] = "cannot_connect"
             else:
                 if not errors:
                     self.data[CONF_SITE_ID] = user_input[CONF_SITE_ID]
+                    self.data[CONF_SITE_TIMEZONE] = next(
+                        (
+                            site.get("timezone")
+                            for site in self.sites
+                            if str(site["powerStationId"]) == self.data[CONF_SITE_ID]
+                        ),
+                        None,
+                    )
 
                     await self.async_set_unique_id(str(self.data[CONF_SITE_ID]))
                     self._abort_if_unique_id_configured()
@@ -183,7 +186,7 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
             else:
                 host = LIVOLTEK_GLOBAL_SERVER
 
-            sites = await self.get_sites(
+            self.sites = await self.get_sites(
                 host, self.access_token, self.data[CONF_USERTOKEN_ID]
             )
             user_input = {}
@@ -196,7 +199,7 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
                         CONF_SITE_ID, default=user_input.get(CONF_SITE_ID, "")
                     ): SelectSelector(
                         SelectSelectorConfig(
-                            options=(self.get_site_list(sites)),
+                            options=(self.get_site_list(self.sites)),
                             mode=SelectSelectorMode.DROPDOWN,
                         ),
                     ),
@@ -207,7 +210,7 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
 
     def get_site_list(
         self,
-        site_results: list[Site],
+        site_results: list[dict[str, Any]],
     ) -> list[SelectOptionDict]:
         """Return a set of nearby sensors as SelectOptionDict objects."""
 
@@ -235,13 +238,14 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
         if user_input is not None and self.reauth_entry:
             try:
                 await validate_input(
+                    self.hass,
                     secuid=user_input[CONF_SECUID_ID],
                     api_key=user_input[CONF_API_KEY],
                     emea=user_input[CONF_EMEA_ID],
                 )
             except ConfigEntryAuthFailed:
                 errors["base"] = "invalid_auth"
-            except ApiException:
+            except LivoltekError:
                 errors["base"] = "cannot_connect"
             else:
                 self.hass.config_entries.async_update_entry(
@@ -264,3 +268,66 @@ class LivoltekFlowHandler(ConfigFlow, domain=DOMAIN):
             data_schema=vol.Schema({vol.Required(CONF_API_KEY): str}),
             errors=errors,
         )
+
+
+class LivoltekOptionsFlow(OptionsFlow):
+    """Handle Livoltek options."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the Livoltek options."""
+        if user_input is not None:
+            return self.async_create_entry(
+                data={
+                    CONF_FLEET_MODE: user_input[CONF_FLEET_MODE],
+                    CONF_REQUEST_BUDGET: int(user_input[CONF_REQUEST_BUDGET]),
+                    CONF_MAX_STALENESS: int(user_input[CONF_MAX_STALENESS]),
+                    CONF_HEDGE_REQUESTS: user_input[CONF_HEDGE_REQUESTS],
+                }
+            )
+
+        options = self.config_entry.options
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_FLEET_MODE, default=options.get(CONF_FLEET_MODE, False)
+                    ): bool,
+                    vol.Required(
+                        CONF_REQUEST_BUDGET,
+                        default=options.get(
+                            CONF_REQUEST_BUDGET, DEFAULT_REQUEST_BUDGET
+                        ),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=1,
+                            max=MAX_REQUEST_BUDGET,
+                            step=1,
+                            mode=NumberSelectorMode.BOX,
+                            unit_of_measurement="requests/min",
+                        )
+                    ),
+                    vol.Required(
+                        CONF_MAX_STALENESS,
+                        default=options.get(
+                            CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS
+                        ),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=DEFAULT_MAX_STALENESS,
+                            max=MAX_MAX_STALENESS,
+                            step=1,
+                            mode=NumberSelectorMode.BOX,
+                            unit_of_measurement="min",
+                        )
+                    ),
+                    vol.Required(
+                        CONF_HEDGE_REQUESTS,
+                        default=options.get(CONF_HEDGE_REQUESTS, False),
+                    ): bool,
+                }
+            ),
+        )
@@ -10,6 +10,8 @@ from homeassistant.const import Platform
 DOMAIN: Final = "livoltek"
 PLATFORMS = [Platform.SENSOR]
 ATTRIBUTION = "Data provided by Livoltek"
+# State attribute flagging values restored from before a restart.
+ATTR_RESTORED_SNAPSHOT = "restored_snapshot"
 
 LOGGER = logging.getLogger(__package__)
 SCAN_INTERVAL = timedelta(minutes=2, seconds=30)
@@ -19,11 +21,67 @@ CONF_USERTOKEN_ID = "usertoken_id"
 CONF_SECUID_ID = "secuid_id"
 CONF_EMEA_ID = "emea_id"
 CONF_SITE_ID = "site_id"
+# Timezone of the site from the site listing, saved when the site is chosen.
+CONF_SITE_TIMEZONE = "site_timezone"
+CONF_FLEET_MODE = "fleet_mode"
+CONF_REQUEST_BUDGET = "request_budget"
+CONF_MAX_STALENESS = "max_staleness"
+CONF_HEDGE_REQUESTS = "hedge_requests"
 
 DATA_ACCESS_TOKEN = "access_token"
+DATA_TOKEN_BROKERS = f"{DOMAIN}_token_brokers"
+DATA_FLEETS = f"{DOMAIN}_fleets"
+DATA_CIRCUIT_BREAKERS = f"{DOMAIN}_circuit_breakers"
+# Refresh the access token this many seconds before its JWT expiry.
+TOKEN_REFRESH_MARGIN = 300
+
+ENDPOINT_SITE = "site"
+ENDPOINT_DEVICES = "devices"
+ENDPOINT_POWER_FLOW = "power_flow"
+ENDPOINT_ENERGY_STORAGE = "energy_storage"
+ENDPOINT_RECENT_GRID = "recent_grid"
+ENDPOINT_RECENT_SOLAR = "recent_solar"
+ENDPOINT_DEVICE_GENERATION = "device_generation"
+# Endpoints whose results decide which entities the platforms create: the
+# site sensors, the inverters and the name of the site's device.
+SETUP_ENDPOINTS = frozenset(
+    {
+        ENDPOINT_SITE,
+        ENDPOINT_DEVICES,
+        ENDPOINT_POWER_FLOW,
+        ENDPOINT_ENERGY_STORAGE,
+        ENDPOINT_RECENT_GRID,
+        ENDPOINT_RECENT_SOLAR,
+    }
+)
 
 DEFAULT_NAME = "Livoltek"
 API_REQUEST_TIMEOUT = 20
+MAX_CONCURRENT_REQUESTS = 4
+LISTING_PAGE_SIZE = 10
+# Two waves of MAX_CONCURRENT_REQUESTS requests must fit in one cycle.
+REFRESH_DEADLINE = 2 * API_REQUEST_TIMEOUT + 5
+# Refresh cycles kept for the diagnostics download.
+REFRESH_HISTORY = 20
+# Request timeouts follow the latency of each endpoint once this many of the
+# last LATENCY_SAMPLES requests were timed: a multiple of the p99, kept
+# between MIN_REQUEST_TIMEOUT and API_REQUEST_TIMEOUT.
+LATENCY_SAMPLES = 50
+LATENCY_MIN_SAMPLES = 10
+LATENCY_TIMEOUT_FACTOR = 3
+MIN_REQUEST_TIMEOUT = 5.0
+# Requests to a server stop after this many consecutive failures, for a
+# backoff that doubles with every failed probe, from the base to the cap.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_BASE_BACKOFF = 30.0
+CIRCUIT_MAX_BACKOFF = 900.0
+# Requests per minute an account may send in fleet mode.
+DEFAULT_REQUEST_BUDGET = 30
+MAX_REQUEST_BUDGET = 600
+# Minutes every endpoint keeps its last good result while fetches fail; an
+# endpoint's own staleness budget applies when it is longer.
+DEFAULT_MAX_STALENESS = 10
+MAX_MAX_STALENESS = 1440
 
 LIVOLTEK_EMEA_SERVER = "https://api-eu.livoltek-portal.com:8081"
 LIVOLTEK_GLOBAL_SERVER = "https://api.livoltek-portal.com:8081"
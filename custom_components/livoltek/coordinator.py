@@ -1,123 +1,657 @@
 """DataUpdateCoordinator for the Livoltek integration."""
 from __future__ import annotations
+
+import asyncio
+from collections import Counter, deque
+from collections.abc import Iterable
+from dataclasses import replace
 import datetime as dt
+from datetime import timedelta
+import logging
+from time import monotonic, time
+from typing import Any
 # from pvo import Livoltek, LivoltekAuthenticationError, LivoltekNoDataError, Status
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
 from .const import (
+    CONF_MAX_STALENESS,
+    DEFAULT_MAX_STALENESS,
     DOMAIN,
+    ENDPOINT_DEVICE_GENERATION,
+    ENDPOINT_DEVICES,
+    ENDPOINT_ENERGY_STORAGE,
+    ENDPOINT_POWER_FLOW,
+    ENDPOINT_RECENT_GRID,
+    ENDPOINT_RECENT_SOLAR,
+    ENDPOINT_SITE,
     LOGGER,
+    MAX_CONCURRENT_REQUESTS,
+    REFRESH_DEADLINE,
+    REFRESH_HISTORY,
     SCAN_INTERVAL,
+    SETUP_ENDPOINTS,
     CONF_USERTOKEN_ID,
     CONF_SITE_ID,
+    CONF_SITE_TIMEZONE,
 )
 
-from requests.structures import CaseInsensitiveDict
+from .api import (
+    LivoltekAuthenticationError,
+    LivoltekCircuitOpenError,
+    LivoltekClient,
+    LivoltekError,
+    response_sizes,
+)
+from .devices import DeviceDetailsCache
 from .helper import (
-    async_get_api_client,
     async_get_site,
+    async_find_site,
+    async_get_site_timezone,
     async_get_cur_power_flow,
+    async_get_device_generations,
     async_get_device_list,
     async_get_energy_storage,
-    async_get_energy_storage_direct,
     async_get_recent_grid,
     async_get_recent_solar,
+    async_register_devices,
+    create_api_client,
+)
+from .fleet import LivoltekFleet
+from .metrics import EndpointMetrics
+from .models import (
+    DailyEnergyBuffer,
+    DeviceGeneration,
+    EnergyStorageIndex,
+    LivoltekSnapshot,
+    PowerFlow,
 )
+from .schedule import (
+    DEFAULT_ENDPOINT_POLICIES,
+    DUE_TOLERANCE,
+    EndpointState,
+    UploadCadence,
+)
+from .snapshot import SnapshotStore
+from .statistics import LivoltekStatistics
+
+
+def upstream_timestamp(payload: Any, key: str) -> float | None:
+    """Return an upstream millisecond timestamp from a payload in seconds."""
+    if not isinstance(payload, dict):
+        return None
+    try:
+        return int(payload[key]) / 1000
+    except (KeyError, TypeError, ValueError):
+        return None
 
 
-class LivoltekDataUpdateCoordinator(DataUpdateCoordinator):
+class LivoltekDataUpdateCoordinator(DataUpdateCoordinator[LivoltekSnapshot]):
     """The Livoltek Data Update Coordinator."""
 
     config_entry: ConfigEntry
     hass: HomeAssistant
-    access_token: str = None
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
-        """Initialize the Livoltek coordinator."""
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, *, fleet_managed: bool = False
+    ) -> None:
+        """Initialize the Livoltek coordinator.
+
+        A ``fleet_managed`` coordinator does not schedule its own refreshes;
+        its account's fleet calls it when ``next_refresh_delay`` has passed.
+        """
         self.livoltek = any
         self.hass = hass
+        self.client = create_api_client(hass, entry)
 
         self.site = None
-        self.devices = CaseInsensitiveDict({})
-        self.current_power_flow = None
-        self.energy_storage = None
-        self.todays_grid = None
-        self.todays_solar = None
+        self.devices = None
+        self._energy_storage_index: tuple[
+            tuple[Any, dt.tzinfo | None], EnergyStorageIndex | None
+        ] = ((None, None), None)
+        self.site_timezone: dt.tzinfo = dt_util.get_default_time_zone()
+        self._site_timezone_known = False
+        self._daily_energy: tuple[tuple[Any, ...], DailyEnergyBuffer] = (
+            (None, None, None),
+            DailyEnergyBuffer(),
+        )
+        max_staleness = timedelta(
+            minutes=entry.options.get(CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS)
+        )
+        self.endpoints = {
+            key: EndpointState(
+                replace(policy, max_age=max(policy.max_age, max_staleness))
+            )
+            for key, policy in DEFAULT_ENDPOINT_POLICIES.items()
+        }
+        self.metrics = {key: EndpointMetrics() for key in self.endpoints}
+        # The latest refresh cycles, oldest first, for diagnostics.
+        self.refresh_cycles: deque[dict[str, Any]] = deque(maxlen=REFRESH_HISTORY)
+        # Metrics change on every refresh, even when the snapshot does not.
+        self._metrics_listeners: list[CALLBACK_TYPE] = []
+        self.upload_cadence = UploadCadence()
+        self.device_cache = DeviceDetailsCache(hass, entry.entry_id)
+        self._registered_serials: frozenset[str] | None = None
+        self._device_registration: asyncio.Task | None = None
+        self.snapshot_store = SnapshotStore(hass, entry.entry_id)
+        self.statistics = LivoltekStatistics(
+            hass, entry.entry_id, str(entry.data[CONF_SITE_ID])
+        )
+        self._statistics_import: asyncio.Task | None = None
+        self._endpoint_consumers: Counter[str] = Counter()
+        self._demand_known = False
 
-        super().__init__(hass, LOGGER, name=DOMAIN, update_interval=SCAN_INTERVAL)
+        # State writes skipped because nothing an entity shows had changed.
+        self.suppressed_writes = 0
+        self.fleet_managed = fleet_managed
+        # The account's fleet, set while it drives this coordinator.
+        self.fleet: LivoltekFleet | None = None
+        self.next_refresh_delay = SCAN_INTERVAL
+
+        # Listeners are only called when the snapshot differs from the last one.
+        super().__init__(
+            hass,
+            LOGGER,
+            name=DOMAIN,
+            update_interval=None if fleet_managed else SCAN_INTERVAL,
+            always_update=False,
+        )
         self.config_entry = entry
 
-    async def _async_update_data(self):
-        """Fetch system status from Livoltek."""
-        api_result = await async_get_api_client(self.config_entry, self.access_token)
-        api = api_result[0]
-        self.access_token = api_result[1]
+    async def _async_update_data(self) -> LivoltekSnapshot:
+        """Fetch new data, then tell the metric entities about the new metrics.
 
-        site = await async_get_site(
-            api,
-            self.config_entry.data[CONF_USERTOKEN_ID],
-            self.config_entry.data[CONF_SITE_ID],
+        The metric entities are called once the refresh has been applied, so
+        they see its outcome.
+        """
+        try:
+            return await self._async_fetch_snapshot()
+        finally:
+            self.hass.loop.call_soon(self._async_update_metrics_listeners)
+
+    async def _async_fetch_snapshot(self) -> LivoltekSnapshot:
+        """Fetch the endpoints that are due and merge them with cached results."""
+        api = self.client
+        user_token = self.config_entry.data[CONF_USERTOKEN_ID]
+        site_id = self.config_entry.data[CONF_SITE_ID]
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def _device_generation(
+            api: LivoltekClient, user_token: str, site_id: str
+        ) -> dict[str, DeviceGeneration]:
+            # Wait for the device list when it is refreshed in the same cycle.
+            device_list = self.endpoints[ENDPOINT_DEVICES].data
+            if devices := tasks.get(ENDPOINT_DEVICES):
+                try:
+                    device_list = await devices
+                except (LivoltekError, TimeoutError):
+                    if device_list is None:
+                        raise
+            if not isinstance(device_list, list):
+                return {}
+            return await async_get_device_generations(
+                api,
+                user_token,
+                device_list,
+                self.endpoints[ENDPOINT_DEVICE_GENERATION].data or {},
+                self.upload_cadence.last_upload,
+            )
+
+        async def _site(
+            api: LivoltekClient, user_token: str, site_id: str
+        ) -> dict[str, Any]:
+            # Entries without a saved timezone look the site up in the listing
+            # as part of the site's fetch, which is due until that succeeds.
+            if not self._site_timezone_known:
+                await self._async_update_site_timezone()
+            return await async_get_site(api, user_token, site_id)
+
+        fetchers = {
+            ENDPOINT_SITE: _site,
+            ENDPOINT_DEVICES: async_get_device_list,
+            ENDPOINT_POWER_FLOW: async_get_cur_power_flow,
+            ENDPOINT_ENERGY_STORAGE: async_get_energy_storage,
+            ENDPOINT_RECENT_GRID: async_get_recent_grid,
+            ENDPOINT_RECENT_SOLAR: async_get_recent_solar,
+            ENDPOINT_DEVICE_GENERATION: _device_generation,
+        }
+
+        started: dict[str, float] = {}
+        elapsed: dict[str, float] = {}
+        sizes: dict[str, list[int]] = {}
+
+        in_flight = peak = 0
+
+        async def _limited(key, coro):
+            nonlocal in_flight, peak
+            async with semaphore:
+                response_sizes.set(sizes.setdefault(key, []))
+                started[key] = monotonic()
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    return await coro
+                finally:
+                    in_flight -= 1
+                    elapsed[key] = monotonic() - started[key]
+
+        cycle_started = dt_util.utcnow()
+        now = monotonic()
+        cycle_start = now
+        due = [
+            key
+            for key, state in self.endpoints.items()
+            if self._endpoint_wanted(key)
+            and (
+                state.is_due(now)
+                or (key == ENDPOINT_SITE and not self._site_timezone_known)
+            )
+        ]
+        for key in due:
+            tasks[key] = asyncio.create_task(
+                _limited(key, fetchers[key](api, user_token, site_id))
+            )
+
+        # Endpoints fail on their own: a failed one keeps its last good
+        # result until it expires and is retried while the others refresh.
+        done: set[asyncio.Task] = set()
+        try:
+            if tasks:
+                done, _ = await asyncio.wait(tasks.values(), timeout=REFRESH_DEADLINE)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        now = monotonic()
+        fetched: list[str] = []
+        failed: dict[str, BaseException] = {}
+        utcnow = dt_util.utcnow()
+        cycle: dict[str, Any] = {
+            "started": cycle_started.isoformat(),
+            "duration": now - cycle_start,
+            "peak_concurrency": peak,
+            "endpoints": {},
+        }
+        self.refresh_cycles.append(cycle)
+        for key, task in tasks.items():
+            err = (
+                task.exception()
+                if task in done
+                else TimeoutError(f"exceeded {REFRESH_DEADLINE}s")
+            )
+            latency = elapsed.get(key, now - started.get(key, now))
+            response_bytes = sum(sizes.get(key, ()))
+            self.metrics[key].record(latency, response_bytes, err, utcnow)
+            cycle["endpoints"][key] = {
+                "latency": latency,
+                "response_bytes": response_bytes,
+                "error": None if err is None else f"{type(err).__name__}: {err}",
+            }
+            if err is not None:
+                if isinstance(err, LivoltekAuthenticationError):
+                    raise ConfigEntryAuthFailed(str(err)) from err
+                if not isinstance(err, (LivoltekError, TimeoutError)):
+                    raise err
+                failed[key] = err
+                continue
+            result = task.result()
+            fetched.append(key)
+            if key == ENDPOINT_POWER_FLOW:
+                self.upload_cadence.observe(upstream_timestamp(result, "timestamp"))
+                self.endpoints[key].record(
+                    result,
+                    now,
+                    self.upload_cadence.next_delay(
+                        time(), SCAN_INTERVAL.total_seconds()
+                    ),
+                )
+                continue
+            if key == ENDPOINT_SITE:
+                self.upload_cadence.observe(
+                    upstream_timestamp(result, "updateTime"), polled=False
+                )
+            self.endpoints[key].record(result, now)
+
+        for key, err in failed.items():
+            state = self.endpoints[key]
+            # While the server is paused, wait for the breaker's next probe.
+            state.record_failure(
+                err,
+                now,
+                err.retry_in if isinstance(err, LivoltekCircuitOpenError) else None,
+            )
+            LOGGER.log(
+                logging.WARNING if state.failures == 1 else logging.DEBUG,
+                "Error fetching %s for site %s, keeping its last data: %s",
+                key,
+                site_id,
+                state.error,
+            )
+        for state in self.endpoints.values():
+            state.expire(now)
+
+        if failed and not fetched and not any(
+            self.endpoints[key].data is not None
+            for key in self.endpoints
+            if self._endpoint_wanted(key)
+        ):
+            raise UpdateFailed(
+                f"Error communicating with Livoltek for site {site_id}: "
+                + "; ".join(f"{key}: {self.endpoints[key].error}" for key in failed)
+            )
+
+        # The platforms create their entities from the first snapshot, so it
+        # waits until every endpoint they are created from has a result.
+        if self.data is None and (
+            missing := [
+                key
+                for key in sorted(SETUP_ENDPOINTS)
+                if self.endpoints[key].fetched_at is None
+            ]
+        ):
+            raise UpdateFailed(
+                f"Error communicating with Livoltek for site {site_id}: "
+                + "; ".join(
+                    f"{key}: {self.endpoints[key].error or 'not fetched'}"
+                    for key in missing
+                )
+            )
+
+        if ENDPOINT_DEVICES in fetched:
+            self._async_schedule_device_registration(
+                self.endpoints[ENDPOINT_DEVICES].data
+            )
+
+        snapshot = self._build_snapshot()
+        self._async_schedule_statistics_import(fetched, snapshot)
+        next_due = [
+            state.next_due
+            for key, state in self.endpoints.items()
+            if self._endpoint_wanted(key)
+        ]
+        self.next_refresh_delay = (
+            timedelta(seconds=max(min(next_due) - now, DUE_TOLERANCE))
+            if next_due
+            else SCAN_INTERVAL
         )
+        if not self.fleet_managed:
+            self.update_interval = self.next_refresh_delay
+        LOGGER.debug("Fetched %s for site %s", ", ".join(fetched), site_id)
+        if snapshot != self.data or not self.last_update_success:
+            self.snapshot_store.async_save(
+                time(),
+                {
+                    key: state.data
+                    for key, state in self.endpoints.items()
+                    if (age := state.age(now)) is not None
+                    and age <= state.policy.max_age.total_seconds()
+                },
+            )
+        return snapshot
+
+    async def async_restore(self) -> bool:
+        """Build a snapshot from the results saved before the last shutdown.
+
+        Results older than their endpoint's staleness budget are skipped.
+        Restored endpoints are still fetched on the next refresh. Returns
+        whether a snapshot was built, which needs every endpoint the entities
+        are created from; otherwise the first refresh must run before the
+        platforms are set up, and the restored results only stand in for the
+        endpoints that fail in it.
+        """
+        if (stored := await self.snapshot_store.async_load()) is None:
+            return False
 
-        devices = await async_get_device_list(
-            api,
-            self.config_entry.data[CONF_USERTOKEN_ID],
+        saved_at, payloads = stored
+        age = max(time() - saved_at, 0.0)
+        now = monotonic()
+        restored: set[str] = set()
+        for key, payload in payloads.items():
+            state = self.endpoints.get(key)
+            if state is None or age > state.policy.max_age.total_seconds():
+                continue
+            state.data = payload
+            state.fetched_at = now - age
+            restored.add(key)
+
+        if missing := SETUP_ENDPOINTS - restored:
+            LOGGER.debug(
+                "Not restoring site %s, the saved %s is missing or too old",
+                self.config_entry.data[CONF_SITE_ID],
+                ", ".join(sorted(missing)),
+            )
+            return False
+
+        if CONF_SITE_TIMEZONE in self.config_entry.data:
+            await self._async_update_site_timezone()
+        self.data = self._build_snapshot(restored=True)
+        LOGGER.debug(
+            "Restored %s of site %s from %.0f seconds ago",
+            ", ".join(payloads),
             self.config_entry.data[CONF_SITE_ID],
+            age,
         )
+        return True
 
-        current_power_flow = await async_get_cur_power_flow(
-            api,
-            self.config_entry.data[CONF_USERTOKEN_ID],
-            self.config_entry.data[CONF_SITE_ID],
+    async def _async_update_site_timezone(self) -> None:
+        """Set the site timezone from the site listing.
+
+        Entries created before the timezone was saved look the site up in the
+        listing once per run, trying again on the next refresh if that fails.
+        """
+        data = self.config_entry.data
+        if CONF_SITE_TIMEZONE in data:
+            name = data[CONF_SITE_TIMEZONE]
+        else:
+            try:
+                site = await async_find_site(
+                    self.client, data[CONF_USERTOKEN_ID], str(data[CONF_SITE_ID])
+                )
+            except LivoltekError as err:
+                LOGGER.debug(
+                    "Error looking up the timezone of site %s: %s",
+                    data[CONF_SITE_ID],
+                    err,
+                )
+                return
+            name = site.get("timezone") if site is not None else None
+        self.site_timezone = await async_get_site_timezone(name)
+        self._site_timezone_known = True
+
+    def _endpoint_wanted(self, key: str) -> bool:
+        """Return whether an endpoint has an enabled entity reading it.
+
+        Until the first entity registers, every endpoint is wanted so the
+        initial refresh has the data needed to set the platforms up. The
+        device list is always wanted, as device registration reads it, and so
+        is the site overview, which names the site and dates its last upload.
+        """
+        return (
+            not self._demand_known
+            or key in (ENDPOINT_DEVICES, ENDPOINT_SITE)
+            or self._endpoint_consumers[key] > 0
         )
 
-        energy_storage = await async_get_energy_storage(
-            api,
-            self.config_entry.data[CONF_USERTOKEN_ID],
-            self.config_entry.data[CONF_SITE_ID],
+    @callback
+    def async_add_metrics_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for new request metrics, which are recorded on every refresh.
+
+        Returns a callback that removes the listener again.
+        """
+        self._metrics_listeners.append(update_callback)
+
+        @callback
+        def _async_remove() -> None:
+            self._metrics_listeners.remove(update_callback)
+
+        return _async_remove
+
+    @callback
+    def _async_update_metrics_listeners(self) -> None:
+        """Call the metric entities after a refresh."""
+        for update_callback in list(self._metrics_listeners):
+            update_callback()
+
+    @callback
+    def async_add_endpoint_consumer(self, endpoints: Iterable[str]) -> CALLBACK_TYPE:
+        """Register an entity reading the given endpoints.
+
+        Returns a callback that unregisters it again.
+        """
+        endpoints = tuple(endpoints)
+        self._demand_known = True
+        now = monotonic()
+        refresh = False
+
+        for key in endpoints:
+            self._endpoint_consumers[key] += 1
+            if self._endpoint_consumers[key] == 1 and self.endpoints[key].is_due(now):
+                refresh = True
+
+        if refresh:
+            if self.fleet is not None:
+                self.fleet.async_poll_soon(self.config_entry.entry_id)
+            else:
+                self.hass.async_create_task(self.async_request_refresh())
+
+        @callback
+        def _async_remove() -> None:
+            for key in endpoints:
+                self._endpoint_consumers[key] -= 1
+
+        return _async_remove
+
+    @callback
+    def _async_schedule_device_registration(self, device_list: Any) -> None:
+        """Register the site's devices in the background if they may have changed."""
+        if not isinstance(device_list, list) or not device_list:
+            return
+        if self._device_registration is not None and not self._device_registration.done():
+            return
+
+        serials = frozenset(device["inverterSn"] for device in device_list)
+        now = time()
+        if serials == self._registered_serials and not any(
+            self.device_cache.needs_refresh(serial, now) for serial in serials
+        ):
+            return
+
+        self._device_registration = self.config_entry.async_create_background_task(
+            self.hass,
+            self._async_register_devices(device_list, serials),
+            f"{DOMAIN} register devices {self.config_entry.entry_id}",
         )
 
-        if energy_storage is None:
-            LOGGER.debug(
-                "Wrapper /ESS returned no data; falling back to direct /ESS fetch for site %s",
-                self.config_entry.data[CONF_SITE_ID],
+    @callback
+    def _async_schedule_statistics_import(
+        self, fetched: Iterable[str], snapshot: LivoltekSnapshot
+    ) -> None:
+        """Write fresh history into the recorder in the background."""
+        if "recorder" not in self.hass.config.components:
+            return
+        if self._statistics_import is not None and not self._statistics_import.done():
+            return
+
+        fetched = set(fetched)
+        energy_storage = (
+            snapshot.energy_storage if ENDPOINT_ENERGY_STORAGE in fetched else None
+        )
+        daily = (
+            snapshot.daily
+            if fetched & {ENDPOINT_RECENT_GRID, ENDPOINT_RECENT_SOLAR}
+            else None
+        )
+        if energy_storage is None and daily is None:
+            return
+
+        self._statistics_import = self.config_entry.async_create_background_task(
+            self.hass,
+            self._async_import_statistics(energy_storage, daily),
+            f"{DOMAIN} import statistics {self.config_entry.entry_id}",
+        )
+
+    async def _async_import_statistics(
+        self,
+        energy_storage: EnergyStorageIndex | None,
+        daily: DailyEnergyBuffer | None,
+    ) -> None:
+        """Import the battery history and reconcile the daily energy totals."""
+        if energy_storage is not None:
+            await self.statistics.async_import_energy_storage(
+                energy_storage, dt_util.utcnow()
             )
-            energy_storage = await async_get_energy_storage_direct(
-                self.hass,
-                api.api_client.configuration.host,
+        if daily is not None:
+            await self.statistics.async_reconcile_daily_energy(
+                daily, self.site_timezone
+            )
+
+    async def _async_register_devices(
+        self, device_list: list[dict[str, Any]], serials: frozenset[str]
+    ) -> None:
+        """Fetch details of new or stale devices and update the registry."""
+        await self.device_cache.async_load()
+        try:
+            await async_register_devices(
+                self.client,
+                self.config_entry,
                 self.config_entry.data[CONF_USERTOKEN_ID],
                 self.config_entry.data[CONF_SITE_ID],
-                self.access_token,
+                device_list,
+                self.hass,
+                self.device_cache,
             )
+        except (LivoltekError, TimeoutError) as err:
+            LOGGER.warning("Could not register Livoltek devices: %s", err)
+            return
+        self._registered_serials = serials
 
-        recent_grid = await async_get_recent_grid(
-            api,
-            self.config_entry.data[CONF_USERTOKEN_ID],
-            self.config_entry.data[CONF_SITE_ID],
-        )
+    def _build_snapshot(self, *, restored: bool = False) -> LivoltekSnapshot:
+        """Convert the latest result of every endpoint into a snapshot."""
+        self.site = self.endpoints[ENDPOINT_SITE].data
+        self.devices = self.endpoints[ENDPOINT_DEVICES].data
 
-        recent_solar = await async_get_recent_solar(
-            api,
-            self.config_entry.data[CONF_USERTOKEN_ID],
-            self.config_entry.data[CONF_SITE_ID],
+        energy_storage = self.endpoints[ENDPOINT_ENERGY_STORAGE].data
+        sources, index = self._energy_storage_index
+        if any(
+            new is not old
+            for new, old in zip((energy_storage, self.site_timezone), sources)
+        ):
+            index = EnergyStorageIndex.from_payload(energy_storage, self.site_timezone)
+            self._energy_storage_index = ((energy_storage, self.site_timezone), index)
+
+        # The day buffer is rebuilt only for new rows and rolled over at the
+        # site's midnight otherwise.
+        grid = self.endpoints[ENDPOINT_RECENT_GRID].data
+        solar = self.endpoints[ENDPOINT_RECENT_SOLAR].data
+        current = dt_util.now(self.site_timezone).date()
+        sources, daily = self._daily_energy
+        if any(
+            new is not old
+            for new, old in zip((grid, solar, self.site_timezone), sources)
+        ):
+            daily = DailyEnergyBuffer.from_rows(
+                grid, solar, current, self.site_timezone
+            )
+            self._daily_energy = ((grid, solar, self.site_timezone), daily)
+        elif daily.current != current:
+            daily = daily.rollover(current)
+            self._daily_energy = (sources, daily)
+
+        return LivoltekSnapshot(
+            generation=self.endpoints[ENDPOINT_DEVICE_GENERATION].data or {},
+            power_flow=PowerFlow.from_payload(self.endpoints[ENDPOINT_POWER_FLOW].data),
+            energy_storage=index,
+            daily=daily,
+            restored=restored,
         )
 
-        for grid in recent_grid:
-            ts = dt.date.fromtimestamp(int(grid["ts"]) / 1000)
-            if ts == dt.date.today():
-                self.todays_grid = grid
-
-        for solar in recent_solar:
-            ts = dt.date.fromtimestamp(int(solar["ts"]) / 1000)
-            if ts == dt.date.today():
-                self.todays_solar = solar
-
-        self.site = site
-        self.devices = devices
-        self.current_power_flow = current_power_flow
-        self.energy_storage = energy_storage
-        LOGGER.debug("Current Power Flow: %s", current_power_flow)
-        LOGGER.debug("Energy Storage (/ESS): %s", energy_storage)
+    async def async_shutdown(self) -> None:
+        """Stop refreshing and release the API client."""
+        await super().async_shutdown()
+        self.client.close()
@@ -0,0 +1,84 @@
+"""Persistent cache of Livoltek device details."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import timedelta
+from typing import Any, Final
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_VERSION: Final = 1
+SAVE_DELAY: Final = 10
+
+# Re-read device details at most this often; the device list endpoint does
+# not say when they changed.
+DEVICE_DETAILS_MAX_AGE: Final = timedelta(days=1)
+
+# Fields of a details record that end up in the device registry, with their
+# key in the device details response.
+REGISTRY_FIELDS: Final = {
+    "id": "id",
+    "device_manufacturer": "deviceManufacturer",
+    "inverter_sn": "inverterSn",
+    "product_type": "productType",
+    "firmware_version": "firmwareVersion",
+}
+
+
+def device_record(details: Mapping[str, Any], fetched_at: float) -> dict[str, Any]:
+    """Return the cacheable fields of a device details response."""
+    record = {field: details.get(key) for field, key in REGISTRY_FIELDS.items()}
+    record["update_time"] = details.get("updateTime")
+    record["fetched_at"] = fetched_at
+    return record
+
+
+class DeviceDetailsCache:
+    """Device details of a config entry, keyed by inverter serial number."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize an empty cache backed by the entry's store."""
+        self._store: Store[dict[str, dict[str, Any]]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.devices"
+        )
+        self.records: dict[str, dict[str, Any]] = {}
+        self._loaded = False
+
+    async def async_load(self) -> None:
+        """Load the cache from disk once."""
+        if self._loaded:
+            return
+        self.records = await self._store.async_load() or {}
+        self._loaded = True
+
+    def needs_refresh(self, serial: str, now: float) -> bool:
+        """Return whether a device's details must be fetched again."""
+        record = self.records.get(serial)
+        if record is None:
+            return True
+        return now - record["fetched_at"] > DEVICE_DETAILS_MAX_AGE.total_seconds()
+
+    def update(self, serial: str, record: dict[str, Any]) -> bool:
+        """Store a fresh record and return whether a registry field changed.
+
+        An unchanged ``update_time`` means the device reported nothing new.
+        """
+        previous = self.records.get(serial)
+        self.records[serial] = record
+        self._store.async_delay_save(lambda: self.records, SAVE_DELAY)
+
+        if previous is None:
+            return True
+        if (
+            record["update_time"] is not None
+            and record["update_time"] == previous.get("update_time")
+        ):
+            return False
+        return any(previous.get(field) != record[field] for field in REGISTRY_FIELDS)
+
+    async def async_remove(self) -> None:
+        """Delete the stored cache."""
+        await self._store.async_remove()
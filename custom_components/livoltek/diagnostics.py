@@ -1,28 +1,123 @@
 """Diagnostics support for Livoltek."""
 from __future__ import annotations
 
-import json
+import dataclasses
+from time import monotonic, time
 from typing import Any
 
+from homeassistant.components.diagnostics import async_redact_data
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
-from .coordinator import LivoltekDataUpdateCoordinator
+from .auth import LivoltekTokenBroker
+from .const import (
+    CONF_SECUID_ID,
+    CONF_USERTOKEN_ID,
+    DOMAIN,
+    ENDPOINT_SITE,
+    MAX_CONCURRENT_REQUESTS,
+)
+from .coordinator import LivoltekDataUpdateCoordinator, upstream_timestamp
+
+TO_REDACT = {CONF_API_KEY, CONF_SECUID_ID, CONF_USERTOKEN_ID, "token"}
+
+
+def _utc(timestamp: float | None) -> str | None:
+    """Return an epoch timestamp in seconds as an ISO 8601 string."""
+    if timestamp is None:
+        return None
+    return dt_util.utc_from_timestamp(timestamp).isoformat()
+
+
+def _freshness(coordinator: LivoltekDataUpdateCoordinator) -> dict[str, Any]:
+    """Return how old each endpoint's data is and when it was last uploaded."""
+    now = monotonic()
+    endpoints = {
+        key: {
+            "age": state.age(now),
+            "max_age": state.policy.max_age.total_seconds(),
+            "next_due_in": state.next_due - now,
+            "error": state.error,
+            "failures": state.failures,
+        }
+        for key, state in coordinator.endpoints.items()
+    }
+    generation = coordinator.data.generation if coordinator.data else {}
+    upstream = {
+        "last_upload": _utc(coordinator.upload_cadence.last_upload),
+        "upload_cadence": coordinator.upload_cadence.cadence,
+        "site_update_time": _utc(
+            upstream_timestamp(coordinator.endpoints[ENDPOINT_SITE].data, "updateTime")
+        ),
+        "device_generation": {
+            serial: _utc(counters.timestamp / 1000 if counters.timestamp else None)
+            for serial, counters in generation.items()
+        },
+    }
+    return {"endpoints": endpoints, "upstream": upstream}
+
+
+def _requests(coordinator: LivoltekDataUpdateCoordinator) -> dict[str, Any]:
+    """Return the concurrency, timeout and circuit breaker state of the client."""
+    client = coordinator.client
+    breaker = client.circuit_breaker
+    return {
+        "max_concurrent_requests": MAX_CONCURRENT_REQUESTS,
+        "hedge": client.hedge,
+        "hedged_requests": client.hedged_requests,
+        "timeouts": {key: tracker.timeout() for key, tracker in client.latency.items()},
+        "circuit_breaker": (
+            None
+            if breaker is None
+            else {
+                "state": breaker.state,
+                "failures": breaker.failures,
+                "trips": breaker.trips,
+                "retry_in": max(breaker.retry_at - monotonic(), 0.0),
+            }
+        ),
+    }
+
+
+def _token(coordinator: LivoltekDataUpdateCoordinator) -> dict[str, Any] | None:
+    """Return the age and remaining lifetime of the account's access token."""
+    broker = coordinator.client.token_provider
+    if not isinstance(broker, LivoltekTokenBroker):
+        return None
+    now = time()
+    obtained_at, expires_at = broker.token_obtained_at, broker.token_expires_at
+    return {
+        "age": now - obtained_at if obtained_at is not None else None,
+        "expires_in": expires_at - now if expires_at is not None else None,
+    }
 
 
 async def async_get_config_entry_diagnostics(
     hass: HomeAssistant, entry: ConfigEntry
 ) -> dict[str, Any]:
-    """Return diagnostics for a config entry."""
+    """Return the snapshot and a performance profile of a config entry."""
     coordinator: LivoltekDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    if coordinator.data is None:
-        return {}
-
-    try:
-        data: dict[str, Any] = json.loads(coordinator.data.json())
-    except (AttributeError, json.JSONDecodeError):
-        return {}
+    snapshot = (
+        dataclasses.asdict(coordinator.data) if coordinator.data is not None else None
+    )
 
-    return data
+    return async_redact_data(
+        {
+            "entry": {"data": dict(entry.data), "options": dict(entry.options)},
+            "snapshot": snapshot,
+            "snapshot_bytes": len(json_bytes(snapshot)),
+            "suppressed_writes": coordinator.suppressed_writes,
+            "freshness": _freshness(coordinator),
+            "requests": _requests(coordinator),
+            "token_lifetime": _token(coordinator),
+            "endpoint_metrics": {
+                key: metrics.as_dict() for key, metrics in coordinator.metrics.items()
+            },
+            "refresh_cycles": list(coordinator.refresh_cycles),
+        },
+        TO_REDACT,
+    )
@@ -1,11 +1,14 @@
 """Base class for any Livoltek entities."""
 from __future__ import annotations
 
-
+from typing import Any
 
 from . import LivoltekDataUpdateCoordinator
+from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .const import ATTR_RESTORED_SNAPSHOT
+
 
 class LivoltekEntity(CoordinatorEntity[LivoltekDataUpdateCoordinator]):
     """Defines a base Livoltek entity."""
@@ -15,3 +18,42 @@ class LivoltekEntity(CoordinatorEntity[LivoltekDataUpdateCoordinator]):
     def __init__(self, coordinator: LivoltekDataUpdateCoordinator) -> None:
         """Initialize a Livoltek entity."""
         super().__init__(coordinator=coordinator)
+        self._written_state: tuple[bool, bool, Any] | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Tell the coordinator which endpoints this entity reads."""
+        await super().async_added_to_hass()
+        self._written_state = (self.available, self._restored, self._state_value)
+        self.async_on_remove(
+            self.coordinator.async_add_endpoint_consumer(
+                self.entity_description.endpoints
+            )
+        )
+
+    @property
+    def _restored(self) -> bool:
+        """Return whether the data predates the first refresh after a restart."""
+        data = self.coordinator.data
+        return data is not None and data.restored
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Flag values restored from before a restart."""
+        if self._restored:
+            return {ATTR_RESTORED_SNAPSHOT: True}
+        return None
+
+    @property
+    def _state_value(self) -> Any:
+        """Return the value a state write would publish."""
+        return self.state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if the value or availability changed."""
+        state = (self.available, self._restored, self._state_value)
+        if state == self._written_state:
+            self.coordinator.suppressed_writes += 1
+            return
+        self._written_state = state
+        super()._handle_coordinator_update()
@@ -0,0 +1,226 @@
+"""Account-level scheduling of Livoltek site coordinators."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import math
+import random
+from time import monotonic
+from typing import TYPE_CHECKING, Final
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .auth import LivoltekTokenBroker
+from .const import DATA_FLEETS, DOMAIN, LOGGER, SCAN_INTERVAL
+from .schedule import DEFAULT_ENDPOINT_POLICIES
+
+if TYPE_CHECKING:
+    from .coordinator import LivoltekDataUpdateCoordinator
+
+# How often the fleet checks which sites are due.
+FLEET_TICK: Final = timedelta(seconds=5)
+# Each poll is moved by up to this fraction of the site's interval.
+FLEET_JITTER: Final = 0.1
+# Sites that start together, or gain a consumer, poll up to this far apart.
+FLEET_START_JITTER: Final = timedelta(seconds=5)
+
+
+class RequestBudget:
+    """Token bucket limiting the API requests of an account.
+
+    Every HTTP request takes one token. The bucket holds one token per
+    endpoint, so a burst is about what one refresh of a small site sends.
+    """
+
+    def __init__(self, requests_per_minute: float) -> None:
+        """Initialize a full bucket."""
+        self.capacity = float(len(DEFAULT_ENDPOINT_POLICIES))
+        self.tokens = self.capacity
+        self.rate = requests_per_minute / 60
+        self._updated = monotonic()
+
+    def set_rate(self, requests_per_minute: float) -> None:
+        """Change the refill rate."""
+        self._refill()
+        self.rate = requests_per_minute / 60
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last refill."""
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def async_acquire(self, requests: int) -> None:
+        """Wait until ``requests`` requests may be sent, then spend them."""
+        requests = min(float(requests), self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= requests:
+                self.tokens -= requests
+                return
+            await asyncio.sleep((requests - self.tokens) / self.rate)
+
+
+@dataclass(slots=True)
+class _FleetMember:
+    """A site coordinator driven by the fleet."""
+
+    coordinator: LivoltekDataUpdateCoordinator
+    requests_per_minute: float
+    next_poll: float
+
+
+class LivoltekFleet:
+    """Poll every site of one Livoltek account from a single schedule.
+
+    The sites share the account's token broker and Home Assistant's client
+    session already. The fleet gives each site a random phase within the poll
+    interval, so sites do not poll in lockstep, and hands the account's
+    request budget to their clients and token broker, so every request they
+    send, logins included, waits for it.
+    """
+
+    def __init__(self, hass: HomeAssistant, name: str) -> None:
+        """Initialize an empty fleet."""
+        self.hass = hass
+        self.name = name
+        self.members: dict[str, _FleetMember] = {}
+        self.budget: RequestBudget | None = None
+        self._unsub_tick: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_add(
+        self,
+        entry_id: str,
+        coordinator: LivoltekDataUpdateCoordinator,
+        requests_per_minute: float,
+    ) -> None:
+        """Start driving a site coordinator."""
+        self.members[entry_id] = _FleetMember(
+            coordinator,
+            requests_per_minute,
+            monotonic() + random.uniform(0, SCAN_INTERVAL.total_seconds()),
+        )
+        self._update_budget()
+
+        if self._unsub_tick is None:
+            self._unsub_tick = async_track_time_interval(
+                self.hass,
+                self._async_tick,
+                FLEET_TICK,
+                name=f"{DOMAIN} fleet {self.name}",
+                cancel_on_shutdown=True,
+            )
+
+    async def async_first_refresh(self, entry_id: str) -> None:
+        """Run the first refresh of a site after a random delay.
+
+        Like ``async_config_entry_first_refresh``, this raises
+        ConfigEntryNotReady when the refresh fails.
+        """
+        member = self.members[entry_id]
+        # Keep the tick away from the site until its first refresh is done.
+        member.next_poll = math.inf
+        await asyncio.sleep(random.uniform(0, FLEET_START_JITTER.total_seconds()))
+        try:
+            await member.coordinator.async_config_entry_first_refresh()
+        finally:
+            self._schedule(member)
+
+    @callback
+    def async_poll_soon(self, entry_id: str) -> None:
+        """Poll a site on one of the next ticks instead of waiting for its phase."""
+        if (member := self.members.get(entry_id)) is not None:
+            member.next_poll = min(
+                member.next_poll,
+                monotonic() + random.uniform(0, FLEET_START_JITTER.total_seconds()),
+            )
+
+    @callback
+    def async_remove(self, entry_id: str) -> None:
+        """Stop driving a site coordinator."""
+        self.members.pop(entry_id, None)
+        if self.members:
+            self._update_budget()
+        elif self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+
+    def _update_budget(self) -> None:
+        """Apply the strictest budget any member asks for."""
+        rate = min(member.requests_per_minute for member in self.members.values())
+        if self.budget is None:
+            self.budget = RequestBudget(rate)
+        else:
+            self.budget.set_rate(rate)
+
+    def _schedule(self, member: _FleetMember) -> None:
+        """Set the next poll of a site from its own delay, with jitter."""
+        delay = member.coordinator.next_refresh_delay.total_seconds()
+        member.next_poll = monotonic() + delay * random.uniform(
+            1 - FLEET_JITTER, 1 + FLEET_JITTER
+        )
+
+    @callback
+    def _async_tick(self, _now: datetime | None = None) -> None:
+        """Start the refresh of every site that is due, in phase order.
+
+        The refreshes share the budget, which their requests wait for.
+        """
+        now = monotonic()
+        due = sorted(
+            (
+                (entry_id, member)
+                for entry_id, member in self.members.items()
+                if member.next_poll <= now
+            ),
+            key=lambda item: item[1].next_poll,
+        )
+        for entry_id, member in due:
+            coordinator = member.coordinator
+            self._schedule(member)
+            coordinator.config_entry.async_create_background_task(
+                self.hass,
+                coordinator.async_refresh(),
+                f"{DOMAIN} fleet refresh {entry_id}",
+            )
+
+
+@callback
+def async_join_fleet(
+    hass: HomeAssistant,
+    host: str,
+    secuid: str,
+    entry_id: str,
+    coordinator: LivoltekDataUpdateCoordinator,
+    requests_per_minute: float,
+) -> CALLBACK_TYPE:
+    """Hand a coordinator to its account's fleet and return a callback to leave."""
+    fleets: dict[tuple[str, str], LivoltekFleet] = hass.data.setdefault(DATA_FLEETS, {})
+    key = (host, secuid)
+    fleet = fleets.get(key)
+    if fleet is None:
+        fleet = fleets[key] = LivoltekFleet(hass, secuid)
+        LOGGER.debug("Started Livoltek fleet for account %s", secuid)
+
+    fleet.async_add(entry_id, coordinator, requests_per_minute)
+    coordinator.fleet = fleet
+    client = coordinator.client
+    client.request_limiter = fleet.budget
+    broker = client.token_provider
+    if isinstance(broker, LivoltekTokenBroker):
+        broker.request_limiter = fleet.budget
+
+    @callback
+    def _async_leave() -> None:
+        coordinator.fleet = None
+        client.request_limiter = None
+        fleet.async_remove(entry_id)
+        if not fleet.members:
+            fleets.pop(key, None)
+            if isinstance(broker, LivoltekTokenBroker):
+                broker.request_limiter = None
+
+    return _async_leave
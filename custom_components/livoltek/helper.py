@@ -3,346 +3,288 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import Mapping
+from contextlib import aclosing
+import datetime as dt
+import re
+import time
 from typing import Any
 
-import aiohttp
-
-from homeassistant.auth.jwt_wrapper import PyJWT
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.const import CONF_API_KEY
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers import device_registry as dr
-from homeassistant.helpers.device_registry import DeviceInfo
-
-from pylivoltek import ApiClient, ApiLoginBody, Configuration
-from pylivoltek.api import DefaultApi
-from pylivoltek.models import (
-    CurrentPowerFlow,
-    DeviceDetails,
-    DeviceList,
-    EnergyStore,
-    GridImportExportList,
-    SiteOverview,
+from homeassistant.util import dt as dt_util
+
+from .api import (
+    LivoltekAuthenticationError,
+    LivoltekClient,
+    LivoltekConnectionError,
+    LivoltekError,
+    LivoltekNotFoundError,
 )
-from pylivoltek.rest import ApiException
-
+from .auth import async_get_token_broker
+from .breaker import async_get_circuit_breaker
 from .const import (
-    API_REQUEST_TIMEOUT,
     CONF_EMEA_ID,
+    CONF_HEDGE_REQUESTS,
     CONF_SECUID_ID,
-    CONF_SITE_ID,
-    CONF_USERTOKEN_ID,
     DOMAIN,
     LIVOLTEK_EMEA_SERVER,
     LIVOLTEK_GLOBAL_SERVER,
     LOGGER,
+    MAX_CONCURRENT_REQUESTS,
 )
+from .devices import DeviceDetailsCache, device_record
+from .models import DeviceGeneration
 
+# Site timezones that are not IANA names, such as "UTC+08:00" or "+8".
+_UTC_OFFSET = re.compile(r"(?:UTC|GMT)?\s*([+-])(\d{1,2})(?::?(\d{2}))?", re.I)
 
-def validate_jwt(jwt: str) -> bool:
-    """Validate a JWT token."""
+
+async def async_get_login_token(
+    hass: HomeAssistant, host: str, api_key: str, secuid: str
+) -> str:
+    """Get the login token for the Livoltek API."""
+    broker = async_get_token_broker(hass, host, secuid, unescape_api_key(api_key))
     try:
-        PyJWT(jwt)
-        return True
-    except Exception as e:
-        LOGGER.info("Invalid JWT token: %s", e)
-        return False
+        return await broker.async_get_token()
+    except LivoltekAuthenticationError as err:
+        raise ConfigEntryAuthFailed(str(err)) from err
 
 
-async def async_get_login_token(host: str, api_key: str, secuid: str) -> str:
-    """Get the login token for the Livoltek API."""
-    config = Configuration()
+def get_api_host(entry: ConfigEntry) -> str:
+    """Return the Livoltek server for the entry's region."""
+    if bool(entry.data[CONF_EMEA_ID]):
+        return LIVOLTEK_EMEA_SERVER
+    return LIVOLTEK_GLOBAL_SERVER
 
-    config.host = host
 
+def unescape_api_key(api_key: str) -> str:
+    """Turn the escaped newlines users paste into the form back into a PEM key."""
     api_key = api_key.replace("\\r", "\r")
-    api_key = api_key.replace("\\n", "\n")
-
-    api_client = ApiClient(config)
-    model = ApiLoginBody(secuid, api_key)
-    api = DefaultApi(api_client)
-
-    loop = asyncio.get_running_loop()
-    thread_result = await loop.run_in_executor(
-        None,
-        lambda: api.hess_api_login_post_with_http_info(
-            model,
-            _preload_content=True,
-            _request_timeout=API_REQUEST_TIMEOUT,
+    return api_key.replace("\\n", "\n")
+
+
+def create_api_client(hass: HomeAssistant, entry: ConfigEntry) -> LivoltekClient:
+    """Create the long-lived Livoltek API client for a config entry."""
+    host = get_api_host(entry)
+    return LivoltekClient(
+        async_get_clientsession(hass),
+        host,
+        token_provider=async_get_token_broker(
+            hass,
+            host,
+            str(entry.data[CONF_SECUID_ID]),
+            unescape_api_key(str(entry.data[CONF_API_KEY])),
         ),
+        circuit_breaker=async_get_circuit_breaker(hass, host),
+        hedge=entry.options.get(CONF_HEDGE_REQUESTS, False),
     )
-    response = thread_result[0]
-
-    if response.message != "SUCCESS":
-        raise ConfigEntryAuthFailed(response.message)
-
-    login_result = response.data
-
-    if isinstance(login_result, dict):
-        return login_result.get("data", "")
-
-    return getattr(login_result, "data", "") or ""
-
-
-async def async_get_api_client(
-    entry: ConfigEntry, access_token: str = None
-) -> tuple[DefaultApi, str]:
-    """Get the Livoltek API client."""
-    config = Configuration()
-
-    emea = bool(entry.data[CONF_EMEA_ID])
-    secuid = str(entry.data[CONF_SECUID_ID])
-    api_key = str(entry.data[CONF_API_KEY])
-
-    if emea:
-        host = LIVOLTEK_EMEA_SERVER
-    else:
-        host = LIVOLTEK_GLOBAL_SERVER
-    config.host = host
-
-    if access_token is None:
-        access_token = ""
-
-    if validate_jwt(access_token):
-        token = access_token
-    else:
-        LOGGER.info("Invalid JWT token, refreshing")
-        token = await async_get_login_token(host, api_key, secuid)
-
-    api_client = ApiClient(config)
-    api_client.set_default_header("Authorization", token)
-    return DefaultApi(api_client), token
 
 
 async def async_get_site(
-    api: DefaultApi, user_token: str, site_id: str
-) -> SiteOverview:
-    """Get the Livoltek API client."""
-
-    loop = asyncio.get_running_loop()
-    site = await loop.run_in_executor(
-        None,
-        lambda: api.hess_api_site_site_id_overview_get_with_http_info(
-            user_token,
-            site_id,
-            _request_timeout=API_REQUEST_TIMEOUT,
-        ),
-    )
-    return site[0].data
+    api: LivoltekClient, user_token: str, site_id: str
+) -> dict[str, Any]:
+    """Get the site overview."""
+    return await api.async_get_site_overview(user_token, site_id)
 
 
 async def async_get_cur_power_flow(
-    api: DefaultApi, user_token: str, site_id: str
-) -> CurrentPowerFlow:
-    """Get the Livoltek API client."""
-    try:
-        loop = asyncio.get_running_loop()
-        current_power_flow = await loop.run_in_executor(
-            None,
-            lambda: api.hess_api_site_site_id_cur_powerflow_get_with_http_info(
-                user_token,
-                site_id,
-                _request_timeout=API_REQUEST_TIMEOUT,
-            ),
-        )
-        return current_power_flow[0].data
-    except ApiException as e:
-        LOGGER.error("Error getting current power flow: %s", e)
+    api: LivoltekClient, user_token: str, site_id: str
+) -> dict[str, Any]:
+    """Get the current power flow."""
+    return await api.async_get_cur_power_flow(user_token, site_id)
 
 
 async def async_get_device_list(
-    api: DefaultApi, user_token: str, site_id: str
-) -> DeviceList:
-    """Get the Livoltek API client."""
-
-    loop = asyncio.get_running_loop()
-    device_list = await loop.run_in_executor(
-        None,
-        lambda: api.hess_api_device_site_id_list_get_with_http_info(
-            user_token,
-            site_id,
-            1,
-            10,
-            _request_timeout=API_REQUEST_TIMEOUT,
-        ),
-    )
-    return device_list[0].data["list"]
+    api: LivoltekClient, user_token: str, site_id: str
+) -> list[dict[str, Any]]:
+    """Get all devices of a site."""
+    return [
+        device async for device in api.async_iter_device_list(user_token, site_id)
+    ]
 
 
 async def async_get_energy_storage(
-    api: DefaultApi, user_token: str, site_id: str
-) -> EnergyStore | None:
-    """Get energy storage information from the /ESS endpoint."""
-    try:
-        loop = asyncio.get_running_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: api.get_energy_storage_with_http_info(
-                site_id,
-                user_token,
-                _request_timeout=API_REQUEST_TIMEOUT,
-            ),
-        )
-
-        if not result or not result[0]:
-            return None
-
-        return result[0].data
-    except ApiException as e:
-        LOGGER.warning(
-            "Failed to fetch energy storage data for site %s: %s", site_id, e
-        )
-        return None
-    except asyncio.CancelledError:
-        raise
-    except Exception as e:
-        LOGGER.warning(
-            "Unexpected error fetching energy storage for site %s: %s", site_id, e
-        )
-        return None
-
-
-
-async def async_get_energy_storage_direct(
-    hass, host: str, user_token: str, site_id: str, auth_token: str
+    api: LivoltekClient, user_token: str, site_id: str
 ) -> dict[str, Any] | None:
-    """Fetch /ESS directly, bypassing pylivoltek wrapper issues."""
-    session = async_get_clientsession(hass)
-    url = f"{host.rstrip('/')}/hess/api/site/{site_id}/ESS"
+    """Get energy storage information from the /ESS endpoint.
 
+    Sites without a battery are answered with HTTP 404, which is returned as
+    no data. Any other error is raised, so the last good result is kept.
+    """
     try:
-        async with session.get(
-            url,
-            params={"userToken": user_token},
-            headers={
-                "Authorization": auth_token,
-                "Accept": "application/json",
-            },
-            timeout=aiohttp.ClientTimeout(total=API_REQUEST_TIMEOUT),
-        ) as resp:
-            resp.raise_for_status()
-            payload = await resp.json()
-
-        return payload.get("data")
-    except asyncio.CancelledError:
-        raise
-    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, TypeError) as e:
-        LOGGER.warning(
-            "Direct /ESS fetch failed for site %s: %s", site_id, e
-        )
+        return await api.async_get_energy_storage(user_token, site_id)
+    except LivoltekNotFoundError:
+        LOGGER.debug("Site %s has no energy storage", site_id)
         return None
 
 
 async def async_get_device_generation(
-    api: DefaultApi, user_token: str, device_id: str
-) -> Any:
-    """Get the Livoltek API client."""
-
-    loop = asyncio.get_running_loop()
-    device_generation = await loop.run_in_executor(
-        None,
-        lambda: api.hess_api_device_device_id_real_electricity_get_with_http_info(
-            user_token,
-            device_id,
-            _request_timeout=API_REQUEST_TIMEOUT,
-        ),
-    )
-    return device_generation[0].data
+    api: LivoltekClient, user_token: str, device_id: str
+) -> dict[str, Any]:
+    """Get the lifetime generation of a device."""
+    return await api.async_get_device_generation(user_token, device_id)
+
+
+async def async_get_device_generations(
+    api: LivoltekClient,
+    user_token: str,
+    device_list: list[dict[str, Any]],
+    previous: Mapping[str, DeviceGeneration],
+    last_upload: float | None = None,
+) -> dict[str, DeviceGeneration]:
+    """Get the lifetime counters of every device, keyed by serial number.
+
+    Devices are fetched concurrently. A device keeps its previous counters
+    when the site has not uploaded since they were read, when the response
+    is not newer, or when the request fails.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def _fetch(device: dict[str, Any]) -> DeviceGeneration | None:
+        known = previous.get(device["inverterSn"])
+        if (
+            known is not None
+            and known.timestamp is not None
+            and last_upload is not None
+            and last_upload * 1000 <= known.timestamp
+        ):
+            return known
+
+        try:
+            async with semaphore:
+                payload = await async_get_device_generation(
+                    api, user_token, str(device["id"])
+                )
+        except LivoltekConnectionError as err:
+            LOGGER.debug(
+                "Error getting generation of device %s: %s", device["inverterSn"], err
+            )
+            return known
+
+        generation = DeviceGeneration.from_payload(device["id"], payload)
+        if (
+            known is not None
+            and known.timestamp is not None
+            and (generation.timestamp or 0) <= known.timestamp
+        ):
+            return known
+        return generation
+
+    results = await asyncio.gather(*(_fetch(device) for device in device_list))
+    return {
+        device["inverterSn"]: generation
+        for device, generation in zip(device_list, results)
+        if generation is not None
+    }
+
+
+async def async_find_site(
+    api: LivoltekClient, user_token: str, site_id: str
+) -> dict[str, Any] | None:
+    """Get a site's entry from the user's site listing."""
+    # Closing the listing stops the requests for pages not read yet.
+    async with aclosing(api.async_iter_sites(user_token)) as sites:
+        async for site in sites:
+            if str(site.get("powerStationId")) == site_id:
+                return site
+    return None
+
+
+async def async_get_site_timezone(name: Any) -> dt.tzinfo:
+    """Get a site timezone from its listing name, falling back to Home Assistant's."""
+    if isinstance(name, str) and (name := name.strip()):
+        if match := _UTC_OFFSET.fullmatch(name):
+            sign, hours, minutes = match.groups()
+            offset = dt.timedelta(hours=int(hours), minutes=int(minutes or 0))
+            return dt.timezone(-offset if sign == "-" else offset)
+        try:
+            if (zone := await dt_util.async_get_time_zone(name)) is not None:
+                return zone
+        except ValueError:
+            pass
+        LOGGER.debug("Unknown site timezone %s, using the local one", name)
+    return dt_util.get_default_time_zone()
 
 
 async def async_get_recent_grid(
-    api: DefaultApi, user_token: str, site_id: str
-) -> GridImportExportList:
+    api: LivoltekClient, user_token: str, site_id: str
+) -> list[dict[str, Any]]:
     """Get the Recent Grid Import/Export."""
-
-    loop = asyncio.get_running_loop()
-    recent_grid = await loop.run_in_executor(
-        None,
-        lambda: api.get_recent_energy_import_export_with_http_info(
-            user_token,
-            site_id,
-            _request_timeout=API_REQUEST_TIMEOUT,
-        ),
-    )
-    return recent_grid[0]["data"]
+    return await api.async_get_recent_grid(user_token, site_id)
 
 
 async def async_get_recent_solar(
-    api: DefaultApi, user_token: str, site_id: str
-) -> Any:
+    api: LivoltekClient, user_token: str, site_id: str
+) -> list[dict[str, Any]]:
     """Get the Recent Solar Generation."""
-
-    loop = asyncio.get_running_loop()
-    recent_solar = await loop.run_in_executor(
-        None,
-        lambda: api.get_recent_solar_generated_energy_with_http_info(
-            user_token,
-            site_id,
-            _request_timeout=API_REQUEST_TIMEOUT,
-        ),
-    )
-    return recent_solar[0]["data"]
-
-
-async def async_update_devices(entry: ConfigEntry, hass: HomeAssistant) -> None:
-    """Update Livoltek devices."""
-
-    api, _ = await async_get_api_client(entry)
-    user_token = str(entry.data[CONF_USERTOKEN_ID])
-    site_id = str(entry.data[CONF_SITE_ID])
-
-    async with asyncio.timeout(API_REQUEST_TIMEOUT):
-        device_list = await async_get_device_list(api, user_token, site_id)
-
-    await async_register_devices(api, entry, user_token, site_id, device_list, hass)
+    return await api.async_get_recent_solar(user_token, site_id)
 
 
 async def async_register_devices(
-    api: DefaultApi,
+    api: LivoltekClient,
     entry: ConfigEntry,
     user_token: str,
     site_id: str,
-    device_list: DeviceList,
+    device_list: list[dict[str, Any]],
     hass: HomeAssistant,
+    cache: DeviceDetailsCache | None = None,
 ) -> None:
-    """Register Livoltek devices."""
+    """Register Livoltek devices.
+
+    Details are fetched concurrently, skipping devices whose cached details
+    are still fresh, and the registry is only touched for changed devices.
+    Devices whose details could not be fetched are raised as one error after
+    the others are registered; with a cache, a later call fetches only them.
+    """
     device_registry = dr.async_get(hass)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    now = time.time()
+
+    async def _fetch(serial: str) -> dict[str, Any]:
+        async with semaphore:
+            return await api.async_get_device_details(user_token, site_id, serial)
+
+    serials = [
+        device["inverterSn"]
+        for device in device_list
+        if cache is None or cache.needs_refresh(device["inverterSn"], now)
+    ]
+    details = await asyncio.gather(
+        *(_fetch(serial) for serial in serials), return_exceptions=True
+    )
 
-    for device in device_list:
-        inverter_sn = device["inverterSn"]
-        async with asyncio.timeout(API_REQUEST_TIMEOUT):
-            dev = await hass.async_add_executor_job(
-                lambda sn=inverter_sn: api.get_device_details(
-                    user_token,
-                    site_id,
-                    sn,
-                    _preload_content=True,
-                    _request_timeout=API_REQUEST_TIMEOUT,
-                ).data
-            )
+    failed: dict[str, BaseException] = {}
+    for serial, dev in zip(serials, details):
+        if isinstance(dev, BaseException):
+            failed[serial] = dev
+            continue
+        if not isinstance(dev, Mapping):
+            failed[serial] = LivoltekConnectionError("no details were returned")
+            continue
+        record = device_record(dev, now)
+        if cache is not None and not cache.update(serial, record):
+            continue
 
         device_registry.async_get_or_create(
             config_entry_id=entry.entry_id,
-            identifiers={(DOMAIN, dev.id)},
-            manufacturer=dev.device_manufacturer,
-            name=dev.inverter_sn,
-            model=dev.product_type,
-            serial_number=dev.inverter_sn,
-            sw_version=dev.firmware_version,
+            identifiers={(DOMAIN, record["id"])},
+            manufacturer=record["device_manufacturer"],
+            name=record["inverter_sn"],
+            model=record["product_type"],
+            serial_number=record["inverter_sn"],
+            sw_version=record["firmware_version"],
         )
 
-
-async def async_get_hass_device_info(
-    entry: ConfigEntry, device: DeviceDetails
-) -> DeviceInfo:
-    """Get device info for Home Assistant."""
-    return DeviceInfo(
-        identifiers={(DOMAIN, device.id)},
-        manufacturer=device.device_manufacturer,
-        name=device.inverter_sn,
-        model=device.product_type,
-        sw_version=device.firmware_version,
-        serial_number=device.inverter_sn,
-    )
+    for err in failed.values():
+        if not isinstance(err, (LivoltekError, TimeoutError)):
+            raise err
+    if failed:
+        raise LivoltekConnectionError(
+            "Error fetching device details: "
+            + "; ".join(f"{serial}: {err}" for serial, err in failed.items())
+        )
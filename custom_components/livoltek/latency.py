@@ -0,0 +1,52 @@
+"""Observed latency of the Livoltek API endpoints."""
+from __future__ import annotations
+
+from collections import deque
+import math
+
+from .const import (
+    API_REQUEST_TIMEOUT,
+    LATENCY_MIN_SAMPLES,
+    LATENCY_SAMPLES,
+    LATENCY_TIMEOUT_FACTOR,
+    MIN_REQUEST_TIMEOUT,
+)
+
+
+class LatencyTracker:
+    """The latest request durations of one endpoint, in seconds.
+
+    Until enough requests were timed the fixed API timeout applies and no
+    request is hedged.
+    """
+
+    __slots__ = ("samples",)
+
+    def __init__(self) -> None:
+        """Initialize with no requests timed yet."""
+        self.samples: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, duration: float) -> None:
+        """Record the duration of a request, or the timeout it ran into."""
+        self.samples.append(duration)
+
+    def percentile(self, percent: float) -> float | None:
+        """Return the nearest-rank percentile of the recorded durations."""
+        if len(self.samples) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        rank = math.ceil(percent / 100 * len(ordered))
+        return ordered[max(rank, 1) - 1]
+
+    def timeout(self) -> float:
+        """Return the timeout of the next request."""
+        if (p99 := self.percentile(99)) is None:
+            return API_REQUEST_TIMEOUT
+        return min(
+            max(p99 * LATENCY_TIMEOUT_FACTOR, MIN_REQUEST_TIMEOUT),
+            API_REQUEST_TIMEOUT,
+        )
+
+    def hedge_delay(self) -> float | None:
+        """Return how long to wait before sending a second request, if at all."""
+        return self.percentile(95)
@@ -0,0 +1,90 @@
+"""Request metrics of the Livoltek coordinator endpoints."""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Final
+
+# Upper bounds, in seconds, of the latency histogram buckets. Slower fetches
+# land in a last, open-ended bucket.
+LATENCY_BUCKETS: Final = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+
+
+class EndpointMetrics:
+    """Counters of the fetches of one endpoint since the entry was set up."""
+
+    __slots__ = (
+        "calls",
+        "successes",
+        "errors",
+        "latency_histogram",
+        "last_latency",
+        "response_bytes",
+        "total_response_bytes",
+        "last_success",
+    )
+
+    def __init__(self) -> None:
+        """Initialize with nothing fetched yet."""
+        self.calls = 0
+        self.successes = 0
+        self.errors: Counter[str] = Counter()
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.last_latency: float | None = None
+        self.response_bytes: int | None = None
+        self.total_response_bytes = 0
+        self.last_success: datetime | None = None
+
+    @property
+    def error_count(self) -> int:
+        """Return the number of failed fetches."""
+        return self.errors.total()
+
+    def record(
+        self,
+        latency: float,
+        response_bytes: int,
+        error: BaseException | None,
+        now: datetime,
+    ) -> None:
+        """Record one fetch, its duration and the bytes its responses carried."""
+        self.calls += 1
+        self.last_latency = latency
+        self.latency_histogram[
+            next(
+                (
+                    index
+                    for index, bound in enumerate(LATENCY_BUCKETS)
+                    if latency <= bound
+                ),
+                len(LATENCY_BUCKETS),
+            )
+        ] += 1
+        self.response_bytes = response_bytes
+        self.total_response_bytes += response_bytes
+        if error is None:
+            self.successes += 1
+            self.last_success = now
+        else:
+            self.errors[type(error).__name__] += 1
+
+    def histogram(self) -> dict[str, int]:
+        """Return the latency histogram keyed by bucket."""
+        labels = [f"<={bound:g}s" for bound in LATENCY_BUCKETS]
+        labels.append(f">{LATENCY_BUCKETS[-1]:g}s")
+        return dict(zip(labels, self.latency_histogram))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics in a form diagnostics can serialize."""
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "errors": dict(self.errors),
+            "latency_histogram": self.histogram(),
+            "last_latency": self.last_latency,
+            "response_bytes": self.response_bytes,
+            "total_response_bytes": self.total_response_bytes,
+            "last_success": (
+                self.last_success.isoformat() if self.last_success else None
+            ),
+        }
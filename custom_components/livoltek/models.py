@@ -0,0 +1,348 @@
+"""Normalized views of Livoltek API payloads."""
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+import datetime as dt
+from typing import Any, Final
+
+from homeassistant.util import dt as dt_util
+
+# Days of grid and solar totals kept, ending with the site's current day.
+DAILY_BUFFER_DAYS: Final = 7
+
+
+def parse_float(value: Any) -> float | None:
+    """Convert an API value to a float, treating blanks and "unknown" as None."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, str) and value.lower() == "unknown":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get(payload: Any, *keys: str) -> Any:
+    """Return the first non-empty field of a dict or generated model object."""
+    for key in keys:
+        if isinstance(payload, Mapping):
+            value = payload.get(key)
+        else:
+            value = getattr(payload, key, None)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class EnergyStorageSample:
+    """One battery reading from the /ESS history."""
+
+    time: int
+    power: float | None
+    soc: float | None
+    voltage: float | None
+
+
+@dataclass(frozen=True, slots=True)
+class EnergyStorageDay:
+    """Charge and discharge energy last reported for one day."""
+
+    charge: float | None
+    discharge: float | None
+
+
+@dataclass(frozen=True, slots=True)
+class EnergyStorageIndex:
+    """The /ESS payload, normalized once per update.
+
+    History samples are sorted by time, so the latest reading and the daily
+    totals can be read without walking ``historyMap`` again.
+    """
+
+    current_soc: float | None = None
+    times: tuple[int, ...] = ()
+    power: tuple[float | None, ...] = ()
+    soc: tuple[float | None, ...] = ()
+    voltage: tuple[float | None, ...] = ()
+    latest: EnergyStorageSample | None = None
+    latest_soc: float | None = None
+    days: dict[dt.date, EnergyStorageDay] = field(default_factory=dict)
+
+    @property
+    def battery_soc(self) -> float | None:
+        """Return the reported SOC, or the most recent one in the history."""
+        if self.current_soc is not None:
+            return self.current_soc
+        return self.latest_soc
+
+    @classmethod
+    def from_payload(
+        cls, payload: Any, timezone: dt.tzinfo | None = None
+    ) -> EnergyStorageIndex | None:
+        """Build the index from an /ESS response, which may be a dict or model.
+
+        Daily totals are grouped by date in ``timezone``, Home Assistant's
+        by default.
+        """
+        if payload is None:
+            return None
+        timezone = timezone or dt_util.get_default_time_zone()
+
+        rows = sorted(_history_rows(_get(payload, "historyMap", "history_map")))
+        days: dict[dt.date, EnergyStorageDay] = {}
+        latest_soc = None
+        for time, _, item in rows:
+            soc = parse_float(_get(item, "energySoc", "energy_soc"))
+            if soc is not None:
+                latest_soc = soc
+            day = dt.datetime.fromtimestamp(time / 1000, timezone).date()
+            days[day] = EnergyStorageDay(
+                charge=parse_float(_get(item, "charge")),
+                discharge=parse_float(_get(item, "discharge")),
+            )
+
+        samples = [
+            EnergyStorageSample(
+                time=time,
+                power=parse_float(_get(item, "energyPower", "energy_power")),
+                soc=parse_float(_get(item, "energySoc", "energy_soc")),
+                voltage=parse_float(_get(item, "energyVolage", "energy_volage")),
+            )
+            for time, _, item in rows
+        ]
+
+        return cls(
+            current_soc=parse_float(_get(payload, "current_soc", "currentSoc")),
+            times=tuple(sample.time for sample in samples),
+            power=tuple(sample.power for sample in samples),
+            soc=tuple(sample.soc for sample in samples),
+            voltage=tuple(sample.voltage for sample in samples),
+            latest=samples[-1] if samples else None,
+            latest_soc=latest_soc,
+            days=days,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class PowerFlow:
+    """Current power flow of a site, in kW, with the battery SOC in percent."""
+
+    pv_power: float | None = None
+    power_grid_power: float | None = None
+    load_power: float | None = None
+    energy_power: float | None = None
+    energy_soc: float | None = None
+    timestamp: int | None = None
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> PowerFlow | None:
+        """Build the power flow from a curPowerflow response."""
+        if payload is None:
+            return None
+
+        timestamp = _get(payload, "timestamp")
+        try:
+            timestamp = int(timestamp) if timestamp is not None else None
+        except (TypeError, ValueError):
+            timestamp = None
+
+        return cls(
+            pv_power=parse_float(_get(payload, "pvPower", "pv_power")),
+            power_grid_power=parse_float(
+                _get(payload, "powerGridPower", "power_grid_power")
+            ),
+            load_power=parse_float(_get(payload, "loadPower", "load_power")),
+            energy_power=parse_float(_get(payload, "energyPower", "energy_power")),
+            energy_soc=parse_float(_get(payload, "energySoc", "energy_soc")),
+            timestamp=timestamp,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceGeneration:
+    """Lifetime energy counters of one inverter, in kWh."""
+
+    device_id: Any
+    pv_produce_electric: float | None = None
+    load_customer_electric: float | None = None
+    timestamp: int | None = None
+
+    @classmethod
+    def from_payload(cls, device_id: Any, payload: Any) -> DeviceGeneration:
+        """Build the counters from a realElectricity response."""
+        timestamp = _get(payload, "timestamp")
+        try:
+            timestamp = int(timestamp) if timestamp is not None else None
+        except (TypeError, ValueError):
+            timestamp = None
+
+        return cls(
+            device_id=device_id,
+            pv_produce_electric=parse_float(_get(payload, "pvProduceElectric")),
+            load_customer_electric=parse_float(_get(payload, "loadCustomerElectric")),
+            timestamp=timestamp,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class DailyEnergy:
+    """Energy totals of one day in kWh."""
+
+    grid_import: float | None = None
+    grid_export: float | None = None
+    solar_generation: float | None = None
+
+
+_NO_ENERGY: Final = DailyEnergy()
+
+
+@dataclass(frozen=True, slots=True)
+class DailyEnergyBuffer:
+    """Daily grid and solar totals keyed by the site's local date.
+
+    Holds the ``DAILY_BUFFER_DAYS`` days ending with ``current``, the site's
+    date when the buffer was built or last rolled over. A day without a row
+    reads as empty totals, so the daily sensors reset at midnight instead of
+    carrying the previous day's values over.
+    """
+
+    current: dt.date | None = None
+    days: Mapping[dt.date, DailyEnergy] = field(default_factory=dict)
+
+    def day(self, day: dt.date) -> DailyEnergy:
+        """Return the totals of one day."""
+        return self.days.get(day, _NO_ENERGY)
+
+    @property
+    def today(self) -> DailyEnergy:
+        """Return the totals of the site's current day."""
+        if self.current is None:
+            return _NO_ENERGY
+        return self.day(self.current)
+
+    @property
+    def yesterday(self) -> DailyEnergy:
+        """Return the totals of the day before the current one."""
+        if self.current is None:
+            return _NO_ENERGY
+        return self.day(self.current - dt.timedelta(days=1))
+
+    def last(self, count: int) -> list[tuple[dt.date, DailyEnergy]]:
+        """Return the last ``count`` days up to the current one, oldest first."""
+        if self.current is None:
+            return []
+        first = self.current - dt.timedelta(days=count - 1)
+        return [
+            (day, self.day(day))
+            for day in (first + dt.timedelta(days=i) for i in range(count))
+        ]
+
+    def rollover(self, current: dt.date) -> DailyEnergyBuffer:
+        """Return the buffer moved to a new current day.
+
+        Days that fall out of the window are dropped; the new day starts
+        empty until a row for it arrives.
+        """
+        first = current - dt.timedelta(days=DAILY_BUFFER_DAYS - 1)
+        return DailyEnergyBuffer(
+            current,
+            {day: energy for day, energy in self.days.items() if first <= day <= current},
+        )
+
+    @classmethod
+    def from_rows(
+        cls, grid_rows: Any, solar_rows: Any, current: dt.date, timezone: dt.tzinfo
+    ) -> DailyEnergyBuffer:
+        """Index the recent grid and solar series by day in ``timezone``.
+
+        The last row of a day wins, as reissued values are appended.
+        """
+        grid = _rows_by_day(grid_rows, timezone)
+        solar = _rows_by_day(solar_rows, timezone)
+        days = {
+            day: DailyEnergy(
+                grid_import=parse_float(grid.get(day, {}).get("positive")),
+                grid_export=parse_float(grid.get(day, {}).get("negative")),
+                solar_generation=parse_float(
+                    solar.get(day, {}).get("powerGeneration")
+                ),
+            )
+            for day in grid.keys() | solar.keys()
+        }
+        return cls(None, days).rollover(current)
+
+
+@dataclass(frozen=True, slots=True)
+class LivoltekSnapshot:
+    """Everything the entities of a site read, produced once per update.
+
+    A new snapshot replaces the previous one as a whole, so entities never
+    observe a half-applied update.
+    """
+
+    power_flow: PowerFlow | None = None
+    energy_storage: EnergyStorageIndex | None = None
+    daily: DailyEnergyBuffer = DailyEnergyBuffer()
+    generation: Mapping[str, DeviceGeneration] = field(default_factory=dict)
+    # Built from results saved before a restart, not yet refreshed.
+    restored: bool = False
+
+    @property
+    def today(self) -> DailyEnergy:
+        """Return the grid and solar totals of the site's current day."""
+        return self.daily.today
+
+    @property
+    def battery_soc(self) -> float | None:
+        """Return battery SOC, preferring /ESS and falling back to curPowerflow."""
+        if self.energy_storage is not None:
+            soc = self.energy_storage.battery_soc
+            if soc is not None:
+                return soc
+        if self.power_flow is not None:
+            return self.power_flow.energy_soc
+        return None
+
+
+def _rows_by_day(rows: Any, timezone: dt.tzinfo) -> dict[dt.date, Mapping[str, Any]]:
+    """Return the last row of a daily series for each day in ``timezone``."""
+    days: dict[dt.date, Mapping[str, Any]] = {}
+    for row in rows or ():
+        try:
+            day = dt.datetime.fromtimestamp(int(row["ts"]) / 1000, timezone).date()
+        except (KeyError, TypeError, ValueError):
+            continue
+        days[day] = row
+    return days
+
+
+def _history_rows(history_map: Any) -> Iterator[tuple[int, int, Any]]:
+    """Yield ``(time, position, item)`` for every item in a historyMap.
+
+    Buckets hold a single item or a list of them. Items without their own
+    ``time`` take the bucket key as their timestamp.
+    """
+    if not isinstance(history_map, Mapping):
+        return
+
+    position = 0
+    for bucket_key, bucket_values in history_map.items():
+        try:
+            bucket_ts = int(bucket_key)
+        except (TypeError, ValueError):
+            bucket_ts = -1
+        if not isinstance(bucket_values, list):
+            bucket_values = [bucket_values]
+        for item in bucket_values:
+            if not isinstance(item, Mapping):
+                continue
+            try:
+                item_ts = int(item.get("time", bucket_ts))
+            except (TypeError, ValueError):
+                item_ts = bucket_ts
+            # The position keeps the sort stable without comparing items.
+            yield item_ts, position, item
+            position += 1
@@ -0,0 +1,191 @@
+"""Per-endpoint refresh schedules for the Livoltek coordinator."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from statistics import median
+from typing import Any, Final
+
+from .const import (
+    ENDPOINT_DEVICE_GENERATION,
+    ENDPOINT_DEVICES,
+    ENDPOINT_ENERGY_STORAGE,
+    ENDPOINT_POWER_FLOW,
+    ENDPOINT_RECENT_GRID,
+    ENDPOINT_RECENT_SOLAR,
+    ENDPOINT_SITE,
+    SCAN_INTERVAL,
+)
+
+# Endpoints due within this many seconds are fetched on the current tick
+# rather than forcing a separate tick just for them.
+DUE_TOLERANCE: Final = 5.0
+
+# A failed endpoint is retried after this many seconds, or its interval if
+# that is shorter, while its last good result is kept.
+RETRY_DELAY: Final = 60.0
+
+# Adaptive power flow polling: poll this long after the expected upload, keep
+# the delay within these bounds, and learn from this many upload intervals.
+UPLOAD_GRACE: Final = 20.0
+MIN_POLL_DELAY: Final = 30.0
+MAX_POLL_DELAY: Final = 300.0
+CADENCE_SAMPLES: Final = 8
+
+
+@dataclass(frozen=True, slots=True)
+class EndpointPolicy:
+    """Refresh interval and staleness budget of one endpoint."""
+
+    interval: timedelta
+    max_age: timedelta
+
+
+DEFAULT_ENDPOINT_POLICIES: Final[dict[str, EndpointPolicy]] = {
+    ENDPOINT_POWER_FLOW: EndpointPolicy(
+        interval=SCAN_INTERVAL, max_age=timedelta(minutes=10)
+    ),
+    ENDPOINT_ENERGY_STORAGE: EndpointPolicy(
+        interval=timedelta(minutes=5), max_age=timedelta(minutes=30)
+    ),
+    ENDPOINT_RECENT_GRID: EndpointPolicy(
+        interval=timedelta(minutes=10), max_age=timedelta(hours=1)
+    ),
+    ENDPOINT_RECENT_SOLAR: EndpointPolicy(
+        interval=timedelta(minutes=10), max_age=timedelta(hours=1)
+    ),
+    ENDPOINT_DEVICE_GENERATION: EndpointPolicy(
+        interval=timedelta(minutes=15), max_age=timedelta(hours=1)
+    ),
+    ENDPOINT_SITE: EndpointPolicy(
+        interval=timedelta(hours=1), max_age=timedelta(days=1)
+    ),
+    ENDPOINT_DEVICES: EndpointPolicy(
+        interval=timedelta(hours=6), max_age=timedelta(days=1)
+    ),
+}
+
+
+class EndpointState:
+    """Last good result of one endpoint, its last error and when it is next due.
+
+    Times are ``time.monotonic()`` readings passed in by the caller.
+    """
+
+    __slots__ = ("policy", "data", "fetched_at", "next_due", "error", "failures")
+
+    def __init__(self, policy: EndpointPolicy) -> None:
+        """Initialize an endpoint that has never been fetched."""
+        self.policy = policy
+        self.data: Any = None
+        self.fetched_at: float | None = None
+        self.next_due = 0.0
+        self.error: str | None = None
+        self.failures = 0
+
+    def is_due(self, now: float) -> bool:
+        """Return whether the endpoint should be fetched on this tick."""
+        return now + DUE_TOLERANCE >= self.next_due
+
+    def record(self, data: Any, now: float, delay: float | None = None) -> None:
+        """Store a fresh result and schedule the next fetch.
+
+        The next fetch is one policy interval away unless ``delay`` is given.
+        """
+        self.data = data
+        self.fetched_at = now
+        self.error = None
+        self.failures = 0
+        if delay is None:
+            delay = self.policy.interval.total_seconds()
+        self.next_due = now + delay
+
+    def record_failure(
+        self, error: BaseException, now: float, delay: float | None = None
+    ) -> None:
+        """Note a failed fetch, keeping the last good result until it expires.
+
+        The fetch is retried after ``delay``, or by default after the retry
+        delay or the policy interval, whichever is shorter.
+        """
+        self.error = str(error) or type(error).__name__
+        self.failures += 1
+        if delay is None:
+            delay = min(self.policy.interval.total_seconds(), RETRY_DELAY)
+        self.next_due = now + delay
+
+    def age(self, now: float) -> float | None:
+        """Return how many seconds ago the last good result was fetched."""
+        if self.fetched_at is None:
+            return None
+        return now - self.fetched_at
+
+    def expire(self, now: float) -> None:
+        """Drop the result once it is older than the staleness budget."""
+        if (
+            self.fetched_at is not None
+            and now - self.fetched_at > self.policy.max_age.total_seconds()
+        ):
+            self.data = None
+
+
+class UploadCadence:
+    """Learn how often the inverter uploads data to the Livoltek cloud.
+
+    Upload times are the upstream data timestamps in epoch seconds. The
+    cadence is the median gap between uploads that were seen to advance.
+    """
+
+    __slots__ = ("last_upload", "stale_polls", "_intervals")
+
+    def __init__(self) -> None:
+        """Initialize with nothing learned yet."""
+        self.last_upload: float | None = None
+        self.stale_polls = 0
+        self._intervals: deque[float] = deque(maxlen=CADENCE_SAMPLES)
+
+    @property
+    def cadence(self) -> float | None:
+        """Return the learned upload interval in seconds."""
+        if not self._intervals:
+            return None
+        return median(self._intervals)
+
+    def observe(self, upload: float | None, *, polled: bool = True) -> bool:
+        """Record an upstream timestamp and return whether it advanced.
+
+        Only ``polled`` observations, made by the poll being scheduled, count
+        as a poll that found no new data.
+        """
+        if upload is None:
+            return False
+
+        if self.last_upload is None or upload > self.last_upload:
+            if self.last_upload is not None:
+                self._intervals.append(upload - self.last_upload)
+            self.last_upload = upload
+            self.stale_polls = 0
+            return True
+
+        if polled:
+            self.stale_polls += 1
+        return False
+
+    def next_delay(self, now: float, default: float) -> float:
+        """Return the seconds to wait before the next poll.
+
+        ``now`` is the current epoch time. Without a learned cadence the
+        ``default`` interval is used. Otherwise the poll lands just after the
+        next expected upload, backing off while the data does not advance.
+        """
+        cadence = self.cadence
+        if cadence is None or self.last_upload is None:
+            return default
+
+        if self.stale_polls:
+            delay = min(UPLOAD_GRACE * 2**self.stale_polls, cadence)
+        else:
+            delay = self.last_upload + cadence + UPLOAD_GRACE - now
+
+        return min(max(delay, MIN_POLL_DELAY), MAX_POLL_DELAY)
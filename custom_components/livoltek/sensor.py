@@ -5,8 +5,6 @@ from collections.abc import Callable
 import dataclasses
 from typing import Any
 
-from pylivoltek.api import DefaultApi
-
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
@@ -14,24 +12,42 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 
-from homeassistant.const import PERCENTAGE, UnitOfPower, UnitOfEnergy
+from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfEnergy,
+    UnitOfInformation,
+    UnitOfPower,
+    UnitOfTime,
+)
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, CONF_SITE_ID
-from . import LivoltekInverterDevice, LivoltekDataUpdateCoordinator
+from .const import (
+    CONF_SITE_ID,
+    DOMAIN,
+    ENDPOINT_DEVICE_GENERATION,
+    ENDPOINT_DEVICES,
+    ENDPOINT_ENERGY_STORAGE,
+    ENDPOINT_POWER_FLOW,
+    ENDPOINT_RECENT_GRID,
+    ENDPOINT_RECENT_SOLAR,
+)
+from .coordinator import LivoltekDataUpdateCoordinator
 from .entity import LivoltekEntity
+from .metrics import EndpointMetrics
+from .models import DeviceGeneration, LivoltekSnapshot
 
 
 @dataclasses.dataclass(frozen=True)
 class LivoltekRequiredKeysMixin:
     """Mixin for required keys."""
 
-    value_fn: Callable[[Any], float]
-    enabled: Callable[[Any], bool]
+    value_fn: Callable[[LivoltekSnapshot], float | None]
+    enabled: Callable[[LivoltekSnapshot], bool]
 
 
 @dataclasses.dataclass(frozen=True, kw_only=True)
@@ -40,79 +56,17 @@ class LivoltekSensorEntityDescription(
 ):
     """Describes Livoltek sensor entity."""
 
-def _get_pf(coordinator, attr: str, json_key: str):
-    """Get a value from current_power_flow (works with dict or object)."""
-    pf = coordinator.current_power_flow
-    if pf is None:
-        return None
-    if isinstance(pf, dict):
-        return pf.get(json_key)
-    return getattr(pf, attr, None)
-
-def _battery_soc(coordinator: Any) -> float | None:
-    """Return battery SOC, preferring /ESS and falling back to curPowerflow."""
-    ess = coordinator.energy_storage
-
-    def _as_float(value: Any) -> float | None:
-        if value in (None, ""):
-            return None
-        if isinstance(value, str) and value.lower() == "unknown":
-            return None
-        try:
-            return float(value)
-        except (TypeError, ValueError):
+    endpoints: frozenset[str] = frozenset()
+
+def _power_flow(attr: str) -> Callable[[LivoltekSnapshot], float | None]:
+    """Return a reader for one field of the current power flow."""
+
+    def _read(snapshot: LivoltekSnapshot) -> float | None:
+        if snapshot.power_flow is None:
             return None
+        return getattr(snapshot.power_flow, attr)
 
-    if ess is not None:
-        value = None
-
-        if isinstance(ess, dict):
-            value = ess.get("current_soc")
-            if _as_float(value) is None:
-                value = ess.get("currentSoc")
-
-            if _as_float(value) is None:
-                history_map = ess.get("historyMap") or {}
-                if isinstance(history_map, dict):
-                    latest_ts = None
-                    latest_soc = None
-                    for bucket_key, bucket_values in history_map.items():
-                        try:
-                            bucket_ts = int(bucket_key)
-                        except (TypeError, ValueError):
-                            bucket_ts = -1
-                        if not isinstance(bucket_values, list):
-                            continue
-                        for item in bucket_values:
-                            if not isinstance(item, dict):
-                                continue
-                            soc = item.get("energySoc")
-                            parsed_soc = _as_float(soc)
-                            if parsed_soc is None:
-                                continue
-                            item_ts = item.get("time", bucket_ts)
-                            try:
-                                item_ts = int(item_ts)
-                            except (TypeError, ValueError):
-                                item_ts = bucket_ts
-                            if latest_ts is None or item_ts >= latest_ts:
-                                latest_ts = item_ts
-                                latest_soc = parsed_soc
-                    value = latest_soc
-        else:
-            value = getattr(ess, "current_soc", None)
-            if _as_float(value) is None:
-                value = getattr(ess, "currentSoc", None)
-
-        parsed_soc = _as_float(value)
-        if parsed_soc is not None:
-            return parsed_soc
-
-    if coordinator.current_power_flow is not None:
-        value = _get_pf(coordinator, "energy_soc", "energySoc")
-        return _as_float(value)
-
-    return None
+    return _read
 
 SENSORS = [
     LivoltekSensorEntityDescription(
@@ -122,8 +76,9 @@ SENSORS = [
         native_unit_of_measurement=PERCENTAGE,
         state_class=SensorStateClass.MEASUREMENT,
         suggested_display_precision=1,
-        enabled=lambda x: x.energy_storage is not None or x.current_power_flow is not None,
-        value_fn=_battery_soc,
+        enabled=lambda x: x.energy_storage is not None or x.power_flow is not None,
+        endpoints=frozenset({ENDPOINT_ENERGY_STORAGE, ENDPOINT_POWER_FLOW}),
+        value_fn=lambda x: x.battery_soc,
     ),
     LivoltekSensorEntityDescription(
         key="power_grid_power",
@@ -132,8 +87,9 @@ SENSORS = [
         native_unit_of_measurement=UnitOfPower.KILO_WATT,
         state_class=SensorStateClass.MEASUREMENT,
         suggested_display_precision=2,
-        enabled=lambda x: x.current_power_flow is not None,
-        value_fn=lambda x: _get_pf(x, "power_grid_power", "powerGridPower"),
+        enabled=lambda x: x.power_flow is not None,
+        endpoints=frozenset({ENDPOINT_POWER_FLOW}),
+        value_fn=_power_flow("power_grid_power"),
     ),
     LivoltekSensorEntityDescription(
         key="pv_power",
@@ -142,8 +98,9 @@ SENSORS = [
         native_unit_of_measurement=UnitOfPower.KILO_WATT,
         state_class=SensorStateClass.MEASUREMENT,
         suggested_display_precision=2,
-        enabled=lambda x: x.current_power_flow is not None,
-        value_fn=lambda x: _get_pf(x, "pv_power", "pvPower"),
+        enabled=lambda x: x.power_flow is not None,
+        endpoints=frozenset({ENDPOINT_POWER_FLOW}),
+        value_fn=_power_flow("pv_power"),
     ),
     LivoltekSensorEntityDescription(
         key="load_power",
@@ -152,8 +109,9 @@ SENSORS = [
         native_unit_of_measurement=UnitOfPower.KILO_WATT,
         state_class=SensorStateClass.MEASUREMENT,
         suggested_display_precision=2,
-        enabled=lambda x: x.current_power_flow is not None,
-        value_fn=lambda x: _get_pf(x, "load_power", "loadPower"),
+        enabled=lambda x: x.power_flow is not None,
+        endpoints=frozenset({ENDPOINT_POWER_FLOW}),
+        value_fn=_power_flow("load_power"),
     ),
     LivoltekSensorEntityDescription(
         key="energy_power",
@@ -162,8 +120,9 @@ SENSORS = [
         native_unit_of_measurement=UnitOfPower.KILO_WATT,
         state_class=SensorStateClass.MEASUREMENT,
         suggested_display_precision=2,
-        enabled=lambda x: x.current_power_flow is not None,
-        value_fn=lambda x: _get_pf(x, "energy_power", "energyPower"),
+        enabled=lambda x: x.power_flow is not None,
+        endpoints=frozenset({ENDPOINT_POWER_FLOW}),
+        value_fn=_power_flow("energy_power"),
     ),
     LivoltekSensorEntityDescription(
         key="grid_import_energy",
@@ -172,8 +131,9 @@ SENSORS = [
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
         suggested_display_precision=1,
-        enabled=lambda x: x.todays_grid["positive"] is not None,
-        value_fn=lambda x: float(x.todays_grid["positive"]) if x.todays_grid else None,
+        enabled=lambda x: x.today.grid_import is not None,
+        endpoints=frozenset({ENDPOINT_RECENT_GRID}),
+        value_fn=lambda x: x.today.grid_import,
     ),
     LivoltekSensorEntityDescription(
         key="grid_export_energy",
@@ -182,8 +142,9 @@ SENSORS = [
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
         suggested_display_precision=1,
-        enabled=lambda x: x.todays_grid["negative"] is not None,
-        value_fn=lambda x: float(x.todays_grid["negative"]) if x.todays_grid else None,
+        enabled=lambda x: x.today.grid_export is not None,
+        endpoints=frozenset({ENDPOINT_RECENT_GRID}),
+        value_fn=lambda x: x.today.grid_export,
     ),
     LivoltekSensorEntityDescription(
         key="solar_generation_energy",
@@ -192,10 +153,93 @@ SENSORS = [
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
         suggested_display_precision=1,
-        enabled=lambda x: x.todays_solar["powerGeneration"] is not None,
-        value_fn=lambda x: float(x.todays_solar["powerGeneration"])
-        if x.todays_solar
-        else None,
+        enabled=lambda x: x.today.solar_generation is not None,
+        endpoints=frozenset({ENDPOINT_RECENT_SOLAR}),
+        value_fn=lambda x: x.today.solar_generation,
+    ),
+]
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class LivoltekDeviceSensorEntityDescription(SensorEntityDescription):
+    """Describes a per-inverter Livoltek sensor entity."""
+
+    value_fn: Callable[[DeviceGeneration], float | None]
+    endpoints: frozenset[str] = frozenset(
+        {ENDPOINT_DEVICE_GENERATION, ENDPOINT_DEVICES}
+    )
+
+
+DEVICE_SENSORS = [
+    LivoltekDeviceSensorEntityDescription(
+        key="pv_produce_electric",
+        translation_key="pv_produce_electric",
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        suggested_display_precision=1,
+        value_fn=lambda x: x.pv_produce_electric,
+    ),
+    LivoltekDeviceSensorEntityDescription(
+        key="load_customer_electric",
+        translation_key="load_customer_electric",
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        suggested_display_precision=1,
+        value_fn=lambda x: x.load_customer_electric,
+    ),
+]
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class LivoltekMetricSensorEntityDescription(SensorEntityDescription):
+    """Describes a request metric of one Livoltek endpoint."""
+
+    value_fn: Callable[[EndpointMetrics], Any]
+    attributes_fn: Callable[[EndpointMetrics], dict[str, Any]] | None = None
+    entity_category: EntityCategory | None = EntityCategory.DIAGNOSTIC
+    entity_registry_enabled_default: bool = False
+    # The metrics are kept for every endpoint; reading them fetches nothing.
+    endpoints: frozenset[str] = frozenset()
+
+
+METRIC_SENSORS = [
+    LivoltekMetricSensorEntityDescription(
+        key="requests",
+        translation_key="endpoint_requests",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda x: x.calls,
+    ),
+    LivoltekMetricSensorEntityDescription(
+        key="errors",
+        translation_key="endpoint_errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda x: x.error_count,
+        attributes_fn=lambda x: dict(x.errors),
+    ),
+    LivoltekMetricSensorEntityDescription(
+        key="latency",
+        translation_key="endpoint_latency",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=2,
+        value_fn=lambda x: x.last_latency,
+        attributes_fn=lambda x: x.histogram(),
+    ),
+    LivoltekMetricSensorEntityDescription(
+        key="response_size",
+        translation_key="endpoint_response_size",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda x: x.response_bytes,
+    ),
+    LivoltekMetricSensorEntityDescription(
+        key="last_success",
+        translation_key="endpoint_last_success",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=lambda x: x.last_success,
     ),
 ]
 
@@ -208,42 +252,47 @@ async def async_setup_entry(
     coordinator: LivoltekDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
     site_id = entry.data[CONF_SITE_ID]
 
-    entities: list[LivoltekValueSensor] = [
+    entities: list[SensorEntity] = [
         LivoltekValueSensor(coordinator, site_id, description)
         for description in SENSORS
-        if description.enabled(coordinator)
+        if description.enabled(coordinator.data)
     ]
+    entities.extend(
+        LivoltekMetricSensor(coordinator, site_id, endpoint, description)
+        for endpoint in coordinator.metrics
+        for description in METRIC_SENSORS
+    )
 
     async_add_entities(entities)
 
+    # Inverters come from the device list; ones added to the site later get
+    # their sensors on the first refresh that lists them.
+    serials: set[str] = set()
+
+    @callback
+    def _async_add_device_sensors() -> None:
+        """Add the lifetime sensors of inverters not seen before."""
+        devices = coordinator.devices if isinstance(coordinator.devices, list) else []
+        new_devices = [
+            device
+            for device in devices
+            if device.get("inverterSn")
+            and device.get("id") is not None
+            and device["inverterSn"] not in serials
+        ]
+        if not new_devices:
+            return
+        serials.update(device["inverterSn"] for device in new_devices)
+        async_add_entities(
+            LivoltekDeviceSensor(
+                coordinator, device["inverterSn"], device["id"], description
+            )
+            for device in new_devices
+            for description in DEVICE_SENSORS
+        )
 
-class LivoltekInverterSensor(SensorEntity):
-    """Representation of a Livoltek Inverter Sensor."""
-
-    entity_description: LivoltekSensorEntityDescription
-    _attr_has_entity_name = True
-
-    def __init__(
-        self,
-        api: DefaultApi,
-        device: LivoltekInverterDevice,
-        description: LivoltekSensorEntityDescription,
-    ) -> None:
-        """Initialize the sensor."""
-        self._api = api
-        self._device = device
-        self.entity_description = description
-        self._attr_unique_id = f"{device.inverter_sn}-{device.id}-{description.key}"
-        self._attr_device_info = {}
-
-    @property
-    def native_value(self) -> float | None:
-        """Return the state of the sensor."""
-        return self.entity_description.value_fn(self._api)
-
-    async def async_update(self) -> None:
-        """Retrieve latest state."""
-        await self._api.async_update()
+    _async_add_device_sensors()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_device_sensors))
 
 
 class LivoltekValueSensor(LivoltekEntity, SensorEntity):
@@ -267,8 +316,8 @@ class LivoltekValueSensor(LivoltekEntity, SensorEntity):
         self._attr_unique_id = f"{site_id}-{description.key}"
 
         site_name = "Livoltek"
-        if coordinator.site and hasattr(coordinator.site, "name") and coordinator.site.name:
-            site_name = coordinator.site.name
+        if isinstance(coordinator.site, dict) and coordinator.site.get("name"):
+            site_name = coordinator.site["name"]
 
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, site_id)},
@@ -280,4 +329,112 @@ class LivoltekValueSensor(LivoltekEntity, SensorEntity):
     @property
     def native_value(self) -> float | int | None:
         """Return the sensor value."""
-        return self.entity_description.value_fn(self.coordinator)
+        return self.entity_description.value_fn(self.coordinator.data)
+
+    @property
+    def _state_value(self) -> float | int | None:
+        """Compare the raw value, which is cheaper than the rendered state."""
+        return self.native_value
+
+
+class LivoltekDeviceSensor(LivoltekEntity, SensorEntity):
+    """Representation of a lifetime counter of one Livoltek inverter."""
+
+    entity_description: LivoltekDeviceSensorEntityDescription
+    _attr_has_entity_name = True
+
+    def __init__(
+        self,
+        coordinator: LivoltekDataUpdateCoordinator,
+        serial: str,
+        device_id: Any,
+        description: LivoltekDeviceSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor of the inverter with the given device list id."""
+
+        super().__init__(coordinator)
+
+        self.entity_description = description
+        self._serial = serial
+        self._attr_unique_id = f"{serial}-{description.key}"
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, device_id)})
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the sensor value."""
+        generation = self.coordinator.data.generation.get(self._serial)
+        if generation is None:
+            return None
+        return self.entity_description.value_fn(generation)
+
+    @property
+    def _state_value(self) -> float | None:
+        """Compare the raw value, which is cheaper than the rendered state."""
+        return self.native_value
+
+
+class LivoltekMetricSensor(LivoltekEntity, SensorEntity):
+    """Representation of a request metric of one Livoltek endpoint."""
+
+    entity_description: LivoltekMetricSensorEntityDescription
+    _attr_has_entity_name = True
+
+    def __init__(
+        self,
+        coordinator: LivoltekDataUpdateCoordinator,
+        site_id: str,
+        endpoint: str,
+        description: LivoltekMetricSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+
+        super().__init__(coordinator)
+
+        self.entity_description = description
+        self._endpoint = endpoint
+        self._attr_unique_id = f"{site_id}-{endpoint}-{description.key}"
+        self._attr_translation_placeholders = {
+            "endpoint": endpoint.replace("_", " ").title()
+        }
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, site_id)})
+
+    @property
+    def native_value(self) -> Any:
+        """Return the sensor value."""
+        return self.entity_description.value_fn(
+            self.coordinator.metrics[self._endpoint]
+        )
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the breakdown behind the value, if the metric has one."""
+        attributes = super().extra_state_attributes
+        if self.entity_description.attributes_fn is None:
+            return attributes
+        return {
+            **(attributes or {}),
+            **self.entity_description.attributes_fn(
+                self.coordinator.metrics[self._endpoint]
+            ),
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Write the metrics after every refresh, not only when the data changes."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_metrics_listener(self._handle_metrics_update)
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Leave the write to the metrics listener, which runs after every refresh."""
+
+    @callback
+    def _handle_metrics_update(self) -> None:
+        """Write the state if the metric or its breakdown changed."""
+        super()._handle_coordinator_update()
+
+    @property
+    def _state_value(self) -> Any:
+        """Compare the raw value and its breakdown, not the rendered state."""
+        return (self.native_value, self.extra_state_attributes)
@@ -0,0 +1,77 @@
+"""Persistent copy of the last good endpoint results of a site."""
+from __future__ import annotations
+
+import dataclasses
+from typing import Any, Final
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, ENDPOINT_DEVICE_GENERATION
+from .models import DeviceGeneration
+
+STORAGE_VERSION: Final = 1
+SAVE_DELAY: Final = 30
+
+
+def encode_payload(key: str, payload: Any) -> Any:
+    """Return an endpoint result in a form the store can write as JSON."""
+    if key == ENDPOINT_DEVICE_GENERATION and payload is not None:
+        return {
+            serial: dataclasses.asdict(generation)
+            for serial, generation in payload.items()
+        }
+    return payload
+
+
+def decode_payload(key: str, payload: Any) -> Any:
+    """Return an endpoint result read back from the store."""
+    if key == ENDPOINT_DEVICE_GENERATION and payload is not None:
+        return {
+            serial: DeviceGeneration(**generation)
+            for serial, generation in payload.items()
+        }
+    return payload
+
+
+class SnapshotStore:
+    """The endpoint results a site's snapshot was last built from.
+
+    Restoring them lets the entities show their last known values as soon as
+    the entry is set up, while the first refresh runs in the background.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the store of one config entry."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot"
+        )
+
+    async def async_load(self) -> tuple[float, dict[str, Any]] | None:
+        """Return when the results were saved, in epoch seconds, and the results."""
+        data = await self._store.async_load()
+        if not data:
+            return None
+        return data["saved_at"], {
+            key: decode_payload(key, payload)
+            for key, payload in data["endpoints"].items()
+        }
+
+    def async_save(self, saved_at: float, endpoints: dict[str, Any]) -> None:
+        """Schedule a write of the current results.
+
+        Empty results are kept: an endpoint may have answered with no data,
+        like the battery status of a site without a battery.
+        """
+        data = {
+            "saved_at": saved_at,
+            "endpoints": {
+                key: encode_payload(key, payload)
+                for key, payload in endpoints.items()
+            },
+        }
+        self._store.async_delay_save(lambda: data, SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        """Delete the stored results."""
+        await self._store.async_remove()
@@ -0,0 +1,294 @@
+"""Import of Livoltek history into Home Assistant long-term statistics."""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+import datetime as dt
+from datetime import datetime, timedelta
+from typing import Any, Final
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    statistics_during_period,
+)
+from homeassistant.const import (
+    PERCENTAGE,
+    UnitOfElectricPotential,
+    UnitOfEnergy,
+    UnitOfPower,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DOMAIN, LOGGER
+from .models import DailyEnergyBuffer, EnergyStorageIndex
+
+STORAGE_VERSION: Final = 1
+SAVE_DELAY: Final = 10
+
+# Hourly rows handed to the recorder per call.
+STATISTICS_BATCH_SIZE: Final = 48
+
+# (key, name, unit, EnergyStorageIndex series) of the /ESS statistics.
+ENERGY_STORAGE_STATISTICS: Final = (
+    ("battery_soc", "Battery SoC", PERCENTAGE, "soc"),
+    ("battery_power", "Battery Power", UnitOfPower.KILO_WATT, "power"),
+    ("battery_voltage", "Battery Voltage", UnitOfElectricPotential.VOLT, "voltage"),
+)
+
+# (key, name, DailyEnergy field) of the daily grid and solar statistics.
+DAILY_ENERGY_STATISTICS: Final = (
+    ("grid_import_energy", "Grid Import", "grid_import"),
+    ("grid_export_energy", "Grid Export", "grid_export"),
+    ("solar_generation_energy", "Solar Generation", "solar_generation"),
+)
+
+# How far before the daily series existing statistics are read, to find the
+# running sum the series continues from. Statistics without a row in that
+# window are read again without a start, so a longer gap keeps the sum.
+RECONCILE_LOOKBACK: Final = timedelta(days=7)
+
+WATERMARK_ENERGY_STORAGE: Final = "energy_storage"
+
+
+def statistic_id(site_id: str, key: str) -> str:
+    """Return the external statistic ID of one series of a site."""
+    return f"{DOMAIN}:{slugify(f'{site_id}_{key}')}"
+
+
+def hour_start(moment: datetime) -> datetime:
+    """Return the start of the UTC hour containing ``moment``."""
+    return dt_util.as_utc(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def hourly_statistics(
+    times: Sequence[int], values: Sequence[float | None], after: int, before: int
+) -> list[StatisticData]:
+    """Aggregate samples into hourly mean, min and max rows.
+
+    Only samples with ``after <= time < before`` (epoch milliseconds) are
+    used. ``times`` must be sorted.
+    """
+    rows: list[StatisticData] = []
+    bucket: list[float] = []
+    start: datetime | None = None
+
+    def _flush() -> None:
+        if start is not None and bucket:
+            rows.append(
+                StatisticData(
+                    start=start,
+                    mean=sum(bucket) / len(bucket),
+                    min=min(bucket),
+                    max=max(bucket),
+                )
+            )
+
+    for time, value in zip(times, values):
+        if value is None or not after <= time < before:
+            continue
+        sample_hour = hour_start(dt_util.utc_from_timestamp(time / 1000))
+        if sample_hour != start:
+            _flush()
+            start, bucket = sample_hour, []
+        bucket.append(value)
+    _flush()
+    return rows
+
+
+def daily_values(
+    daily: DailyEnergyBuffer, attr: str, timezone: dt.tzinfo
+) -> list[tuple[datetime, float]]:
+    """Return ``(start, value)`` for every day of the buffer with a value.
+
+    ``start`` is the hour the day begins in at the site, and days are sorted
+    oldest first.
+    """
+    return [
+        (hour_start(datetime.combine(day, dt.time(), timezone)), value)
+        for day, energy in sorted(daily.days.items())
+        if (value := getattr(energy, attr)) is not None
+    ]
+
+
+def _differs(known: float | None, value: float) -> bool:
+    """Return whether a stored value does not match the expected one."""
+    return known is None or abs(known - value) > 1e-6
+
+
+def reconcile_rows(
+    days: Sequence[tuple[datetime, float]], existing: Sequence[Mapping[str, Any]]
+) -> list[StatisticData]:
+    """Return the daily rows missing from or different in ``existing``.
+
+    ``existing`` are the stored rows of the statistic, oldest first. The
+    running sum continues from the last stored row before the first day.
+    """
+    if not days:
+        return []
+
+    first = days[0][0].timestamp()
+    total = 0.0
+    stored: dict[float, Mapping[str, Any]] = {}
+    for row in existing:
+        if row["start"] < first:
+            total = row.get("sum") or total
+        else:
+            stored[row["start"]] = row
+
+    rows: list[StatisticData] = []
+    for start, value in days:
+        total += value
+        known = stored.get(start.timestamp(), {})
+        if _differs(known.get("state"), value) or _differs(known.get("sum"), total):
+            rows.append(StatisticData(start=start, state=value, sum=total))
+    return rows
+
+
+class LivoltekStatistics:
+    """Write the history returned by the API into the recorder.
+
+    A watermark per source is kept in the entry's store, so each update only
+    imports the hours completed since the last one.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, site_id: str) -> None:
+        """Initialize the importer of one site."""
+        self.hass = hass
+        self.site_id = site_id
+        self._store: Store[dict[str, int]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.statistics"
+        )
+        self.watermarks: dict[str, int] = {}
+        self._loaded = False
+
+    async def async_load(self) -> None:
+        """Load the watermarks from disk once."""
+        if self._loaded:
+            return
+        self.watermarks = await self._store.async_load() or {}
+        self._loaded = True
+
+    def _async_add(
+        self,
+        key: str,
+        name: str,
+        unit: str,
+        rows: list[StatisticData],
+        *,
+        has_sum: bool = False,
+    ) -> None:
+        """Hand the rows of one series to the recorder in batches."""
+        metadata = StatisticMetaData(
+            has_mean=not has_sum,
+            has_sum=has_sum,
+            name=name,
+            source=DOMAIN,
+            statistic_id=statistic_id(self.site_id, key),
+            unit_of_measurement=unit,
+        )
+        for offset in range(0, len(rows), STATISTICS_BATCH_SIZE):
+            async_add_external_statistics(
+                self.hass, metadata, rows[offset : offset + STATISTICS_BATCH_SIZE]
+            )
+
+    async def async_import_energy_storage(
+        self, index: EnergyStorageIndex, now: datetime
+    ) -> int:
+        """Import the completed hours of the /ESS history.
+
+        Returns the number of hours imported. The hour in progress is left
+        for a later update, when all of its samples are known.
+        """
+        await self.async_load()
+        after = self.watermarks.get(WATERMARK_ENERGY_STORAGE, 0)
+        before = int(hour_start(now).timestamp() * 1000)
+
+        imported: list[datetime] = []
+        for key, name, unit, series in ENERGY_STORAGE_STATISTICS:
+            rows = hourly_statistics(index.times, getattr(index, series), after, before)
+            if rows:
+                self._async_add(key, name, unit, rows)
+                imported.extend(row["start"] for row in rows)
+
+        if not imported:
+            return 0
+
+        last = max(imported) + timedelta(hours=1)
+        self.watermarks[WATERMARK_ENERGY_STORAGE] = int(last.timestamp() * 1000)
+        self._store.async_delay_save(lambda: self.watermarks, SAVE_DELAY)
+        hours = len(set(imported))
+        LOGGER.debug("Imported %s hours of battery history for %s", hours, self.site_id)
+        return hours
+
+    async def async_reconcile_daily_energy(
+        self, daily: DailyEnergyBuffer, timezone: dt.tzinfo
+    ) -> int:
+        """Bring the daily grid and solar statistics in line with the API.
+
+        The recent series cover a few days and are revised after the fact.
+        Only the days that are missing from the recorder, or whose value or
+        running sum changed, are written. Returns the number of rows written.
+        """
+        wanted = {
+            key: days
+            for key, _, attr in DAILY_ENERGY_STATISTICS
+            if (days := daily_values(daily, attr, timezone))
+        }
+        if not wanted:
+            return 0
+
+        ids = {key: statistic_id(self.site_id, key) for key in wanted}
+        first = min(days[0][0] for days in wanted.values())
+        existing = await self._async_statistics(
+            first - RECONCILE_LOOKBACK, None, set(ids.values())
+        )
+        if missing := {
+            statistic
+            for statistic in ids.values()
+            if not any(
+                row["start"] < first.timestamp()
+                for row in existing.get(statistic, ())
+            )
+        }:
+            earlier = await self._async_statistics(
+                dt_util.utc_from_timestamp(0), first, missing
+            )
+            for statistic, rows in earlier.items():
+                existing[statistic] = [*rows[-1:], *existing.get(statistic, ())]
+
+        written = 0
+        for key, name, _ in DAILY_ENERGY_STATISTICS:
+            if key not in wanted:
+                continue
+            rows = reconcile_rows(wanted[key], existing.get(ids[key], []))
+            if rows:
+                self._async_add(
+                    key, name, UnitOfEnergy.KILO_WATT_HOUR, rows, has_sum=True
+                )
+                written += len(rows)
+
+        if written:
+            LOGGER.debug("Reconciled %s daily energy rows for %s", written, self.site_id)
+        return written
+
+    async def _async_statistics(
+        self, start: datetime, end: datetime | None, ids: set[str]
+    ) -> dict[str, list[Mapping[str, Any]]]:
+        """Read the stored hourly state and sum of statistics, oldest first."""
+        return await get_instance(self.hass).async_add_executor_job(
+            statistics_during_period,
+            self.hass,
+            start,
+            end,
+            ids,
+            "hour",
+            None,
+            {"state", "sum"},
+        )
+
+    async def async_remove(self) -> None:
+        """Delete the stored watermarks."""
+        await self._store.async_remove()
@@ -5,6 +5,8 @@ import datetime as dt
 from types import SimpleNamespace
 from typing import Any
 
+from custom_components.livoltek.models import DailyEnergy, DailyEnergyBuffer
+
 
 def midday_timestamp_ms(day: dt.date) -> int:
     """Build a stable midday timestamp in milliseconds for a given day."""
@@ -12,6 +14,12 @@ def midday_timestamp_ms(day: dt.date) -> int:
     return int(value.timestamp() * 1000)
 
 
+def build_daily_energy(**totals: Any) -> DailyEnergyBuffer:
+    """Create a day buffer whose current day has the given totals."""
+    day = dt.date(2024, 5, 1)
+    return DailyEnergyBuffer(day, {day: DailyEnergy(**totals)})
+
+
 def build_power_flow(**overrides: Any) -> SimpleNamespace:
     """Create a fake current power flow object."""
     payload = {
@@ -25,17 +33,17 @@ def build_power_flow(**overrides: Any) -> SimpleNamespace:
     return SimpleNamespace(**payload)
 
 
-def build_device_details(**overrides: Any) -> SimpleNamespace:
-    """Create a fake device details object."""
+def build_device_details(**overrides: Any) -> dict[str, Any]:
+    """Create a fake device details response."""
     payload = {
         "id": "device-1",
-        "device_manufacturer": "Livoltek",
-        "inverter_sn": "INV-001",
-        "product_type": "Hybrid Inverter",
-        "firmware_version": "1.0.0",
+        "deviceManufacturer": "Livoltek",
+        "inverterSn": "INV-001",
+        "productType": "Hybrid Inverter",
+        "firmwareVersion": "1.0.0",
     }
     payload.update(overrides)
-    return SimpleNamespace(**payload)
+    return payload
 
 
 def build_energy_storage(**overrides: Any) -> SimpleNamespace:
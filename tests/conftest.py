@@ -20,6 +20,7 @@ DOMAIN = "livoltek"
 CONF_EMEA_ID = "emea_id"
 CONF_SECUID_ID = "secuid_id"
 CONF_SITE_ID = "site_id"
+CONF_SITE_TIMEZONE = "site_timezone"
 CONF_USERTOKEN_ID = "usertoken_id"
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
@@ -95,6 +96,7 @@ def livoltek_entry() -> ConfigEntry:
             CONF_EMEA_ID: False,
             CONF_SECUID_ID: "secuid-123",
             CONF_SITE_ID: "site-123",
+            CONF_SITE_TIMEZONE: None,
             CONF_USERTOKEN_ID: "user-token-123",
         },
         discovery_keys=MappingProxyType({}),
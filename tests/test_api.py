@@ -0,0 +1,427 @@
+"""Tests for the asynchronous Livoltek API client."""
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock
+
+import aiohttp
+import pytest
+
+from custom_components.livoltek.api import (
+    LivoltekAuthenticationError,
+    LivoltekCircuitOpenError,
+    LivoltekClient,
+    LivoltekConnectionError,
+    LivoltekNotFoundError,
+    response_sizes,
+)
+from custom_components.livoltek.auth import LivoltekTokenBroker
+from custom_components.livoltek.breaker import STATE_CLOSED, LivoltekCircuitBreaker
+from custom_components.livoltek.const import LATENCY_MIN_SAMPLES
+from custom_components.livoltek.latency import LatencyTracker
+
+HOST = "api.livoltek-portal.com:8081"
+BASE_URL = f"http://{HOST}"
+
+
+def login_response(aresponses, token: str):
+    """Return a canned successful login response."""
+    return aresponses.Response(
+        text=json.dumps({"message": "SUCCESS", "data": token}),
+        content_type="application/json",
+    )
+
+
+def data_response(aresponses, data):
+    """Return a canned successful data response."""
+    return aresponses.Response(
+        text=json.dumps({"message": "SUCCESS", "data": data}),
+        content_type="application/json",
+    )
+
+
+@pytest.mark.asyncio
+async def test_login_stores_returned_token(aresponses) -> None:
+    """A successful login should return and remember the token."""
+
+    async def handler(request):
+        assert await request.json() == {"secuid": "secuid-123", "key": "api-key"}
+        assert "Authorization" not in request.headers
+        return aresponses.Response(
+            text='{"message": "SUCCESS", "code": "200", "data": "jwt-token"}',
+            content_type="application/json",
+        )
+
+    aresponses.add(HOST, "/hess/api/login", "POST", handler)
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL)
+        token = await client.async_login("secuid-123", "api-key")
+
+    assert token == "jwt-token"
+    assert client.token == "jwt-token"
+
+
+@pytest.mark.asyncio
+async def test_login_rejects_non_success_message(aresponses) -> None:
+    """A login response without SUCCESS should raise an authentication error."""
+    aresponses.add(
+        HOST,
+        "/hess/api/login",
+        "POST",
+        aresponses.Response(
+            text='{"message": "SECUID_ERROR", "code": "500"}',
+            content_type="application/json",
+        ),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL)
+        with pytest.raises(LivoltekAuthenticationError):
+            await client.async_login("secuid-123", "bad-key")
+
+
+@pytest.mark.asyncio
+async def test_get_requests_send_token_and_unwrap_data(aresponses) -> None:
+    """Authenticated GETs should send the token and return the data member."""
+
+    async def handler(request):
+        assert request.headers["Authorization"] == "jwt-token"
+        assert request.query["userToken"] == "user-token"
+        return aresponses.Response(
+            text='{"message": "SUCCESS", "data": {"pvPower": "3.4"}}',
+            content_type="application/json",
+        )
+
+    aresponses.add(HOST, "/hess/api/site/site-123/curPowerflow", "GET", handler)
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        result = await client.async_get_cur_power_flow("user-token", "site-123")
+
+    assert result == {"pvPower": "3.4"}
+
+
+@pytest.mark.asyncio
+async def test_response_sizes_are_reported_to_the_caller(aresponses) -> None:
+    """Callers that set the context variable should see every body size."""
+    body = json.dumps({"message": "SUCCESS", "data": {"pvPower": "3.4"}})
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/curPowerflow",
+        "GET",
+        aresponses.Response(text=body, content_type="application/json"),
+    )
+    sizes: list[int] = []
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        token = response_sizes.set(sizes)
+        try:
+            await client.async_get_cur_power_flow("user-token", "site-123")
+        finally:
+            response_sizes.reset(token)
+
+    assert sizes == [len(body)]
+
+
+@pytest.mark.asyncio
+async def test_unauthorized_status_raises_authentication_error(aresponses) -> None:
+    """401 and 403 responses should be surfaced as authentication errors."""
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/ESS",
+        "GET",
+        aresponses.Response(status=401),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "expired-token")
+        with pytest.raises(LivoltekAuthenticationError):
+            await client.async_get_energy_storage("user-token", "site-123")
+
+
+@pytest.mark.asyncio
+async def test_server_error_raises_connection_error(aresponses) -> None:
+    """Other HTTP errors should be surfaced as connection errors."""
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/reissueSolarEnergy",
+        "GET",
+        aresponses.Response(status=502),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        with pytest.raises(LivoltekConnectionError) as err:
+            await client.async_get_recent_solar("secret-user-token", "site-123")
+
+    assert str(err.value) == (
+        "/hess/api/site/site-123/reissueSolarEnergy returned HTTP 502"
+    )
+
+
+@pytest.mark.asyncio
+async def test_missing_resource_raises_not_found_error(aresponses) -> None:
+    """A 404 is an answer about the resource, told apart from other failures."""
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/ESS",
+        "GET",
+        aresponses.Response(status=404),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        with pytest.raises(LivoltekNotFoundError):
+            await client.async_get_energy_storage("user-token", "site-123")
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_stops_requests_to_a_failing_server(aresponses) -> None:
+    """Server errors open the circuit; answers such as 401 do not."""
+    path = "/hess/api/site/site-123/curPowerflow"
+    aresponses.add(HOST, path, "GET", aresponses.Response(status=401))
+    aresponses.add(HOST, path, "GET", aresponses.Response(status=503))
+    aresponses.add(HOST, path, "GET", aresponses.Response(status=503))
+    breaker = LivoltekCircuitBreaker(HOST, threshold=2)
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token", circuit_breaker=breaker)
+        with pytest.raises(LivoltekAuthenticationError):
+            await client.async_get_cur_power_flow("user-token", "site-123")
+        assert breaker.state == STATE_CLOSED
+        assert breaker.failures == 0
+
+        for _ in range(2):
+            with pytest.raises(LivoltekConnectionError):
+                await client.async_get_cur_power_flow("user-token", "site-123")
+        with pytest.raises(LivoltekCircuitOpenError):
+            await client.async_get_cur_power_flow("user-token", "site-123")
+
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_slow_get_is_hedged_and_the_first_answer_wins(aresponses) -> None:
+    """A GET past its endpoint's p95 is sent again; the faster copy is used."""
+    path = "/hess/api/site/site-123/curPowerflow"
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1)
+            return data_response(aresponses, {"pvPower": "slow"})
+        return data_response(aresponses, {"pvPower": "hedged"})
+
+    aresponses.add(HOST, path, "GET", handler, repeat=2)
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token", hedge=True)
+        tracker = client.latency["curPowerflow"]
+        for _ in range(LATENCY_MIN_SAMPLES):
+            tracker.add(0.01)
+
+        result = await client.async_get_cur_power_flow("user-token", "site-123")
+
+    assert result == {"pvPower": "hedged"}
+    assert calls == 2
+    assert client.hedged_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_get_times_out_after_the_endpoint_timeout(
+    aresponses, monkeypatch
+) -> None:
+    """A learned timeout applies per endpoint and is recorded when hit."""
+    path = "/hess/api/site/site-123/curPowerflow"
+
+    async def handler(request):
+        await asyncio.sleep(1)
+        return data_response(aresponses, {})
+
+    aresponses.add(HOST, path, "GET", handler)
+    monkeypatch.setattr(LatencyTracker, "timeout", lambda self: 0.05)
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        tracker = client.latency["curPowerflow"]
+        with pytest.raises(LivoltekConnectionError):
+            await client.async_get_cur_power_flow("user-token", "site-123")
+
+    assert tracker.samples[-1] == 0.05
+    assert "ESS" not in client.latency
+
+
+@pytest.mark.asyncio
+async def test_site_and_device_listings_are_timed_separately(aresponses) -> None:
+    """Endpoints whose paths end alike should not share a latency tracker."""
+    empty = {"count": 0, "list": []}
+    aresponses.add(
+        HOST, "/hess/api/userSites/list", "GET", data_response(aresponses, empty)
+    )
+    aresponses.add(
+        HOST, "/hess/api/device/site-123/list", "GET", data_response(aresponses, empty)
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        await client.async_get_sites("user-token")
+        await client.async_get_device_list("user-token", "site-123")
+
+    assert len(client.latency["userSites"].samples) == 1
+    assert len(client.latency["deviceList"].samples) == 1
+
+
+@pytest.mark.asyncio
+async def test_client_logs_in_again_when_token_is_rejected(aresponses) -> None:
+    """A revoked token should trigger one login and a retry of the request."""
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/ESS",
+        "GET",
+        aresponses.Response(status=401),
+    )
+    aresponses.add(HOST, "/hess/api/login", "POST", login_response(aresponses, "new-token"))
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/ESS",
+        "GET",
+        data_response(aresponses, {"currentSoc": "55"}),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        broker = LivoltekTokenBroker(session, BASE_URL, "secuid-123", "api-key")
+        broker.token = "revoked-token"
+        client = LivoltekClient(session, BASE_URL, token_provider=broker)
+        result = await client.async_get_energy_storage("user-token", "site-123")
+
+    assert result == {"currentSoc": "55"}
+    assert client.token == "new-token"
+    assert broker.token == "new-token"
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_every_request_waits_for_the_request_limiter(aresponses) -> None:
+    """Logins and retries count against the limiter like any other request."""
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/ESS",
+        "GET",
+        aresponses.Response(status=401),
+    )
+    aresponses.add(HOST, "/hess/api/login", "POST", login_response(aresponses, "new-token"))
+    aresponses.add(
+        HOST,
+        "/hess/api/site/site-123/ESS",
+        "GET",
+        data_response(aresponses, {"currentSoc": "55"}),
+    )
+    limiter = Mock(async_acquire=AsyncMock())
+
+    async with aiohttp.ClientSession() as session:
+        broker = LivoltekTokenBroker(session, BASE_URL, "secuid-123", "api-key")
+        broker.token = "revoked-token"
+        broker.request_limiter = limiter
+        client = LivoltekClient(
+            session, BASE_URL, token_provider=broker, request_limiter=limiter
+        )
+        await client.async_get_energy_storage("user-token", "site-123")
+
+    assert limiter.async_acquire.await_count == 3
+    limiter.async_acquire.assert_awaited_with(1)
+
+
+@pytest.mark.asyncio
+async def test_device_listing_fetches_remaining_pages(aresponses) -> None:
+    """Pages after the first should be requested from the reported count."""
+    requested_pages = []
+
+    async def handler(request):
+        page = int(request.query["page"])
+        requested_pages.append(page)
+        devices = [
+            {"inverterSn": f"INV-{index:03}"}
+            for index in range((page - 1) * 10, min(page * 10, 25))
+        ]
+        return data_response(aresponses, {"count": 25, "list": devices})
+
+    for _ in range(3):
+        aresponses.add(HOST, "/hess/api/device/site-123/list", "GET", handler)
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        devices = [
+            device
+            async for device in client.async_iter_device_list("user-token", "site-123")
+        ]
+
+    assert requested_pages[0] == 1
+    assert sorted(requested_pages) == [1, 2, 3]
+    assert len({device["inverterSn"] for device in devices}) == 25
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_listing_with_single_page_makes_one_request(aresponses) -> None:
+    """A count that fits on the first page should not trigger more requests."""
+    aresponses.add(
+        HOST,
+        "/hess/api/userSites/list",
+        "GET",
+        data_response(aresponses, {"count": 1, "list": [{"powerStationId": 7}]}),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        sites = [site async for site in client.async_iter_sites("user-token")]
+
+    assert sites == [{"powerStationId": 7}]
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_device_details_are_unwrapped(aresponses) -> None:
+    """Device details should be read from the envelope's data."""
+    aresponses.add(
+        HOST,
+        "/hess/api/device/site-123/INV-001/details",
+        "GET",
+        data_response(aresponses, {"id": 7, "inverterSn": "INV-001"}),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        details = await client.async_get_device_details(
+            "user-token", "site-123", "INV-001"
+        )
+
+    assert details == {"id": 7, "inverterSn": "INV-001"}
+
+
+@pytest.mark.asyncio
+async def test_device_generation_reads_top_level_counters(aresponses) -> None:
+    """Lifetime counters are documented next to the envelope fields."""
+    aresponses.add(
+        HOST,
+        "/hess/api/device/42/realElectricity",
+        "GET",
+        aresponses.Response(
+            text=(
+                '{"code": "200", "message": "SUCCESS", "pvProduceElectric": "812.5",'
+                ' "loadCustomerElectric": "640.1", "timestamp": 1700000000000}'
+            ),
+            content_type="application/json",
+        ),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = LivoltekClient(session, BASE_URL, "jwt-token")
+        result = await client.async_get_device_generation("user-token", "42")
+
+    assert result["pvProduceElectric"] == "812.5"
+    assert result["timestamp"] == 1700000000000
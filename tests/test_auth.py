@@ -0,0 +1,101 @@
+"""Tests for the shared Livoltek token broker."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from custom_components.livoltek import auth
+from custom_components.livoltek.auth import (
+    LivoltekTokenBroker,
+    async_get_token_broker,
+    decode_token_expiry,
+)
+from custom_components.livoltek.const import (
+    LIVOLTEK_EMEA_SERVER,
+    LIVOLTEK_GLOBAL_SERVER,
+    TOKEN_REFRESH_MARGIN,
+)
+
+
+def make_jwt(exp: float) -> str:
+    """Build an unsigned JWT carrying only an expiry claim."""
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode()
+    return f"header.{payload.rstrip('=')}.signature"
+
+
+def test_decode_token_expiry_reads_exp_claim() -> None:
+    """The JWT expiry should be decoded without verifying the signature."""
+    assert decode_token_expiry(make_jwt(1700000000)) == 1700000000
+    assert decode_token_expiry("not-a-jwt") is None
+    assert decode_token_expiry(None) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_a_single_login(monkeypatch) -> None:
+    """Callers arriving while a login is in flight should await that login."""
+    token = make_jwt(time.time() + 3600)
+    logins = 0
+
+    async def _login(self, secuid, api_key):
+        nonlocal logins
+        logins += 1
+        await asyncio.sleep(0.01)
+        return token
+
+    monkeypatch.setattr(auth.LivoltekClient, "async_login", _login)
+    broker = LivoltekTokenBroker(Mock(), LIVOLTEK_GLOBAL_SERVER, "secuid", "key")
+
+    results = await asyncio.gather(*(broker.async_get_token() for _ in range(5)))
+
+    assert results == [token] * 5
+    assert logins == 1
+    assert broker.token_expires_at == decode_token_expiry(token)
+
+
+@pytest.mark.asyncio
+async def test_token_is_refreshed_once_it_nears_expiry(monkeypatch) -> None:
+    """A token inside the refresh margin should be replaced before use."""
+    fresh_token = make_jwt(time.time() + 3600)
+    login = AsyncMock(return_value=fresh_token)
+    monkeypatch.setattr(auth.LivoltekClient, "async_login", login)
+    broker = LivoltekTokenBroker(Mock(), LIVOLTEK_GLOBAL_SERVER, "secuid", "key")
+    broker.token = make_jwt(time.time() + TOKEN_REFRESH_MARGIN - 1)
+    broker.token_expires_at = decode_token_expiry(broker.token)
+
+    assert await broker.async_get_token() == fresh_token
+    assert await broker.async_get_token() == fresh_token
+    login.assert_awaited_once()
+
+
+def test_invalidate_only_drops_the_rejected_token() -> None:
+    """A stale rejection should not discard a token obtained since."""
+    broker = LivoltekTokenBroker(Mock(), LIVOLTEK_GLOBAL_SERVER, "secuid", "key")
+    broker.token = "current-token"
+
+    broker.invalidate("older-token")
+    assert broker.token == "current-token"
+
+    broker.invalidate("current-token")
+    assert broker.token is None
+
+
+def test_brokers_are_shared_per_host_and_secuid(monkeypatch) -> None:
+    """Entries of the same account should share a broker; others should not."""
+    monkeypatch.setattr(auth, "async_get_clientsession", Mock())
+    hass = SimpleNamespace(data={})
+
+    first = async_get_token_broker(hass, LIVOLTEK_GLOBAL_SERVER, "secuid", "key")
+
+    assert async_get_token_broker(hass, LIVOLTEK_GLOBAL_SERVER, "secuid", "key") is first
+    assert async_get_token_broker(hass, LIVOLTEK_EMEA_SERVER, "secuid", "key") is not first
+    assert async_get_token_broker(hass, LIVOLTEK_GLOBAL_SERVER, "other", "key") is not first
+
+    replaced = async_get_token_broker(hass, LIVOLTEK_GLOBAL_SERVER, "secuid", "new-key")
+    assert replaced is not first
+    assert replaced.api_key == "new-key"
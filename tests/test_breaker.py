@@ -0,0 +1,117 @@
+"""Tests for the per-server circuit breaker."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.livoltek import breaker as breaker_module
+from custom_components.livoltek.api import LivoltekCircuitOpenError
+from custom_components.livoltek.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    LivoltekCircuitBreaker,
+    async_get_circuit_breaker,
+)
+from custom_components.livoltek.const import (
+    LIVOLTEK_EMEA_SERVER,
+    LIVOLTEK_GLOBAL_SERVER,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """Drive the breaker from a fake monotonic clock."""
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(breaker_module, "monotonic", lambda: clock.now)
+    return clock
+
+
+def _trip(breaker: LivoltekCircuitBreaker) -> None:
+    """Fail enough requests in a row to open the circuit."""
+    for _ in range(breaker.threshold):
+        breaker.before_request()
+        breaker.record_failure()
+
+
+def test_circuit_opens_after_consecutive_failures(clock) -> None:
+    """Failures only open the circuit once they reach the threshold in a row."""
+    breaker = LivoltekCircuitBreaker("host", threshold=3, base_backoff=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.is_open
+    assert 15 <= breaker.retry_at <= 30
+    with pytest.raises(LivoltekCircuitOpenError) as err:
+        breaker.before_request()
+    assert 15 <= err.value.retry_in <= 30
+
+
+def test_half_open_circuit_lets_a_single_probe_through(clock) -> None:
+    """After the backoff one request probes while the others are refused."""
+    breaker = LivoltekCircuitBreaker("host", threshold=1, base_backoff=30)
+    _trip(breaker)
+
+    clock.now = 30
+    assert not breaker.is_open
+    breaker.before_request()
+    assert breaker.state == STATE_HALF_OPEN
+    with pytest.raises(LivoltekCircuitOpenError):
+        breaker.before_request()
+
+    breaker.release()
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.trips == 0
+    breaker.before_request()
+
+
+def test_failed_probes_back_off_exponentially_up_to_the_cap(clock) -> None:
+    """Every failed probe doubles the jittered backoff until it reaches the cap."""
+    breaker = LivoltekCircuitBreaker(
+        "host", threshold=1, base_backoff=30, max_backoff=100
+    )
+    _trip(breaker)
+
+    for ceiling in (60, 100, 100):
+        clock.now = breaker.retry_at
+        breaker.before_request()
+        breaker.record_failure()
+        assert breaker.state == STATE_OPEN
+        assert ceiling / 2 <= breaker.retry_at - clock.now <= ceiling
+
+
+def test_late_failures_while_open_do_not_trip_again(clock) -> None:
+    """Requests in flight when the circuit opened must not extend its backoff."""
+    breaker = LivoltekCircuitBreaker("host", threshold=2, base_backoff=30)
+    for _ in range(4):
+        breaker.before_request()
+    breaker.record_failure()
+    breaker.record_failure()
+    retry_at = breaker.retry_at
+
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.trips == 1
+    assert breaker.failures == 2
+    assert breaker.retry_at == retry_at
+
+
+def test_breakers_are_shared_per_server() -> None:
+    """Every client of a server should share its breaker."""
+    hass = SimpleNamespace(data={})
+
+    first = async_get_circuit_breaker(hass, LIVOLTEK_GLOBAL_SERVER)
+
+    assert async_get_circuit_breaker(hass, LIVOLTEK_GLOBAL_SERVER) is first
+    assert async_get_circuit_breaker(hass, LIVOLTEK_EMEA_SERVER) is not first
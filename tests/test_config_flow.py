@@ -1,7 +1,7 @@
 """Tests for the Livoltek config flow."""
 from __future__ import annotations
 
-from types import SimpleNamespace
+import json
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -14,10 +14,14 @@ from pylivoltek.api import DefaultApi
 
 from custom_components.livoltek.config_flow import LivoltekFlowHandler
 from custom_components.livoltek.const import (
-    API_REQUEST_TIMEOUT,
     CONF_EMEA_ID,
+    CONF_FLEET_MODE,
+    CONF_HEDGE_REQUESTS,
+    CONF_MAX_STALENESS,
+    CONF_REQUEST_BUDGET,
     CONF_SECUID_ID,
     CONF_SITE_ID,
+    CONF_SITE_TIMEZONE,
     CONF_USERTOKEN_ID,
     DOMAIN,
     LIVOLTEK_EMEA_SERVER,
@@ -34,7 +38,13 @@ async def test_user_flow_creates_entry_after_site_selection(hass) -> None:
         CONF_SECUID_ID: "secuid-123",
         CONF_USERTOKEN_ID: "user-token-123",
     }
-    sites = [{"powerStationId": "site-123", "powerStationName": "Home"}]
+    sites = [
+        {
+            "powerStationId": "site-123",
+            "powerStationName": "Home",
+            "timezone": "Australia/Sydney",
+        }
+    ]
 
     with (
         patch(
@@ -64,6 +74,7 @@ async def test_user_flow_creates_entry_after_site_selection(hass) -> None:
     assert result["type"] == "create_entry"
     assert result["title"] == "Livoltek"
     assert result["data"][CONF_SITE_ID] == "site-123"
+    assert result["data"][CONF_SITE_TIMEZONE] == "Australia/Sydney"
 
 
 @pytest.mark.asyncio
@@ -107,45 +118,66 @@ def test_get_site_list_returns_selector_options() -> None:
 
 
 @pytest.mark.asyncio
-async def test_get_sites_sets_request_timeout(monkeypatch) -> None:
-    """Site listing should use the integration HTTP timeout."""
-
-    class FakeApiClient:
-        def __init__(self, config) -> None:
-            self.config = config
-            self.headers = {}
-
-        def set_default_header(self, name: str, value: str) -> None:
-            self.headers[name] = value
-
-    class FakeDefaultApi:
-        def __init__(self, api_client) -> None:
-            self.api_client = api_client
-
-        def list_sites(self, user_token, **kwargs):
-            assert user_token == "user-token"
-            assert kwargs["_preload_content"] is True
-            assert kwargs["_request_timeout"] == API_REQUEST_TIMEOUT
-            return [
-                SimpleNamespace(
-                    data=SimpleNamespace(
-                        list=[
-                            {
-                                "powerStationId": "site-123",
-                                "powerStationName": "Home",
-                            }
-                        ]
-                    )
-                )
-            ]
-
-    monkeypatch.setattr("custom_components.livoltek.config_flow.ApiClient", FakeApiClient)
-    monkeypatch.setattr("custom_components.livoltek.config_flow.DefaultApi", FakeDefaultApi)
+async def test_get_sites_reads_every_page(hass, aresponses) -> None:
+    """Site listing should not stop at the first page of results."""
+
+    async def handler(request):
+        assert request.headers["Authorization"] == "access-token"
+        assert request.query["userToken"] == "user-token"
+        page = int(request.query["page"])
+        sites = [
+            {"powerStationId": f"site-{index}", "powerStationName": f"Site {index}"}
+            for index in range((page - 1) * 10, min(page * 10, 12))
+        ]
+        return aresponses.Response(
+            text=json.dumps({"message": "SUCCESS", "data": {"count": 12, "list": sites}}),
+            content_type="application/json",
+        )
+
+    for _ in range(2):
+        aresponses.add(
+            "api.livoltek-portal.com:8081", "/hess/api/userSites/list", "GET", handler
+        )
 
     flow = LivoltekFlowHandler()
-    sites = await flow.get_sites("https://example.com", "access-token", "user-token")
+    flow.hass = hass
+    sites = await flow.get_sites(LIVOLTEK_GLOBAL_SERVER, "access-token", "user-token")
+
+    assert sorted(site["powerStationId"] for site in sites) == sorted(
+        f"site-{index}" for index in range(12)
+    )
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_options_flow_stores_options(hass, livoltek_entry) -> None:
+    """The options flow should store every request and refresh setting."""
+    await hass.config_entries.async_add(livoltek_entry)
 
-    assert sites == [{"powerStationId": "site-123", "powerStationName": "Home"}]
+    with patch(
+        "custom_components.livoltek.async_setup_entry", AsyncMock(return_value=True)
+    ):
+        result = await hass.config_entries.options.async_init(livoltek_entry.entry_id)
+        assert result["type"] == "form"
+        assert result["step_id"] == "init"
+
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            {
+                CONF_FLEET_MODE: True,
+                CONF_REQUEST_BUDGET: 120,
+                CONF_MAX_STALENESS: 60,
+                CONF_HEDGE_REQUESTS: True,
+            },
+        )
+
+    assert result["type"] == "create_entry"
+    assert livoltek_entry.options == {
+        CONF_FLEET_MODE: True,
+        CONF_REQUEST_BUDGET: 120,
+        CONF_MAX_STALENESS: 60,
+        CONF_HEDGE_REQUESTS: True,
+    }
 
 
 @pytest.mark.asyncio
@@ -1,12 +1,39 @@
 """Tests for the Livoltek data update coordinator."""
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
-from unittest.mock import AsyncMock
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from custom_components.livoltek.api import (
+    LivoltekCircuitOpenError,
+    LivoltekConnectionError,
+    response_sizes,
+)
+from custom_components.livoltek.const import (
+    CONF_MAX_STALENESS,
+    CONF_SITE_TIMEZONE,
+    ENDPOINT_DEVICE_GENERATION,
+    ENDPOINT_ENERGY_STORAGE,
+    ENDPOINT_POWER_FLOW,
+    ENDPOINT_RECENT_GRID,
+    ENDPOINT_SITE,
+)
 from custom_components.livoltek.coordinator import LivoltekDataUpdateCoordinator
+from custom_components.livoltek.models import (
+    DailyEnergy,
+    DeviceGeneration,
+    LivoltekSnapshot,
+    PowerFlow,
+)
+from custom_components.livoltek.schedule import RETRY_DELAY
+from custom_components.livoltek.snapshot import SnapshotStore
 
 from .common import build_energy_storage, build_power_flow, midday_timestamp_ms
 
@@ -24,11 +51,6 @@ async def test_async_update_data_populates_coordinator_state(
     power_flow = build_power_flow()
     energy_storage = build_energy_storage()
 
-    get_api_client = AsyncMock(return_value=(object(), "access-token"))
-    monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_api_client",
-        get_api_client,
-    )
     monkeypatch.setattr(
         "custom_components.livoltek.coordinator.async_get_site",
         AsyncMock(return_value={"name": "Home Site"}),
@@ -78,73 +100,831 @@ async def test_async_update_data_populates_coordinator_state(
         ),
     )
 
-    await coordinator._async_update_data()
+    snapshot = await coordinator._async_update_data()
 
-    assert coordinator.access_token == "access-token"
     assert coordinator.site == {"name": "Home Site"}
     assert coordinator.devices == {"device-1": {"name": "Inverter"}}
-    assert coordinator.current_power_flow is power_flow
-    assert coordinator.energy_storage is energy_storage
-    assert coordinator.todays_grid == {
-        "ts": str(midday_timestamp_ms(today)),
-        "positive": "4.6",
-        "negative": "1.4",
-    }
-    assert coordinator.todays_solar == {
-        "ts": str(midday_timestamp_ms(today)),
-        "powerGeneration": "8.9",
-    }
-    get_api_client.assert_awaited_once_with(livoltek_entry, None)
+    assert snapshot.power_flow == PowerFlow.from_payload(power_flow)
+    assert snapshot.energy_storage.battery_soc == 72.0
+    assert snapshot.battery_soc == 72.0
+    assert snapshot.today == DailyEnergy(
+        grid_import=4.6, grid_export=1.4, solar_generation=8.9
+    )
 
 
 @pytest.mark.asyncio
-async def test_async_update_data_reuses_cached_access_token(
+async def test_async_update_data_reuses_persistent_client(
     hass,
     livoltek_entry,
     monkeypatch,
 ) -> None:
-    """Coordinator refreshes should pass the cached token back into the helper."""
+    """Every refresh should go through the client created with the coordinator."""
     coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
-    power_flow = build_power_flow()
+    seen_clients = []
 
-    get_api_client = AsyncMock(
-        side_effect=[
-            (object(), "first-token"),
-            (object(), "second-token"),
-        ]
+    def factory(name):
+        async def _fetch(api, *args):
+            seen_clients.append(api)
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else None
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    now = 0.0
+    monkeypatch.setattr(
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
     )
+
+    await coordinator._async_update_data()
+    now = 86400.0
+    await coordinator._async_update_data()
+
+    assert len(seen_clients) == 12
+    assert all(client is coordinator.client for client in seen_clients)
+
+
+@pytest.mark.asyncio
+async def test_async_shutdown_releases_client_token(hass, livoltek_entry) -> None:
+    """Shutting the coordinator down should drop the cached access token."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    coordinator.client.token = "cached-token"
+
+    await coordinator.async_shutdown()
+
+    assert coordinator.client.token is None
+
+
+def _patch_endpoints(monkeypatch, factory) -> None:
+    """Route every coordinator endpoint helper through a shared factory."""
+    for name in (
+        "async_get_site",
+        "async_get_device_list",
+        "async_get_cur_power_flow",
+        "async_get_energy_storage",
+        "async_get_recent_grid",
+        "async_get_recent_solar",
+        "async_get_device_generations",
+    ):
+        monkeypatch.setattr(
+            f"custom_components.livoltek.coordinator.{name}", factory(name)
+        )
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_fetches_endpoints_concurrently(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Independent endpoints should be in flight at the same time."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    in_flight = 0
+    peak = 0
+
+    def factory(name):
+        async def _fetch(*args):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if name in ("async_get_recent_grid", "async_get_recent_solar"):
+                return []
+            return SimpleNamespace()
+
+        return _fetch
+
     monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_api_client",
-        get_api_client,
+        "custom_components.livoltek.coordinator.MAX_CONCURRENT_REQUESTS", 3
     )
+    _patch_endpoints(monkeypatch, factory)
+
+    await coordinator._async_update_data()
+
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_enforces_cycle_deadline(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """A stuck endpoint should fail on its own once the overall deadline passes."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_site":
+                await asyncio.sleep(10)
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    monkeypatch.setattr("custom_components.livoltek.coordinator.REFRESH_DEADLINE", 0.05)
+    _patch_endpoints(monkeypatch, factory)
+    # Past the first refresh, which waits for every setup endpoint.
+    coordinator.data = LivoltekSnapshot()
+
+    await coordinator._async_update_data()
+
+    site = coordinator.endpoints[ENDPOINT_SITE]
+    assert site.failures == 1
+    assert site.error == "exceeded 0.05s"
+    assert coordinator.endpoints[ENDPOINT_POWER_FLOW].fetched_at is not None
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_keeps_last_good_data_of_failing_endpoints(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """A failing endpoint should keep serving its last result while it is retried."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    now = 0.0
+    failing: set[str] = set()
+
+    def factory(name):
+        async def _fetch(*args):
+            if name in failing:
+                raise LivoltekConnectionError("Service unavailable")
+            if name == "async_get_cur_power_flow":
+                return build_power_flow()
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
     monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_site",
-        AsyncMock(return_value={"name": "Home Site"}),
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
     )
+    await coordinator._async_update_data()
+
+    failing.add("async_get_cur_power_flow")
+    now = 300.0
+    snapshot = await coordinator._async_update_data()
+
+    state = coordinator.endpoints[ENDPOINT_POWER_FLOW]
+    assert snapshot.power_flow == PowerFlow.from_payload(build_power_flow())
+    assert state.error == "Service unavailable"
+    assert state.next_due == now + RETRY_DELAY
+    assert coordinator.endpoints[ENDPOINT_ENERGY_STORAGE].fetched_at == now
+
+    now += state.policy.max_age.total_seconds() + 1
+    snapshot = await coordinator._async_update_data()
+    assert snapshot.power_flow is None
+    assert state.failures == 2
+
+    failing.clear()
+    now += 60
+    await coordinator._async_update_data()
+    assert state.error is None
+    assert state.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_defers_endpoints_until_the_next_probe(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Endpoints refused by an open circuit are retried when it half-opens."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    now = 0.0
+    outage = False
+
+    def factory(name):
+        async def _fetch(*args):
+            if outage:
+                raise LivoltekCircuitOpenError("host", 400.0)
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
     monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_device_list",
-        AsyncMock(return_value={}),
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
+    )
+    await coordinator._async_update_data()
+
+    outage = True
+    now = 150.0
+    await coordinator._async_update_data()
+
+    assert coordinator.endpoints[ENDPOINT_POWER_FLOW].next_due == now + 400.0
+    assert coordinator.next_refresh_delay == dt.timedelta(seconds=150)
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_records_endpoint_metrics(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Every fetch should be counted and kept in the refresh cycle history."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_site":
+                raise LivoltekConnectionError("Service unavailable")
+            if name == "async_get_cur_power_flow":
+                response_sizes.get().extend([300, 200])
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    # Past the first refresh, which waits for every setup endpoint.
+    coordinator.data = LivoltekSnapshot()
+
+    await coordinator._async_update_data()
+
+    power_flow = coordinator.metrics[ENDPOINT_POWER_FLOW]
+    assert power_flow.calls == power_flow.successes == 1
+    assert power_flow.response_bytes == 500
+    assert power_flow.last_success is not None
+    site = coordinator.metrics[ENDPOINT_SITE]
+    assert site.calls == 1
+    assert site.errors == {"LivoltekConnectionError": 1}
+    assert site.last_success is None
+
+    (cycle,) = coordinator.refresh_cycles
+    assert cycle["peak_concurrency"] >= 1
+    assert cycle["endpoints"][ENDPOINT_POWER_FLOW]["response_bytes"] == 500
+    assert cycle["endpoints"][ENDPOINT_SITE]["error"] == (
+        "LivoltekConnectionError: Service unavailable"
+    )
+
+
+@pytest.mark.asyncio
+async def test_first_refresh_fails_until_every_setup_endpoint_answered(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Entities are created from the first snapshot, so it needs every setup endpoint."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    failing = {"async_get_cur_power_flow"}
+
+    def factory(name):
+        async def _fetch(*args):
+            if name in failing:
+                raise LivoltekConnectionError("Service unavailable")
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+
+    with pytest.raises(UpdateFailed, match="power_flow: Service unavailable"):
+        await coordinator._async_update_data()
+
+    failing.clear()
+    coordinator.endpoints[ENDPOINT_POWER_FLOW].next_due = 0.0
+    snapshot = await coordinator._async_update_data()
+    assert snapshot.power_flow is not None
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_fails_when_no_endpoint_has_data(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """The cycle only fails when every endpoint failed with nothing to fall back on."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            raise LivoltekConnectionError("Service unavailable")
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+
+    with pytest.raises(UpdateFailed, match="power_flow: Service unavailable"):
+        await coordinator._async_update_data()
+
+
+@pytest.mark.asyncio
+async def test_max_staleness_option_extends_short_staleness_budgets(
+    hass,
+    livoltek_entry,
+) -> None:
+    """The option should only lengthen budgets shorter than it."""
+    with patch(
+        "custom_components.livoltek.async_setup_entry", AsyncMock(return_value=True)
+    ):
+        await hass.config_entries.async_add(livoltek_entry)
+    hass.config_entries.async_update_entry(
+        livoltek_entry, options={CONF_MAX_STALENESS: 120}
     )
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    assert coordinator.endpoints[ENDPOINT_POWER_FLOW].policy.max_age == (
+        dt.timedelta(hours=2)
+    )
+    assert coordinator.endpoints[ENDPOINT_SITE].policy.max_age == dt.timedelta(days=1)
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_only_fetches_due_endpoints(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Slow tiers should be served from cache while live power flow refreshes."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    calls: list[str] = []
+    now = 0.0
+
+    def factory(name):
+        async def _fetch(*args):
+            calls.append(name)
+            if name in ("async_get_recent_grid", "async_get_recent_solar"):
+                return []
+            return {"source": name}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
     monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_cur_power_flow",
-        AsyncMock(return_value=power_flow),
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
     )
+
+    await coordinator._async_update_data()
+    assert len(calls) == 6
+    assert coordinator.update_interval == dt.timedelta(minutes=2, seconds=30)
+
+    calls.clear()
+    now = 150.0
+    await coordinator._async_update_data()
+    assert calls == ["async_get_cur_power_flow"]
+    assert coordinator.site == {"source": "async_get_site"}
+
+    calls.clear()
+    now = 300.0
+    await coordinator._async_update_data()
+    assert sorted(calls) == ["async_get_cur_power_flow", "async_get_energy_storage"]
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_drops_results_past_staleness_budget(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Cached results older than their max age should no longer be exposed."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    now = 0.0
+
+    def factory(name):
+        async def _fetch(*args):
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
     monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_energy_storage",
-        AsyncMock(return_value=None),
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
+    )
+    await coordinator._async_update_data()
+
+    state = coordinator.endpoints[ENDPOINT_POWER_FLOW]
+    state.next_due = float("inf")
+    now = state.policy.max_age.total_seconds() + 1
+    snapshot = await coordinator._async_update_data()
+
+    assert snapshot.power_flow is None
+
+
+@pytest.mark.asyncio
+async def test_async_update_data_skips_endpoints_without_consumers(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Once entities register, endpoints nobody reads should not be fetched.
+
+    The device list and site overview are the exceptions, since device
+    registration and the site's name and upload time read them.
+    """
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    calls: list[str] = []
+
+    def factory(name):
+        async def _fetch(*args):
+            calls.append(name)
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    monkeypatch.setattr(
+        "custom_components.livoltek.coordinator.monotonic", lambda: 86400.0
     )
+    monkeypatch.setattr(coordinator, "async_request_refresh", AsyncMock())
+    coordinator.data = LivoltekSnapshot()
+    coordinator.async_add_endpoint_consumer({ENDPOINT_POWER_FLOW})
+
+    await coordinator._async_update_data()
+
+    assert sorted(calls) == [
+        "async_get_cur_power_flow",
+        "async_get_device_list",
+        "async_get_site",
+    ]
+    assert coordinator.update_interval == dt.timedelta(minutes=2, seconds=30)
+
+
+@pytest.mark.asyncio
+async def test_enabling_a_consumer_refreshes_its_skipped_endpoint(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """A newly enabled entity should get its endpoint fetched straight away."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    request_refresh = AsyncMock()
+    monkeypatch.setattr(coordinator, "async_request_refresh", request_refresh)
+
+    remove = coordinator.async_add_endpoint_consumer({ENDPOINT_POWER_FLOW})
+    await hass.async_block_till_done()
+    request_refresh.assert_awaited_once()
+
+    coordinator.endpoints[ENDPOINT_POWER_FLOW].next_due = float("inf")
+    remove()
+    coordinator.async_add_endpoint_consumer({ENDPOINT_POWER_FLOW})
+    await hass.async_block_till_done()
+    request_refresh.assert_awaited_once()
+
+    coordinator.async_add_endpoint_consumer({ENDPOINT_ENERGY_STORAGE})
+    await hass.async_block_till_done()
+    assert request_refresh.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_power_flow_poll_follows_upstream_uploads(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Power flow should be polled just after the inverter's next upload."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    uploads = iter([1_000_000, 1_300_000])
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_cur_power_flow":
+                return {"timestamp": next(uploads)}
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    monkeypatch.setattr(coordinator, "async_request_refresh", AsyncMock())
+    monkeypatch.setattr("custom_components.livoltek.coordinator.time", lambda: 1330.0)
+    coordinator.data = LivoltekSnapshot()
+    coordinator.async_add_endpoint_consumer({ENDPOINT_POWER_FLOW})
+
+    now = 0.0
     monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_recent_grid",
-        AsyncMock(return_value=[]),
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
+    )
+    await coordinator._async_update_data()
+    assert coordinator.update_interval == dt.timedelta(minutes=2, seconds=30)
+
+    now = 300.0
+    await coordinator._async_update_data()
+
+    assert coordinator.upload_cadence.cadence == 300
+    assert coordinator.update_interval == dt.timedelta(seconds=290)
+
+
+@pytest.mark.asyncio
+async def test_energy_storage_index_is_rebuilt_only_for_new_payloads(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """The /ESS index should be kept while the endpoint is not refetched."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_energy_storage":
+                return {"currentSoc": "55"}
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    now = 0.0
+    monkeypatch.setattr(
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
     )
+
+    index = (await coordinator._async_update_data()).energy_storage
+    assert index.battery_soc == 55.0
+
+    now = 150.0
+    assert (await coordinator._async_update_data()).energy_storage is index
+
+    now = 300.0
+    assert (await coordinator._async_update_data()).energy_storage is not index
+
+
+@pytest.mark.asyncio
+async def test_energy_storage_failure_keeps_the_last_battery_data(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """A transient /ESS failure must not read as a site without a battery."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    fail = False
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_energy_storage":
+                if fail:
+                    raise LivoltekConnectionError("ESS returned HTTP 502")
+                return {"currentSoc": "55"}
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    now = 0.0
     monkeypatch.setattr(
-        "custom_components.livoltek.coordinator.async_get_recent_solar",
-        AsyncMock(return_value=[]),
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
+    )
+    await coordinator._async_update_data()
+
+    fail = True
+    now = 300.0
+    snapshot = await coordinator._async_update_data()
+
+    assert snapshot.energy_storage.battery_soc == 55.0
+    assert coordinator.endpoints[ENDPOINT_ENERGY_STORAGE].failures == 1
+    assert coordinator.metrics[ENDPOINT_ENERGY_STORAGE].error_count == 1
+
+
+@pytest.mark.asyncio
+async def test_unchanged_snapshot_does_not_notify_listeners(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """A refresh that yields an equal snapshot should not reach the entities."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_cur_power_flow":
+                return {"pvPower": "3.4"}
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    listener = Mock()
+    coordinator.async_add_listener(listener)
+
+    await coordinator.async_refresh()
+    await coordinator.async_refresh()
+
+    listener.assert_called_once()
+    await coordinator.async_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_device_list_changes_trigger_registration(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Devices should be registered again only when the list changes."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    devices = [[{"inverterSn": "INV-001"}], [{"inverterSn": "INV-001"}]]
+    devices.append([{"inverterSn": "INV-001"}, {"inverterSn": "INV-002"}])
+    device_lists = iter(devices)
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_device_list":
+                return next(device_lists)
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    register = AsyncMock()
+    monkeypatch.setattr(
+        "custom_components.livoltek.coordinator.async_register_devices", register
+    )
+    monkeypatch.setattr(coordinator.device_cache, "needs_refresh", lambda *args: False)
+
+    for _ in devices:
+        for state in coordinator.endpoints.values():
+            state.next_due = 0.0
+        await coordinator._async_update_data()
+        await hass.async_block_till_done()
+
+    assert register.await_count == 2
+    assert all(call.args[0] is coordinator.client for call in register.await_args_list)
+    assert [call.args[4] for call in register.await_args_list] == [devices[0], devices[2]]
+
+
+@pytest.mark.asyncio
+async def test_energy_storage_updates_import_statistics(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Fresh /ESS data should be handed to the statistics importer."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    importer = AsyncMock(return_value=0)
+    monkeypatch.setattr(coordinator.statistics, "async_import_energy_storage", importer)
+
+    await coordinator._async_update_data()
+    await hass.async_block_till_done()
+    importer.assert_not_awaited()
+
+    hass.config.components.add("recorder")
+    coordinator.endpoints[ENDPOINT_ENERGY_STORAGE].next_due = 0.0
+    snapshot = await coordinator._async_update_data()
+    await hass.async_block_till_done()
+
+    importer.assert_awaited_once()
+    assert importer.await_args.args[0] is snapshot.energy_storage
+
+
+@pytest.mark.asyncio
+async def test_daily_totals_roll_over_at_the_site_midnight(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Today's totals should reset at the site's midnight without a new fetch."""
+    with patch("custom_components.livoltek.async_setup_entry", AsyncMock()):
+        await hass.config_entries.async_add(livoltek_entry)
+    hass.config_entries.async_update_entry(
+        livoltek_entry, data={**livoltek_entry.data, CONF_SITE_TIMEZONE: "UTC+10"}
+    )
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    sydney = dt.timezone(dt.timedelta(hours=10))
+    noon = int(dt.datetime(2024, 5, 1, 12, tzinfo=sydney).timestamp() * 1000)
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_recent_grid":
+                return [{"ts": noon, "positive": "4.6", "negative": "1.4"}]
+            return [] if name == "async_get_recent_solar" else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    clock = {"now": dt.datetime(2024, 5, 1, 23, 50, tzinfo=sydney)}
+    monkeypatch.setattr(
+        "custom_components.livoltek.coordinator.dt_util.now",
+        lambda tz=None: clock["now"].astimezone(tz),
+    )
+
+    snapshot = await coordinator._async_update_data()
+    assert coordinator.site_timezone.utcoffset(None) == dt.timedelta(hours=10)
+    assert snapshot.today.grid_import == 4.6
+
+    clock["now"] += dt.timedelta(minutes=20)
+    snapshot = await coordinator._async_update_data()
+    assert snapshot.today == DailyEnergy()
+    assert snapshot.daily.yesterday.grid_import == 4.6
+
+
+@pytest.mark.asyncio
+async def test_site_timezone_of_older_entries_comes_from_the_site_listing(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Entries without a saved timezone look their site up in the listing once."""
+    with patch("custom_components.livoltek.async_setup_entry", AsyncMock()):
+        await hass.config_entries.async_add(livoltek_entry)
+    data = dict(livoltek_entry.data)
+    del data[CONF_SITE_TIMEZONE]
+    hass.config_entries.async_update_entry(livoltek_entry, data=data)
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    find_site = AsyncMock(
+        side_effect=[
+            LivoltekConnectionError("/hess/api/userSites/list returned HTTP 502"),
+            {"powerStationId": "site-123", "timezone": "UTC+10"},
+        ]
+    )
+    monkeypatch.setattr(
+        "custom_components.livoltek.coordinator.async_find_site", find_site
     )
 
     await coordinator._async_update_data()
+    assert coordinator.site_timezone is dt_util.get_default_time_zone()
+
+    # The site stays due until the lookup succeeds as part of its fetch.
+    await coordinator._async_update_data()
+    assert ENDPOINT_SITE in coordinator.refresh_cycles[-1]["endpoints"]
+    await coordinator._async_update_data()
+    assert ENDPOINT_SITE not in coordinator.refresh_cycles[-1]["endpoints"]
+    assert coordinator.site_timezone.utcoffset(None) == dt.timedelta(hours=10)
+    assert find_site.await_count == 2
+    find_site.assert_awaited_with(coordinator.client, "user-token-123", "site-123")
+
+
+@pytest.mark.asyncio
+async def test_saved_results_keep_empty_answers_but_not_failures(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """An endpoint that answered without data is saved, one that failed is not."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+
+    def factory(name):
+        async def _fetch(*args):
+            if name == "async_get_device_generations":
+                raise LivoltekConnectionError("realElectricity returned HTTP 502")
+            if name == "async_get_device_list":
+                return [{"id": "7", "inverterSn": "INV-001"}]
+            if name == "async_get_energy_storage":
+                return None
+            return [] if name in ("async_get_recent_grid", "async_get_recent_solar") else {}
+
+        return _fetch
+
+    _patch_endpoints(monkeypatch, factory)
+    coordinator.snapshot_store.async_save = Mock()
+
     await coordinator._async_update_data()
 
-    assert get_api_client.await_args_list[0].args == (livoltek_entry, None)
-    assert get_api_client.await_args_list[1].args == (livoltek_entry, "first-token")
-    assert coordinator.access_token == "second-token"
+    saved = coordinator.snapshot_store.async_save.call_args.args[1]
+    assert set(saved) == set(coordinator.endpoints) - {ENDPOINT_DEVICE_GENERATION}
+    assert saved[ENDPOINT_ENERGY_STORAGE] is None
+
+
+@pytest.mark.asyncio
+async def test_restore_builds_a_snapshot_from_saved_results(
+    hass,
+    livoltek_entry,
+    monkeypatch,
+) -> None:
+    """Saved results within their staleness budget should seed the first snapshot."""
+    monkeypatch.setattr("custom_components.livoltek.coordinator.time", lambda: 10_000.0)
+    saving = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    saving.endpoints[ENDPOINT_POWER_FLOW].data = {"pvPower": "3.4"}
+    saving.endpoints[ENDPOINT_RECENT_GRID].data = [{"ts": 1, "positive": "1"}]
+    saving.endpoints[ENDPOINT_DEVICE_GENERATION].data = {
+        "INV-001": DeviceGeneration("7", 812.5, 640.1, timestamp=1)
+    }
+    saved = {key: state.data for key, state in saving.endpoints.items()}
+    saving.snapshot_store.async_save(9_700.0, saved)
+    await saving.snapshot_store._store._async_handle_write_data()
+
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    assert await coordinator.async_restore()
+
+    # Five minutes old: every result is within its budget, empty ones included.
+    assert coordinator.data.restored
+    assert coordinator.data.power_flow.pv_power == 3.4
+    assert coordinator.data.energy_storage is None
+    assert coordinator.data.generation["INV-001"].pv_produce_electric == 812.5
+    assert coordinator.endpoints[ENDPOINT_RECENT_GRID].data == [{"ts": 1, "positive": "1"}]
+
+    # An hour old: power flow is past its budget, so its entities could not
+    # be created from the snapshot and the first refresh has to run.
+    saving.snapshot_store.async_save(9_000.0, saved)
+    await saving.snapshot_store._store._async_handle_write_data()
+    partial = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    assert not await partial.async_restore()
+    assert partial.data is None
+    assert partial.endpoints[ENDPOINT_POWER_FLOW].data is None
+    assert partial.endpoints[ENDPOINT_RECENT_GRID].data == [{"ts": 1, "positive": "1"}]
+
+    empty = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    empty.snapshot_store = SnapshotStore(hass, "other-entry")
+    assert not await empty.async_restore()
+    assert empty.data is None
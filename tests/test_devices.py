@@ -0,0 +1,53 @@
+"""Tests for the persistent device details cache."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.livoltek.devices import (
+    DEVICE_DETAILS_MAX_AGE,
+    DeviceDetailsCache,
+    device_record,
+)
+
+from .common import build_device_details
+
+
+@pytest.mark.asyncio
+async def test_device_cache_reports_registry_changes(hass) -> None:
+    """Only new devices or changed registry fields should count as changes."""
+    cache = DeviceDetailsCache(hass, "entry-123")
+    await cache.async_load()
+
+    details = build_device_details(updateTime=1000)
+    assert cache.needs_refresh("INV-001", now=0)
+    assert cache.update("INV-001", device_record(details, 0))
+    assert not cache.needs_refresh("INV-001", now=60)
+
+    assert not cache.update("INV-001", device_record(details, 60))
+    assert not cache.update(
+        "INV-001", device_record(build_device_details(updateTime=2000), 120)
+    )
+    assert cache.update(
+        "INV-001",
+        device_record(
+            build_device_details(updateTime=3000, firmwareVersion="1.1.0"), 180
+        ),
+    )
+
+    stale = 180 + DEVICE_DETAILS_MAX_AGE.total_seconds() + 1
+    assert cache.needs_refresh("INV-001", now=stale)
+
+
+@pytest.mark.asyncio
+async def test_device_cache_survives_restart(hass) -> None:
+    """Cached records should be read back from storage."""
+    cache = DeviceDetailsCache(hass, "entry-123")
+    await cache.async_load()
+    cache.update("INV-001", device_record(build_device_details(), 0))
+    await hass.async_stop(force=True)
+
+    restored = DeviceDetailsCache(hass, "entry-123")
+    await restored.async_load()
+
+    assert restored.records["INV-001"]["firmware_version"] == "1.0.0"
+    await restored.async_remove()
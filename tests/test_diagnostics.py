@@ -1,23 +1,148 @@
 """Tests for integration diagnostics."""
 from __future__ import annotations
 
-from types import SimpleNamespace
+import contextlib
+import datetime as dt
+import json
 
+import aiohttp
 import pytest
 
-from custom_components.livoltek.const import DOMAIN
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from custom_components.livoltek.api import LivoltekClient
+from custom_components.livoltek.const import (
+    DOMAIN,
+    ENDPOINT_POWER_FLOW,
+    ENDPOINT_SITE,
+)
+from custom_components.livoltek.coordinator import LivoltekDataUpdateCoordinator
 from custom_components.livoltek.diagnostics import async_get_config_entry_diagnostics
+from custom_components.livoltek.models import (
+    DeviceGeneration,
+    LivoltekSnapshot,
+    PowerFlow,
+)
+
+from .common import build_daily_energy
 
 
 @pytest.mark.asyncio
-async def test_diagnostics_round_trip_json(hass, livoltek_entry) -> None:
-    """Diagnostics should JSON-serialize the stored coordinator payload."""
-    hass.data[DOMAIN] = {
-        livoltek_entry.entry_id: SimpleNamespace(
-            data=SimpleNamespace(json=lambda: '{"site":"home","devices":2}')
-        )
+async def test_diagnostics_dump_snapshot_and_performance_profile(
+    hass, livoltek_entry
+) -> None:
+    """Diagnostics should carry the snapshot, request metrics and freshness."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    coordinator.data = LivoltekSnapshot(
+        power_flow=PowerFlow(pv_power=3.4),
+        daily=build_daily_energy(grid_import=4.6),
+        generation={"INV-001": DeviceGeneration("7", 812.5, timestamp=1714521600000)},
+    )
+    coordinator.metrics[ENDPOINT_POWER_FLOW].record(
+        0.3, 512, None, dt.datetime(2024, 5, 1, tzinfo=dt.UTC)
+    )
+    coordinator.refresh_cycles.append(
+        {"duration": 0.3, "endpoints": {ENDPOINT_POWER_FLOW: {"latency": 0.3}}}
+    )
+    coordinator.endpoints[ENDPOINT_SITE].record({"updateTime": "1714521600000"}, 0)
+    coordinator.upload_cadence.observe(1714521600.0)
+    hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
+
+    result = await async_get_config_entry_diagnostics(hass, livoltek_entry)
+
+    assert result["snapshot"]["power_flow"]["pv_power"] == 3.4
+    assert result["snapshot"]["energy_storage"] is None
+    assert result["snapshot"]["daily"]["days"][
+        result["snapshot"]["daily"]["current"]
+    ] == {
+        "grid_import": 4.6,
+        "grid_export": None,
+        "solar_generation": None,
     }
+    assert result["snapshot_bytes"] > 0
+    assert result["endpoint_metrics"][ENDPOINT_POWER_FLOW] == {
+        "calls": 1,
+        "successes": 1,
+        "errors": {},
+        "latency_histogram": {
+            "<=0.5s": 1,
+            "<=1s": 0,
+            "<=2s": 0,
+            "<=5s": 0,
+            "<=10s": 0,
+            "<=20s": 0,
+            ">20s": 0,
+        },
+        "last_latency": 0.3,
+        "response_bytes": 512,
+        "total_response_bytes": 512,
+        "last_success": "2024-05-01T00:00:00+00:00",
+    }
+    assert result["refresh_cycles"] == [
+        {"duration": 0.3, "endpoints": {ENDPOINT_POWER_FLOW: {"latency": 0.3}}}
+    ]
+    upstream = result["freshness"]["upstream"]
+    assert upstream["last_upload"] == "2024-05-01T00:00:00+00:00"
+    assert upstream["site_update_time"] == "2024-05-01T00:00:00+00:00"
+    assert upstream["device_generation"] == {"INV-001": "2024-05-01T00:00:00+00:00"}
+    assert result["freshness"]["endpoints"][ENDPOINT_SITE]["failures"] == 0
+    assert result["requests"]["circuit_breaker"]["state"] == "closed"
+    assert result["token_lifetime"] == {"age": None, "expires_in": None}
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_redact_credentials(hass, livoltek_entry) -> None:
+    """Credentials of the entry must never reach the download."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
+
+    result = await async_get_config_entry_diagnostics(hass, livoltek_entry)
+
+    data = result["entry"]["data"]
+    assert data["api_key"] == "**REDACTED**"
+    assert data["secuid_id"] == "**REDACTED**"
+    assert data["usertoken_id"] == "**REDACTED**"
+    assert data["site_id"] == "site-123"
+    assert "api-key" not in str(result)
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_without_data(hass, livoltek_entry) -> None:
+    """Before the first refresh the profile is still available."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
+
+    result = await async_get_config_entry_diagnostics(hass, livoltek_entry)
+
+    assert result["snapshot"] is None
+    assert result["refresh_cycles"] == []
+    assert result["freshness"]["endpoints"][ENDPOINT_POWER_FLOW]["age"] is None
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_do_not_leak_the_user_token_in_errors(
+    hass, livoltek_entry, aresponses
+) -> None:
+    """Failed requests must not carry the user token into errors or the download."""
+    aresponses.add(
+        aresponses.ANY,
+        aresponses.ANY,
+        "GET",
+        aresponses.Response(status=502),
+        repeat=aresponses.INFINITY,
+    )
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
+
+    async with aiohttp.ClientSession() as session:
+        coordinator.client = LivoltekClient(
+            session, "http://api.livoltek-portal.com:8081", "jwt-token"
+        )
+        with contextlib.suppress(UpdateFailed):
+            await coordinator._async_update_data()
 
     result = await async_get_config_entry_diagnostics(hass, livoltek_entry)
 
-    assert result == {"site": "home", "devices": 2}
+    site = result["freshness"]["endpoints"][ENDPOINT_SITE]
+    assert site["error"] == "/hess/api/site/site-123/overview returned HTTP 502"
+    assert "user-token-123" not in json.dumps(result, default=str)
@@ -0,0 +1,202 @@
+"""Tests for account-level fleet scheduling."""
+from __future__ import annotations
+
+import datetime as dt
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from custom_components.livoltek.const import DATA_FLEETS, ENDPOINT_POWER_FLOW
+from custom_components.livoltek.coordinator import LivoltekDataUpdateCoordinator
+from custom_components.livoltek.fleet import RequestBudget, async_join_fleet
+
+
+class FakeClock:
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        """Start at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        """Advance the clock instead of waiting."""
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """Drive the fleet module from a fake clock."""
+    fake = FakeClock()
+    monkeypatch.setattr("custom_components.livoltek.fleet.monotonic", fake)
+    monkeypatch.setattr("custom_components.livoltek.fleet.asyncio.sleep", fake.sleep)
+    return fake
+
+
+def _site() -> SimpleNamespace:
+    """Build a fake site coordinator."""
+    return SimpleNamespace(
+        async_refresh=AsyncMock(),
+        async_config_entry_first_refresh=AsyncMock(),
+        client=SimpleNamespace(request_limiter=None, token_provider=None),
+        next_refresh_delay=dt.timedelta(minutes=2),
+        config_entry=SimpleNamespace(
+            async_create_background_task=lambda hass, coro, name: hass.async_create_task(
+                coro
+            )
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_request_budget_waits_for_refill(clock) -> None:
+    """Requests beyond the bucket should wait for the refill rate."""
+    budget = RequestBudget(requests_per_minute=60)
+
+    await budget.async_acquire(7)
+    assert clock.now == 0
+
+    await budget.async_acquire(3)
+    assert clock.now == pytest.approx(3)
+
+
+@pytest.mark.asyncio
+async def test_fleet_spreads_sites_over_the_interval(hass, clock, monkeypatch) -> None:
+    """Due sites should refresh in phase order, each on its own schedule."""
+    phases = iter([30.0, 10.0, 20.0])
+    monkeypatch.setattr(
+        "custom_components.livoltek.fleet.random.uniform",
+        lambda low, high: next(phases) if high > 2 else 1.0,
+    )
+    sites = {name: _site() for name in ("a", "b", "c")}
+    leave = {
+        name: async_join_fleet(hass, "host", "secuid", name, site, 60)
+        for name, site in sites.items()
+    }
+    fleet = hass.data[DATA_FLEETS][("host", "secuid")]
+
+    clock.now = 15.0
+    fleet._async_tick()
+    await hass.async_block_till_done()
+    assert [name for name, site in sites.items() if site.async_refresh.await_count] == ["b"]
+
+    clock.now = 40.0
+    fleet._async_tick()
+    await hass.async_block_till_done()
+
+    assert sites["c"].async_refresh.await_count == 1
+    assert sites["a"].async_refresh.await_count == 1
+    assert fleet.members["b"].next_poll == pytest.approx(15.0 + 120)
+    assert fleet.members["a"].next_poll == pytest.approx(40.0 + 120)
+
+    for callback in leave.values():
+        callback()
+    assert DATA_FLEETS in hass.data
+    assert ("host", "secuid") not in hass.data[DATA_FLEETS]
+
+
+@pytest.mark.asyncio
+async def test_first_refresh_waits_for_jitter(hass, clock, monkeypatch) -> None:
+    """The first refreshes of sites starting together are spread out."""
+    monkeypatch.setattr(
+        "custom_components.livoltek.fleet.random.uniform",
+        lambda low, high: 4.0 if high > 2 else 1.0,
+    )
+    sites = {name: _site() for name in ("a", "b")}
+    for name, site in sites.items():
+        async_join_fleet(hass, "host", "secuid", name, site, 60)
+    fleet = hass.data[DATA_FLEETS][("host", "secuid")]
+    assert sites["a"].fleet is fleet
+
+    await fleet.async_first_refresh("a")
+    assert clock.now == pytest.approx(4.0)
+    await fleet.async_first_refresh("b")
+
+    assert all(
+        site.async_config_entry_first_refresh.await_count == 1
+        for site in sites.values()
+    )
+    assert clock.now == pytest.approx(4.0 + 4.0)
+    assert fleet.members["b"].next_poll == pytest.approx(clock.now + 120)
+
+
+@pytest.mark.asyncio
+async def test_fleet_budget_limits_every_request_of_its_sites(
+    hass, livoltek_entry, clock
+) -> None:
+    """The clients and token broker of fleet sites wait for the account's budget."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry, fleet_managed=True)
+    broker = coordinator.client.token_provider
+    leave = async_join_fleet(hass, "host", "secuid", "a", coordinator, 60)
+    fleet = hass.data[DATA_FLEETS][("host", "secuid")]
+
+    assert coordinator.client.request_limiter is fleet.budget
+    assert broker.request_limiter is fleet.budget
+
+    leave()
+    assert coordinator.client.request_limiter is None
+    assert broker.request_limiter is None
+
+
+@pytest.mark.asyncio
+async def test_poll_soon_moves_a_site_to_the_next_ticks(hass, clock, monkeypatch) -> None:
+    """A new consumer should not wait a whole phase for its endpoint."""
+    monkeypatch.setattr(
+        "custom_components.livoltek.fleet.random.uniform", lambda low, high: high
+    )
+    site = _site()
+    leave = async_join_fleet(hass, "host", "secuid", "a", site, 60)
+    fleet = hass.data[DATA_FLEETS][("host", "secuid")]
+    assert fleet.members["a"].next_poll == pytest.approx(150.0)
+
+    fleet.async_poll_soon("a")
+    assert fleet.members["a"].next_poll == pytest.approx(5.0)
+
+    leave()
+    assert site.fleet is None
+
+
+@pytest.mark.asyncio
+async def test_new_consumers_of_a_fleet_managed_coordinator_ask_the_fleet(
+    hass, livoltek_entry
+) -> None:
+    """In fleet mode a new consumer's refresh goes through the fleet's budget."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry, fleet_managed=True)
+    coordinator.fleet = Mock()
+    coordinator.async_request_refresh = AsyncMock()
+
+    coordinator.async_add_endpoint_consumer({ENDPOINT_POWER_FLOW})
+    await hass.async_block_till_done()
+
+    coordinator.fleet.async_poll_soon.assert_called_once_with(livoltek_entry.entry_id)
+    coordinator.async_request_refresh.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_fleet_managed_coordinator_does_not_schedule_itself(
+    hass, livoltek_entry, monkeypatch
+) -> None:
+    """In fleet mode the coordinator only reports when it wants to run next."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry, fleet_managed=True)
+
+    async def _fetch(*args):
+        return []
+
+    for name in (
+        "async_get_site",
+        "async_get_device_list",
+        "async_get_cur_power_flow",
+        "async_get_energy_storage",
+        "async_get_recent_grid",
+        "async_get_recent_solar",
+    ):
+        monkeypatch.setattr(f"custom_components.livoltek.coordinator.{name}", _fetch)
+
+    await coordinator._async_update_data()
+
+    assert coordinator.update_interval is None
+    assert coordinator.next_refresh_delay == dt.timedelta(minutes=2, seconds=30)
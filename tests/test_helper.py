@@ -1,80 +1,40 @@
 """Tests for Livoltek helper functions."""
 from __future__ import annotations
 
+import asyncio
+import datetime as dt
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, Mock
 
 import pytest
 
 from homeassistant.const import CONF_API_KEY
+from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.util import dt as dt_util
 
 from custom_components.livoltek import helper
+from custom_components.livoltek.api import (
+    LivoltekAuthenticationError,
+    LivoltekConnectionError,
+    LivoltekNotFoundError,
+)
 from custom_components.livoltek.const import (
     CONF_EMEA_ID,
+    CONF_HEDGE_REQUESTS,
     CONF_SECUID_ID,
     CONF_SITE_ID,
     CONF_USERTOKEN_ID,
     LIVOLTEK_EMEA_SERVER,
     LIVOLTEK_GLOBAL_SERVER,
 )
+from custom_components.livoltek.devices import DeviceDetailsCache
+from custom_components.livoltek.models import DeviceGeneration
 
 from .common import build_device_details
 
 
-def test_validate_jwt_returns_true_for_decodable_token(monkeypatch) -> None:
-    """A decodable JWT should be considered valid."""
-    decode = Mock(return_value={"exp": 1})
-    monkeypatch.setattr(helper, "PyJWT", decode)
-
-    assert helper.validate_jwt({"header": "payload"}) is True
-    decode.assert_called_once_with({"header": "payload"})
-
-
-def test_validate_jwt_returns_false_on_decode_error(monkeypatch) -> None:
-    """Any JWT decoding error should invalidate the token."""
-    monkeypatch.setattr(helper, "PyJWT", Mock(side_effect=ValueError("bad token")))
-
-    assert helper.validate_jwt("bad-token") is False
-
-
-@pytest.mark.asyncio
-async def test_async_get_api_client_reuses_valid_access_token(
-    livoltek_entry,
-    monkeypatch,
-) -> None:
-    """Valid tokens should be reused without logging in again."""
-
-    class FakeApiClient:
-        def __init__(self, config) -> None:
-            self.config = config
-            self.headers = {}
-
-        def set_default_header(self, name: str, value: str) -> None:
-            self.headers[name] = value
-
-    class FakeDefaultApi:
-        def __init__(self, api_client) -> None:
-            self.api_client = api_client
-
-    refresh = AsyncMock()
-    monkeypatch.setattr(helper, "validate_jwt", Mock(return_value=True))
-    monkeypatch.setattr(helper, "async_get_login_token", refresh)
-    monkeypatch.setattr(helper, "ApiClient", FakeApiClient)
-    monkeypatch.setattr(helper, "DefaultApi", FakeDefaultApi)
-
-    api, token = await helper.async_get_api_client(livoltek_entry, "cached-token")
-
-    assert token == "cached-token"
-    assert api.api_client.config.host == LIVOLTEK_GLOBAL_SERVER
-    assert api.api_client.headers["Authorization"] == "cached-token"
-    refresh.assert_not_awaited()
-
-
-@pytest.mark.asyncio
-async def test_async_get_api_client_refreshes_invalid_token_on_emea(
-    monkeypatch,
-) -> None:
-    """Invalid tokens should trigger a fresh login against the selected region."""
+def test_create_api_client_targets_entry_region_with_credentials(monkeypatch) -> None:
+    """The entry client should use the regional host and unescaped credentials."""
     entry = SimpleNamespace(
         data={
             CONF_API_KEY: "line1\\nline2",
@@ -82,91 +42,45 @@ async def test_async_get_api_client_refreshes_invalid_token_on_emea(
             CONF_SECUID_ID: "secuid-456",
             CONF_SITE_ID: "site-123",
             CONF_USERTOKEN_ID: "user-token-123",
-        }
+        },
+        options={CONF_HEDGE_REQUESTS: True},
     )
-
-    class FakeApiClient:
-        def __init__(self, config) -> None:
-            self.config = config
-            self.headers = {}
-
-        def set_default_header(self, name: str, value: str) -> None:
-            self.headers[name] = value
-
-    class FakeDefaultApi:
-        def __init__(self, api_client) -> None:
-            self.api_client = api_client
-
-    refresh = AsyncMock(return_value="fresh-token")
-    monkeypatch.setattr(helper, "validate_jwt", Mock(return_value=False))
-    monkeypatch.setattr(helper, "async_get_login_token", refresh)
-    monkeypatch.setattr(helper, "ApiClient", FakeApiClient)
-    monkeypatch.setattr(helper, "DefaultApi", FakeDefaultApi)
-
-    api, token = await helper.async_get_api_client(entry, "stale-token")
-
-    assert token == "fresh-token"
-    assert api.api_client.config.host == LIVOLTEK_EMEA_SERVER
-    assert api.api_client.headers["Authorization"] == "fresh-token"
-    refresh.assert_awaited_once_with(
-        LIVOLTEK_EMEA_SERVER,
-        "line1\\nline2",
-        "secuid-456",
+    monkeypatch.setattr(helper, "async_get_clientsession", Mock())
+    monkeypatch.setattr(
+        "custom_components.livoltek.auth.async_get_clientsession", Mock()
     )
 
+    client = helper.create_api_client(SimpleNamespace(data={}), entry)
 
-@pytest.mark.asyncio
-async def test_async_get_login_token_sets_request_timeout(monkeypatch) -> None:
-    """Login requests should use the integration HTTP timeout."""
-
-    class FakeApiClient:
-        def __init__(self, config) -> None:
-            self.config = config
-
-    class FakeDefaultApi:
-        def __init__(self, api_client) -> None:
-            self.api_client = api_client
-
-        def hess_api_login_post_with_http_info(self, model, **kwargs):
-            assert kwargs["_preload_content"] is True
-            assert kwargs["_request_timeout"] == helper.API_REQUEST_TIMEOUT
-            return (SimpleNamespace(message="SUCCESS", data={"data": "token"}),)
-
-    monkeypatch.setattr(helper, "ApiClient", FakeApiClient)
-    monkeypatch.setattr(helper, "DefaultApi", FakeDefaultApi)
-
-    token = await helper.async_get_login_token(
-        LIVOLTEK_GLOBAL_SERVER,
-        "api-key",
-        "secuid-123",
-    )
-
-    assert token == "token"
+    assert client.host == LIVOLTEK_EMEA_SERVER
+    assert client._token_provider.host == LIVOLTEK_EMEA_SERVER
+    assert client._token_provider.secuid == "secuid-456"
+    assert client._token_provider.api_key == "line1\nline2"
+    assert client.circuit_breaker.host == LIVOLTEK_EMEA_SERVER
+    assert client.hedge
+    assert client.token is None
 
 
 @pytest.mark.asyncio
-async def test_async_update_devices_unpacks_api_result_before_fetching_list(
-    livoltek_entry,
+async def test_async_get_login_token_unescapes_key_and_maps_auth_errors(
     monkeypatch,
 ) -> None:
-    """Device updates should pass the API instance, not the helper tuple, downstream."""
-    api = object()
-    get_api_client = AsyncMock(return_value=(api, "token"))
-    get_device_list = AsyncMock(return_value=[{"inverterSn": "INV-001"}])
-    register_devices = AsyncMock()
-    monkeypatch.setattr(helper, "async_get_api_client", get_api_client)
-    monkeypatch.setattr(helper, "async_get_device_list", get_device_list)
-    monkeypatch.setattr(helper, "async_register_devices", register_devices)
+    """Login should unescape the PEM key and surface rejections as auth failures."""
+    login = AsyncMock(side_effect=LivoltekAuthenticationError("SECUID_ERROR"))
+    monkeypatch.setattr(helper.LivoltekClient, "async_login", login)
+    monkeypatch.setattr(
+        "custom_components.livoltek.auth.async_get_clientsession", Mock()
+    )
 
-    await helper.async_update_devices(livoltek_entry, hass=object())
+    with pytest.raises(ConfigEntryAuthFailed):
+        await helper.async_get_login_token(
+            SimpleNamespace(data={}),
+            LIVOLTEK_GLOBAL_SERVER,
+            "line1\\nline2",
+            "secuid-123",
+        )
 
-    get_device_list.assert_awaited_once_with(
-        api,
-        livoltek_entry.data[CONF_USERTOKEN_ID],
-        livoltek_entry.data[CONF_SITE_ID],
-    )
-    register_devices.assert_awaited_once()
-    assert register_devices.await_args.args[0] is api
+    login.assert_awaited_once_with("secuid-123", "line1\nline2")
 
 
 @pytest.mark.asyncio
@@ -179,12 +93,12 @@ async def test_async_register_devices_creates_device_registry_entries(
     monkeypatch.setattr(helper.dr, "async_get", Mock(return_value=registry))
 
     api = Mock()
-    api.get_device_details.side_effect = [
-        SimpleNamespace(data=build_device_details(id="device-1")),
-        SimpleNamespace(data=build_device_details(id="device-2")),
-    ]
-    hass = Mock()
-    hass.async_add_executor_job = AsyncMock(side_effect=lambda job: job())
+    api.async_get_device_details = AsyncMock(
+        side_effect=[
+            build_device_details(id="device-1"),
+            build_device_details(id="device-2", inverterSn="INV-002"),
+        ]
+    )
 
     await helper.async_register_devices(
         api=api,
@@ -192,62 +106,256 @@ async def test_async_register_devices_creates_device_registry_entries(
         user_token="user-token-123",
         site_id="site-123",
         device_list=[{"inverterSn": "INV-001"}, {"inverterSn": "INV-002"}],
-        hass=hass,
+        hass=Mock(),
     )
 
     assert registry.async_get_or_create.call_count == 2
     first_call = registry.async_get_or_create.call_args_list[0]
     assert first_call.kwargs["config_entry_id"] == livoltek_entry.entry_id
     assert first_call.kwargs["identifiers"] == {("livoltek", "device-1")}
-    assert api.get_device_details.call_args_list[0].kwargs["_request_timeout"] == (
-        helper.API_REQUEST_TIMEOUT
+    assert first_call.kwargs["sw_version"] == "1.0.0"
+    api.async_get_device_details.assert_any_await(
+        "user-token-123", "site-123", "INV-002"
     )
 
 
 @pytest.mark.asyncio
-async def test_async_get_hass_device_info_returns_expected_shape() -> None:
-    """Device info should preserve the device metadata Home Assistant uses."""
-    device = build_device_details(
-        id="device-9",
-        inverter_sn="INV-009",
-        firmware_version="2.0.1",
+async def test_async_register_devices_raises_client_errors(
+    livoltek_entry, monkeypatch
+) -> None:
+    """Errors of the client should reach the caller, which keeps the old devices."""
+    monkeypatch.setattr(helper.dr, "async_get", Mock())
+    api = Mock()
+    api.async_get_device_details = AsyncMock(
+        side_effect=LivoltekConnectionError("details returned HTTP 500")
     )
 
-    result = await helper.async_get_hass_device_info(SimpleNamespace(), device)
+    with pytest.raises(LivoltekConnectionError):
+        await helper.async_register_devices(
+            api=api,
+            entry=livoltek_entry,
+            user_token="user-token-123",
+            site_id="site-123",
+            device_list=[{"inverterSn": "INV-001"}],
+            hass=Mock(),
+        )
+
 
-    assert result["identifiers"] == {("livoltek", "device-9")}
-    assert result["name"] == "INV-009"
-    assert result["sw_version"] == "2.0.1"
+@pytest.mark.asyncio
+async def test_async_register_devices_keeps_the_devices_that_were_fetched(
+    hass, livoltek_entry, monkeypatch
+) -> None:
+    """One failed device should not lose the others, and is the only one retried."""
+    registry = Mock()
+    monkeypatch.setattr(helper.dr, "async_get", Mock(return_value=registry))
+    cache = DeviceDetailsCache(hass, livoltek_entry.entry_id)
+    api = Mock()
+    api.async_get_device_details = AsyncMock(
+        side_effect=[
+            build_device_details(id="device-1"),
+            LivoltekConnectionError("details returned HTTP 500"),
+            None,
+            build_device_details(id="device-2", inverterSn="INV-002"),
+            build_device_details(id="device-3", inverterSn="INV-003"),
+        ]
+    )
+    device_list = [{"inverterSn": f"INV-00{index}"} for index in range(1, 4)]
+
+    with pytest.raises(LivoltekConnectionError, match="INV-002.*INV-003"):
+        await helper.async_register_devices(
+            api, livoltek_entry, "user-token-123", "site-123", device_list, hass, cache
+        )
+    assert registry.async_get_or_create.call_count == 1
+
+    await helper.async_register_devices(
+        api, livoltek_entry, "user-token-123", "site-123", device_list, hass, cache
+    )
+    assert registry.async_get_or_create.call_count == 3
+    assert [call.args[2] for call in api.async_get_device_details.await_args_list] == [
+        "INV-001",
+        "INV-002",
+        "INV-003",
+        "INV-002",
+        "INV-003",
+    ]
 
 
 @pytest.mark.asyncio
 async def test_async_get_energy_storage_returns_data_on_success() -> None:
-    """async_get_energy_storage should return the EnergyStore data on a successful call."""
-    ess_data = SimpleNamespace(current_soc=75.0, battery_sn="BAT-001")
+    """async_get_energy_storage should return the /ESS data on a successful call."""
+    ess_data = {"currentSoc": "75.0", "batterySn": "BAT-001"}
 
     api = Mock()
-    api.get_energy_storage_with_http_info.return_value = (
-        SimpleNamespace(data=ess_data),
-    )
+    api.async_get_energy_storage = AsyncMock(return_value=ess_data)
 
     result = await helper.async_get_energy_storage(api, "user-token", "site-123")
 
     assert result is ess_data
-    call_kwargs = api.get_energy_storage_with_http_info.call_args.kwargs
-    assert call_kwargs["_request_timeout"] == helper.API_REQUEST_TIMEOUT
+    api.async_get_energy_storage.assert_awaited_once_with("user-token", "site-123")
+
+
+@pytest.mark.asyncio
+async def test_async_get_energy_storage_returns_none_without_a_battery() -> None:
+    """A site without a battery is answered with 404 and has no /ESS data."""
+    api = Mock()
+    api.async_get_energy_storage = AsyncMock(
+        side_effect=LivoltekNotFoundError("/hess/api/site/site-123/ESS returned HTTP 404")
+    )
+
+    result = await helper.async_get_energy_storage(api, "user-token", "site-123")
+
+    assert result is None
 
 
 @pytest.mark.asyncio
-async def test_async_get_energy_storage_returns_none_on_api_exception(
+async def test_async_get_energy_storage_raises_on_connection_error() -> None:
+    """Transient /ESS failures must reach the coordinator, not read as no battery."""
+    api = Mock()
+    api.async_get_energy_storage = AsyncMock(
+        side_effect=LivoltekConnectionError("/hess/api/site/site-123/ESS returned HTTP 502")
+    )
+
+    with pytest.raises(LivoltekConnectionError):
+        await helper.async_get_energy_storage(api, "user-token", "site-123")
+
+
+@pytest.mark.asyncio
+async def test_async_register_devices_fetches_concurrently_and_uses_cache(
+    hass,
+    livoltek_entry,
     monkeypatch,
 ) -> None:
-    """async_get_energy_storage should return None and log a warning when the API fails."""
-    from pylivoltek.rest import ApiException
+    """Details should be fetched in parallel and skipped while cached."""
+    registry = Mock()
+    monkeypatch.setattr(helper.dr, "async_get", Mock(return_value=registry))
+    cache = DeviceDetailsCache(hass, livoltek_entry.entry_id)
+    running = 0
+    peak = 0
+
+    async def get_device_details(user_token, site_id, serial):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return build_device_details(id=serial, inverterSn=serial, updateTime=1)
 
     api = Mock()
-    api.get_energy_storage_with_http_info.side_effect = ApiException(status=404)
+    api.async_get_device_details = AsyncMock(side_effect=get_device_details)
+    device_list = [{"inverterSn": f"INV-00{index}"} for index in range(3)]
 
-    result = await helper.async_get_energy_storage(api, "user-token", "site-123")
+    for _ in range(2):
+        await helper.async_register_devices(
+            api,
+            livoltek_entry,
+            "user-token-123",
+            "site-123",
+            device_list,
+            hass,
+            cache,
+        )
+
+    assert peak == 3
+    assert api.async_get_device_details.await_count == 3
+    assert registry.async_get_or_create.call_count == 3
 
-    assert result is None
 
+@pytest.mark.asyncio
+async def test_async_get_device_generations_skips_devices_without_new_data(
+    monkeypatch,
+) -> None:
+    """Only devices that may have uploaded since the last read should be fetched."""
+    previous = {
+        "INV-001": DeviceGeneration("1", 100.0, 50.0, timestamp=1_100_000),
+        "INV-002": DeviceGeneration("2", 200.0, 80.0, timestamp=1_000_000),
+    }
+    payloads = {
+        "2": {
+            "pvProduceElectric": "201.5",
+            "loadCustomerElectric": "81",
+            "timestamp": 1_060_000,
+        },
+        "3": LivoltekConnectionError("boom"),
+    }
+    requested: list[str] = []
+
+    async def _fetch(api, user_token, device_id):
+        requested.append(device_id)
+        payload = payloads[device_id]
+        if isinstance(payload, Exception):
+            raise payload
+        return payload
+
+    monkeypatch.setattr(helper, "async_get_device_generation", _fetch)
+    devices = [
+        {"id": "1", "inverterSn": "INV-001"},
+        {"id": "2", "inverterSn": "INV-002"},
+        {"id": "3", "inverterSn": "INV-003"},
+    ]
+
+    result = await helper.async_get_device_generations(
+        Mock(), "user-token", devices, previous, last_upload=1_050
+    )
+
+    assert sorted(requested) == ["2", "3"]
+    assert result["INV-001"] is previous["INV-001"]
+    assert result["INV-002"].pv_produce_electric == 201.5
+    assert "INV-003" not in result
+
+
+@pytest.mark.asyncio
+async def test_async_get_device_generations_keeps_counters_that_did_not_advance(
+    monkeypatch,
+) -> None:
+    """A response with an older timestamp should not replace known counters."""
+    known = DeviceGeneration("1", 100.0, 50.0, timestamp=2_000_000)
+    monkeypatch.setattr(
+        helper,
+        "async_get_device_generation",
+        AsyncMock(return_value={"pvProduceElectric": "0", "timestamp": 1_000_000}),
+    )
+
+    result = await helper.async_get_device_generations(
+        Mock(), "user-token", [{"id": "1", "inverterSn": "INV-001"}], {"INV-001": known}
+    )
+
+    assert result == {"INV-001": known}
+
+
+@pytest.mark.asyncio
+async def test_async_find_site_matches_the_site_id() -> None:
+    """The site's listing entry should be found by its powerStationId."""
+
+    closed = []
+
+    async def _sites(user_token):
+        try:
+            yield {"powerStationId": 101, "timezone": "Europe/London"}
+            yield {"powerStationId": 202, "timezone": "Asia/Shanghai"}
+        finally:
+            closed.append(user_token)
+
+    api = Mock()
+    api.async_iter_sites = _sites
+
+    assert (await helper.async_find_site(api, "user-token", "202"))["timezone"] == (
+        "Asia/Shanghai"
+    )
+    assert closed == ["user-token"]
+    assert await helper.async_find_site(api, "user-token", "303") is None
+
+
+@pytest.mark.asyncio
+async def test_async_get_site_timezone_accepts_names_and_offsets(hass) -> None:
+    """Site timezones may be IANA names or UTC offsets."""
+    assert str(await helper.async_get_site_timezone("Europe/London")) == (
+        "Europe/London"
+    )
+    offset = await helper.async_get_site_timezone("UTC+05:30")
+    assert offset.utcoffset(None) == dt.timedelta(hours=5, minutes=30)
+    offset = await helper.async_get_site_timezone("-8")
+    assert offset.utcoffset(None) == dt.timedelta(hours=-8)
+
+    default = dt_util.get_default_time_zone()
+    assert await helper.async_get_site_timezone("Mars/Olympus") is default
+    assert await helper.async_get_site_timezone(None) is default
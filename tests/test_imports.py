@@ -0,0 +1,82 @@
+"""Import-time and memory budget of the integration package."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Home Assistant has loaded these by the time it imports the integration.
+PRELOADED = (
+    "homeassistant.components.diagnostics",
+    "homeassistant.components.recorder.statistics",
+    "homeassistant.components.sensor",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.aiohttp_client",
+    "homeassistant.helpers.selector",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator",
+)
+
+INTEGRATION = (
+    "custom_components.livoltek",
+    "custom_components.livoltek.config_flow",
+    "custom_components.livoltek.diagnostics",
+    "custom_components.livoltek.sensor",
+)
+
+# Generous budgets: the package itself costs a fraction of them, while the
+# generated pylivoltek client it no longer uses exceeded both on its own.
+IMPORT_TIME_BUDGET = 0.25
+IMPORT_MEMORY_BUDGET = 1_500_000
+
+_SCRIPT = """
+import importlib, json, sys, time, tracemalloc
+for name in {preloaded!r}:
+    importlib.import_module(name)
+before = set(sys.modules)
+if {trace_memory!r}:
+    tracemalloc.start()
+start = time.perf_counter()
+for name in {integration!r}:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1] if {trace_memory!r} else 0
+print(json.dumps({{
+    "elapsed": elapsed,
+    "peak": peak,
+    "modules": sorted(set(sys.modules) - before),
+}}))
+"""
+
+
+def _import_integration(*, trace_memory: bool) -> dict:
+    """Import the integration in a fresh interpreter and report the cost."""
+    script = _SCRIPT.format(
+        preloaded=PRELOADED, integration=INTEGRATION, trace_memory=trace_memory
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        check=True,
+        cwd=REPO_ROOT,
+        text=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_does_not_load_the_generated_client() -> None:
+    """The integration should not import the generated pylivoltek client at all."""
+    report = _import_integration(trace_memory=False)
+
+    assert not [name for name in report["modules"] if name.startswith("pylivoltek")]
+    assert report["elapsed"] < IMPORT_TIME_BUDGET
+
+
+def test_import_memory_stays_within_budget() -> None:
+    """Importing the integration should allocate little beyond its own modules."""
+    report = _import_integration(trace_memory=True)
+
+    assert report["peak"] < IMPORT_MEMORY_BUDGET
@@ -5,10 +5,8 @@ from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
-from custom_components.livoltek import LivoltekInverterDevice, async_setup_entry, async_unload_entry
-from custom_components.livoltek.const import DOMAIN, PLATFORMS
-
-from .common import build_device_details
+from custom_components.livoltek import async_setup_entry, async_unload_entry
+from custom_components.livoltek.const import CONF_FLEET_MODE, DOMAIN, PLATFORMS
 
 
 @pytest.mark.asyncio
@@ -17,7 +15,8 @@ async def test_async_setup_entry_creates_coordinator_and_forwards_platforms(
     livoltek_entry,
 ) -> None:
     """Entry setup should refresh the coordinator and forward configured platforms."""
-    coordinator = Mock()
+    coordinator = Mock(fleet=None)
+    coordinator.async_restore = AsyncMock(return_value=False)
     coordinator.async_config_entry_first_refresh = AsyncMock()
 
     with (
@@ -39,10 +38,80 @@ async def test_async_setup_entry_creates_coordinator_and_forwards_platforms(
     forward_entry_setups.assert_awaited_once_with(livoltek_entry, PLATFORMS)
 
 
+@pytest.mark.asyncio
+async def test_async_setup_entry_refreshes_restored_coordinator_in_background(
+    hass,
+    livoltek_entry,
+) -> None:
+    """A restored snapshot should let setup finish before the cloud answers."""
+    coordinator = Mock(fleet=None)
+    coordinator.async_restore = AsyncMock(return_value=True)
+    coordinator.async_config_entry_first_refresh = AsyncMock()
+    coordinator.async_refresh = AsyncMock()
+
+    with (
+        patch(
+            "custom_components.livoltek.LivoltekDataUpdateCoordinator",
+            return_value=coordinator,
+        ),
+        patch.object(hass.config_entries, "async_forward_entry_setups", AsyncMock()),
+    ):
+        assert await async_setup_entry(hass, livoltek_entry) is True
+        await hass.async_block_till_done()
+
+    coordinator.async_config_entry_first_refresh.assert_not_awaited()
+    coordinator.async_refresh.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("restored", [False, True])
+async def test_async_setup_entry_in_fleet_mode_refreshes_through_the_fleet(
+    hass,
+    livoltek_entry,
+    restored,
+) -> None:
+    """Fleet-mode entries leave their first refresh to the account's fleet."""
+    with patch("custom_components.livoltek.async_setup_entry", AsyncMock()):
+        await hass.config_entries.async_add(livoltek_entry)
+    hass.config_entries.async_update_entry(
+        livoltek_entry, options={CONF_FLEET_MODE: True}
+    )
+    fleet = Mock(async_first_refresh=AsyncMock())
+    coordinator = Mock(fleet=None)
+    coordinator.async_restore = AsyncMock(return_value=restored)
+    coordinator.async_config_entry_first_refresh = AsyncMock()
+    coordinator.async_refresh = AsyncMock()
+
+    def _join(hass, host, secuid, entry_id, coordinator, budget):
+        coordinator.fleet = fleet
+        return Mock()
+
+    with (
+        patch(
+            "custom_components.livoltek.LivoltekDataUpdateCoordinator",
+            return_value=coordinator,
+        ),
+        patch("custom_components.livoltek.async_join_fleet", _join),
+        patch.object(hass.config_entries, "async_forward_entry_setups", AsyncMock()),
+    ):
+        assert await async_setup_entry(hass, livoltek_entry) is True
+        await hass.async_block_till_done()
+
+    coordinator.async_config_entry_first_refresh.assert_not_awaited()
+    coordinator.async_refresh.assert_not_awaited()
+    if restored:
+        fleet.async_poll_soon.assert_called_once_with(livoltek_entry.entry_id)
+        fleet.async_first_refresh.assert_not_awaited()
+    else:
+        fleet.async_first_refresh.assert_awaited_once_with(livoltek_entry.entry_id)
+
+
 @pytest.mark.asyncio
 async def test_async_unload_entry_removes_coordinator_data(hass, livoltek_entry) -> None:
-    """Unloading the entry should remove coordinator data after platform cleanup."""
-    hass.data[DOMAIN] = {livoltek_entry.entry_id: object()}
+    """Unloading the entry should shut the coordinator down and drop its data."""
+    coordinator = Mock()
+    coordinator.async_shutdown = AsyncMock()
+    hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
 
     with patch.object(
         hass.config_entries,
@@ -54,20 +123,4 @@ async def test_async_unload_entry_removes_coordinator_data(hass, livoltek_entry)
     assert result is True
     unload_platforms.assert_awaited_once_with(livoltek_entry, PLATFORMS)
     assert livoltek_entry.entry_id not in hass.data[DOMAIN]
-
-
-def test_inverter_device_info_maps_pylivoltek_metadata(hass) -> None:
-    """The device wrapper should expose the Home Assistant device registry fields."""
-    device = build_device_details(
-        id="device-7",
-        inverter_sn="INV-777",
-        product_type="Battery Inverter",
-        firmware_version="3.1.4",
-    )
-
-    inverter = LivoltekInverterDevice(api=object(), device=device, hass=hass)
-    device_info = inverter.device_info
-
-    assert device_info["identifiers"] == {("livoltek", "device-7")}
-    assert device_info["model"] == "Battery Inverter"
-    assert device_info["sw_version"] == "3.1.4"
+    coordinator.async_shutdown.assert_awaited_once()
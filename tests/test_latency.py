@@ -0,0 +1,38 @@
+"""Tests for the per-endpoint latency tracking."""
+from __future__ import annotations
+
+from custom_components.livoltek.const import (
+    API_REQUEST_TIMEOUT,
+    LATENCY_MIN_SAMPLES,
+    LATENCY_SAMPLES,
+    MIN_REQUEST_TIMEOUT,
+)
+from custom_components.livoltek.latency import LatencyTracker
+
+
+def test_fixed_timeout_applies_until_enough_requests_were_timed() -> None:
+    """Without enough samples neither percentiles nor hedging are available."""
+    tracker = LatencyTracker()
+    for _ in range(LATENCY_MIN_SAMPLES - 1):
+        tracker.add(0.5)
+
+    assert tracker.timeout() == API_REQUEST_TIMEOUT
+    assert tracker.hedge_delay() is None
+
+
+def test_timeout_follows_the_p99_within_bounds() -> None:
+    """The timeout is a multiple of the p99, kept between the floor and the cap."""
+    tracker = LatencyTracker()
+    for duration in range(1, 21):
+        tracker.add(duration / 20)
+
+    assert tracker.percentile(95) == 0.95
+    assert tracker.hedge_delay() == 0.95
+    assert tracker.timeout() == MIN_REQUEST_TIMEOUT
+
+    for _ in range(LATENCY_SAMPLES):
+        tracker.add(3.0)
+    assert tracker.timeout() == 9.0
+
+    tracker.add(API_REQUEST_TIMEOUT)
+    assert tracker.timeout() == API_REQUEST_TIMEOUT
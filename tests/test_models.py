@@ -0,0 +1,149 @@
+"""Tests for the normalized Livoltek payload models."""
+from __future__ import annotations
+
+import datetime as dt
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.livoltek.models import (
+    DAILY_BUFFER_DAYS,
+    DailyEnergy,
+    DailyEnergyBuffer,
+    EnergyStorageIndex,
+    LivoltekSnapshot,
+    PowerFlow,
+    parse_float,
+)
+
+from .common import build_energy_storage, midday_timestamp_ms
+
+
+def _local_day(timestamp_ms: int) -> dt.date:
+    """Return the local date of a millisecond timestamp."""
+    return dt_util.as_local(dt_util.utc_from_timestamp(timestamp_ms / 1000)).date()
+
+
+def test_parse_float_treats_blank_and_unknown_as_missing() -> None:
+    """Placeholder strings from the API should not become numbers."""
+    assert parse_float("12.5") == 12.5
+    assert parse_float("") is None
+    assert parse_float("Unknown") is None
+    assert parse_float(None) is None
+
+
+def test_energy_storage_index_sorts_history_once() -> None:
+    """Items of historyMap should be flattened into time-ordered arrays."""
+    yesterday = dt_util.now().date() - dt.timedelta(days=1)
+    today = yesterday + dt.timedelta(days=1)
+    noon_yesterday = midday_timestamp_ms(yesterday)
+    noon_today = midday_timestamp_ms(today)
+    payload = {
+        "currentSoc": "",
+        "historyMap": {
+            str(noon_today): [
+                {"time": noon_today + 60_000, "energySoc": "Unknown", "charge": "2.5"},
+                {"time": noon_today, "energySoc": "61", "energyPower": "-1.5"},
+            ],
+            str(noon_yesterday): [
+                {"energySoc": "40", "energyVolage": "51.2", "charge": "4", "discharge": "3"},
+            ],
+        },
+    }
+
+    index = EnergyStorageIndex.from_payload(payload)
+
+    assert index.times == (noon_yesterday, noon_today, noon_today + 60_000)
+    assert index.soc == (40.0, 61.0, None)
+    assert index.power == (None, -1.5, None)
+    assert index.voltage == (51.2, None, None)
+    assert index.latest.time == noon_today + 60_000
+    assert index.battery_soc == 61.0
+    assert index.days[_local_day(noon_yesterday)].discharge == 3.0
+    assert index.days[_local_day(noon_today)].charge == 2.5
+
+
+def test_energy_storage_index_groups_days_in_site_timezone() -> None:
+    """Battery totals should be keyed by the site's date, not the server's."""
+    sydney = dt.timezone(dt.timedelta(hours=10))
+    # 20:00 UTC on 30 April is already 1 May in Sydney.
+    late = int(dt.datetime(2024, 4, 30, 20, tzinfo=dt.UTC).timestamp() * 1000)
+    payload = {"historyMap": {str(late): [{"charge": "2.5", "discharge": "1"}]}}
+
+    index = EnergyStorageIndex.from_payload(payload, sydney)
+
+    assert list(index.days) == [dt.date(2024, 5, 1)]
+    assert index.days[dt.date(2024, 5, 1)].charge == 2.5
+
+
+def test_energy_storage_index_prefers_reported_soc() -> None:
+    """The reported current SOC should win over the history."""
+    index = EnergyStorageIndex.from_payload(build_energy_storage(current_soc=88.5))
+
+    assert index.battery_soc == 88.5
+    assert index.latest is None
+    assert EnergyStorageIndex.from_payload(None) is None
+
+
+def test_power_flow_converts_api_strings() -> None:
+    """Fields of curPowerflow should be converted to numbers once."""
+    power_flow = PowerFlow.from_payload(
+        {"pvPower": "3.4", "powerGridPower": "-0.8", "energySoc": "", "timestamp": 1000}
+    )
+
+    assert power_flow.pv_power == 3.4
+    assert power_flow.power_grid_power == -0.8
+    assert power_flow.energy_soc is None
+    assert power_flow.timestamp == 1000
+    assert power_flow == PowerFlow.from_payload(
+        {"pvPower": 3.4, "powerGridPower": -0.8, "timestamp": "1000"}
+    )
+
+
+def test_daily_energy_buffer_indexes_days_in_site_timezone() -> None:
+    """Rows should be keyed by the site's date, not the server's."""
+    sydney = dt.timezone(dt.timedelta(hours=10))
+    # 20:00 UTC on 30 April is already 1 May in Sydney.
+    late = int(dt.datetime(2024, 4, 30, 20, tzinfo=dt.UTC).timestamp() * 1000)
+    grid = [
+        {"ts": str(late - 86_400_000), "positive": "1.1", "negative": "0.2"},
+        {"ts": str(late), "positive": "4.0", "negative": "1.0"},
+        {"ts": str(late + 60_000), "positive": "4.6", "negative": "1.4"},
+        {"positive": "9"},
+    ]
+    solar = [{"ts": str(late), "powerGeneration": "8.9"}]
+
+    daily = DailyEnergyBuffer.from_rows(grid, solar, dt.date(2024, 5, 1), sydney)
+
+    assert daily.today == DailyEnergy(
+        grid_import=4.6, grid_export=1.4, solar_generation=8.9
+    )
+    assert daily.yesterday == DailyEnergy(grid_import=1.1, grid_export=0.2)
+    assert [day for day, _ in daily.last(3)] == [
+        dt.date(2024, 4, 29),
+        dt.date(2024, 4, 30),
+        dt.date(2024, 5, 1),
+    ]
+    assert DailyEnergyBuffer.from_rows(None, None, dt.date(2024, 5, 1), sydney).today == (
+        DailyEnergy()
+    )
+
+
+def test_daily_energy_buffer_rollover_resets_today() -> None:
+    """A new day without a row should read as empty and drop old days."""
+    first = dt.date(2024, 5, 1)
+    daily = DailyEnergyBuffer(first, {first: DailyEnergy(grid_import=4.6)})
+
+    rolled = daily.rollover(first + dt.timedelta(days=1))
+    assert rolled.today == DailyEnergy()
+    assert rolled.yesterday == DailyEnergy(grid_import=4.6)
+
+    later = daily.rollover(first + dt.timedelta(days=DAILY_BUFFER_DAYS))
+    assert later.days == {}
+
+
+def test_snapshot_battery_soc_falls_back_to_power_flow() -> None:
+    """The snapshot SOC should come from curPowerflow without /ESS data."""
+    snapshot = LivoltekSnapshot(power_flow=PowerFlow(energy_soc=64.5))
+
+    assert snapshot.battery_soc == 64.5
+    assert LivoltekSnapshot().battery_soc is None
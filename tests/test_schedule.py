@@ -0,0 +1,132 @@
+"""Tests for the per-endpoint refresh schedules."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from custom_components.livoltek.const import ENDPOINT_POWER_FLOW, SCAN_INTERVAL
+from custom_components.livoltek.schedule import (
+    DEFAULT_ENDPOINT_POLICIES,
+    DUE_TOLERANCE,
+    MAX_POLL_DELAY,
+    MIN_POLL_DELAY,
+    RETRY_DELAY,
+    UPLOAD_GRACE,
+    EndpointPolicy,
+    EndpointState,
+    UploadCadence,
+)
+
+
+def test_default_policies_keep_power_flow_on_the_fastest_tier() -> None:
+    """Live power flow should refresh at least as often as any other endpoint."""
+    power_flow = DEFAULT_ENDPOINT_POLICIES[ENDPOINT_POWER_FLOW]
+
+    assert power_flow.interval == SCAN_INTERVAL
+    assert all(
+        policy.interval >= power_flow.interval
+        for policy in DEFAULT_ENDPOINT_POLICIES.values()
+    )
+    assert all(
+        policy.max_age >= policy.interval
+        for policy in DEFAULT_ENDPOINT_POLICIES.values()
+    )
+
+
+def test_endpoint_state_schedules_next_fetch_from_interval() -> None:
+    """Recording a result should push the next fetch out by one interval."""
+    state = EndpointState(
+        EndpointPolicy(interval=timedelta(minutes=5), max_age=timedelta(minutes=30))
+    )
+    assert state.is_due(0)
+
+    state.record({"soc": 50}, now=100)
+
+    assert not state.is_due(200)
+    assert state.is_due(400 - DUE_TOLERANCE)
+    assert state.data == {"soc": 50}
+
+
+def test_endpoint_state_expires_after_max_age() -> None:
+    """Results older than the staleness budget should be discarded."""
+    state = EndpointState(
+        EndpointPolicy(interval=timedelta(minutes=5), max_age=timedelta(minutes=30))
+    )
+    state.record({"soc": 50}, now=0)
+
+    state.expire(now=1800)
+    assert state.data == {"soc": 50}
+
+    state.expire(now=1801)
+    assert state.data is None
+
+
+def test_endpoint_state_keeps_data_and_retries_after_failure() -> None:
+    """A failed fetch should keep the last result and retry before the interval."""
+    state = EndpointState(
+        EndpointPolicy(interval=timedelta(minutes=5), max_age=timedelta(minutes=30))
+    )
+    state.record({"soc": 50}, now=0)
+
+    state.record_failure(TimeoutError(), now=300)
+
+    assert state.data == {"soc": 50}
+    assert state.error == "TimeoutError"
+    assert state.failures == 1
+    assert state.next_due == 300 + RETRY_DELAY
+    assert state.age(360) == 360
+
+    state.record({"soc": 51}, now=360)
+    assert state.error is None
+    assert state.failures == 0
+
+
+def test_upload_cadence_uses_default_until_learned() -> None:
+    """Without two distinct uploads there is nothing to align to."""
+    cadence = UploadCadence()
+    assert cadence.next_delay(now=1000, default=150) == 150
+
+    assert cadence.observe(1000)
+    assert cadence.cadence is None
+    assert cadence.next_delay(now=1010, default=150) == 150
+
+
+def test_upload_cadence_polls_just_after_expected_upload() -> None:
+    """The next poll should land a grace period after the next upload."""
+    cadence = UploadCadence()
+    for upload in (0, 300, 600, 1200, 1500):
+        cadence.observe(upload)
+
+    assert cadence.cadence == 300
+    assert cadence.next_delay(now=1540, default=150) == 1800 + UPLOAD_GRACE - 1540
+    assert cadence.next_delay(now=1820, default=150) == MIN_POLL_DELAY
+
+
+def test_upload_cadence_backs_off_while_data_is_not_advancing() -> None:
+    """Polls that find the same upload should wait longer each time."""
+    cadence = UploadCadence()
+    cadence.observe(0)
+    cadence.observe(600)
+
+    assert not cadence.observe(600)
+    first = cadence.next_delay(now=1300, default=150)
+    assert not cadence.observe(600)
+    second = cadence.next_delay(now=1400, default=150)
+    for _ in range(5):
+        cadence.observe(600)
+
+    assert first == UPLOAD_GRACE * 2
+    assert second == UPLOAD_GRACE * 4
+    assert cadence.next_delay(now=2000, default=150) == MAX_POLL_DELAY
+
+    assert cadence.observe(1250)
+    assert cadence.stale_polls == 0
+
+
+def test_upload_cadence_ignores_unpolled_repeats() -> None:
+    """Timestamps seen on other endpoints should not count as stale polls."""
+    cadence = UploadCadence()
+    cadence.observe(600)
+
+    assert not cadence.observe(600, polled=False)
+    assert not cadence.observe(None)
+    assert cadence.stale_polls == 0
@@ -1,24 +1,53 @@
 """Tests for Livoltek sensor entities."""
 from __future__ import annotations
 
+import datetime as dt
 from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 
-from custom_components.livoltek.const import DOMAIN
-from custom_components.livoltek.sensor import async_setup_entry
+from homeassistant.const import EntityCategory
 
-from .common import build_energy_storage, build_power_flow
+from custom_components.livoltek.const import (
+    DOMAIN,
+    ENDPOINT_DEVICES,
+    ENDPOINT_POWER_FLOW,
+)
+from custom_components.livoltek.coordinator import LivoltekDataUpdateCoordinator
+from custom_components.livoltek.metrics import EndpointMetrics
+from custom_components.livoltek.models import (
+    DeviceGeneration,
+    EnergyStorageIndex,
+    LivoltekSnapshot,
+    PowerFlow,
+)
+from custom_components.livoltek.sensor import (
+    METRIC_SENSORS,
+    SENSORS,
+    LivoltekMetricSensor,
+    LivoltekValueSensor,
+    async_setup_entry,
+)
+
+from .common import build_daily_energy, build_energy_storage, build_power_flow
 
 
 @pytest.mark.asyncio
 async def test_async_setup_entry_adds_all_enabled_sensors(hass, livoltek_entry) -> None:
     """Sensor setup should expose power and daily energy entities when data is present."""
     coordinator = SimpleNamespace(
-        current_power_flow=build_power_flow(),
-        energy_storage=build_energy_storage(),
-        todays_grid={"positive": "4.6", "negative": "1.4"},
-        todays_solar={"powerGeneration": "8.9"},
+        site={"name": "Home Site"},
+        metrics={},
+        devices=[],
+        async_add_listener=Mock(),
+        data=LivoltekSnapshot(
+            power_flow=PowerFlow.from_payload(build_power_flow()),
+            energy_storage=EnergyStorageIndex.from_payload(build_energy_storage()),
+            daily=build_daily_energy(
+                grid_import=4.6, grid_export=1.4, solar_generation=8.9
+            ),
+        ),
     )
     hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
     entities = []
@@ -31,6 +60,7 @@ async def test_async_setup_entry_adds_all_enabled_sensors(hass, livoltek_entry)
     assert entity_map["grid_import_energy"].native_value == 4.6
     assert entity_map["solar_generation_energy"].native_value == 8.9
     assert entity_map["battery_soc"].unique_id == "site-123-battery_soc"
+    assert entity_map["battery_soc"].device_info["name"] == "Home Site"
 
 
 @pytest.mark.asyncio
@@ -39,10 +69,17 @@ async def test_battery_soc_falls_back_to_power_flow_when_ess_unavailable(
 ) -> None:
     """battery_soc should fall back to curPowerflow.energy_soc when /ESS data is absent."""
     coordinator = SimpleNamespace(
-        current_power_flow=build_power_flow(),
-        energy_storage=None,
-        todays_grid={"positive": "4.6", "negative": "1.4"},
-        todays_solar={"powerGeneration": "8.9"},
+        site={"name": "Home Site"},
+        metrics={},
+        devices=[],
+        async_add_listener=Mock(),
+        data=LivoltekSnapshot(
+            power_flow=PowerFlow.from_payload(build_power_flow()),
+            energy_storage=EnergyStorageIndex.from_payload(None),
+            daily=build_daily_energy(
+                grid_import=4.6, grid_export=1.4, solar_generation=8.9
+            ),
+        ),
     )
     hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
     entities = []
@@ -59,10 +96,17 @@ async def test_battery_soc_uses_ess_current_soc_over_power_flow(
 ) -> None:
     """battery_soc should prefer /ESS current_soc over curPowerflow.energy_soc."""
     coordinator = SimpleNamespace(
-        current_power_flow=build_power_flow(energy_soc=50.0),
-        energy_storage=build_energy_storage(current_soc=88.5),
-        todays_grid={"positive": "4.6", "negative": "1.4"},
-        todays_solar={"powerGeneration": "8.9"},
+        site={"name": "Home Site"},
+        metrics={},
+        devices=[],
+        async_add_listener=Mock(),
+        data=LivoltekSnapshot(
+            power_flow=PowerFlow.from_payload(build_power_flow(energy_soc=50.0)),
+            energy_storage=EnergyStorageIndex.from_payload(build_energy_storage(current_soc=88.5)),
+            daily=build_daily_energy(
+                grid_import=4.6, grid_export=1.4, solar_generation=8.9
+            ),
+        ),
     )
     hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
     entities = []
@@ -80,10 +124,17 @@ async def test_async_setup_entry_skips_daily_energy_sensors_without_values(
 ) -> None:
     """Sensor setup should only add entities whose enable predicates pass."""
     coordinator = SimpleNamespace(
-        current_power_flow=build_power_flow(),
-        energy_storage=None,
-        todays_grid={"positive": None, "negative": None},
-        todays_solar={"powerGeneration": None},
+        site={"name": "Home Site"},
+        metrics={},
+        devices=[],
+        async_add_listener=Mock(),
+        data=LivoltekSnapshot(
+            power_flow=PowerFlow.from_payload(build_power_flow()),
+            energy_storage=EnergyStorageIndex.from_payload(None),
+            daily=build_daily_energy(
+                grid_import=None, grid_export=None, solar_generation=None
+            ),
+        ),
     )
     hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
     entities = []
@@ -97,3 +148,182 @@ async def test_async_setup_entry_skips_daily_energy_sensors_without_values(
         "load_power",
         "energy_power",
     }
+
+
+@pytest.mark.asyncio
+async def test_unchanged_values_do_not_write_state(hass, livoltek_entry) -> None:
+    """Coordinator updates that leave a value as it was should be suppressed."""
+    coordinator = SimpleNamespace(
+        site={"name": "Home Site"},
+        last_update_success=True,
+        suppressed_writes=0,
+        data=LivoltekSnapshot(power_flow=PowerFlow(pv_power=3.4, load_power=1.0)),
+    )
+    sensor = LivoltekValueSensor(
+        coordinator,
+        "site-123",
+        next(d for d in SENSORS if d.key == "pv_power"),
+    )
+    sensor.hass = hass
+    sensor.async_write_ha_state = Mock()
+
+    coordinator.data = LivoltekSnapshot(power_flow=PowerFlow(pv_power=3.4, load_power=2.0))
+    sensor._handle_coordinator_update()
+    sensor.async_write_ha_state.assert_called_once()
+
+    coordinator.data = LivoltekSnapshot(power_flow=PowerFlow(pv_power=3.4, load_power=3.0))
+    sensor._handle_coordinator_update()
+    sensor.async_write_ha_state.assert_called_once()
+    assert coordinator.suppressed_writes == 1
+
+    coordinator.last_update_success = False
+    sensor._handle_coordinator_update()
+    assert sensor.async_write_ha_state.call_count == 2
+
+
+def test_restored_values_are_flagged() -> None:
+    """Values from before a restart carry the integration's own attribute."""
+    coordinator = SimpleNamespace(
+        site=None,
+        data=LivoltekSnapshot(power_flow=PowerFlow(pv_power=3.4), restored=True),
+    )
+    sensor = LivoltekValueSensor(
+        coordinator,
+        "site-123",
+        next(d for d in SENSORS if d.key == "pv_power"),
+    )
+    assert sensor.extra_state_attributes == {"restored_snapshot": True}
+
+    coordinator.data = LivoltekSnapshot(power_flow=PowerFlow(pv_power=3.4))
+    assert sensor.extra_state_attributes is None
+
+
+@pytest.mark.asyncio
+async def test_async_setup_entry_adds_lifetime_sensors_per_inverter(
+    hass, livoltek_entry
+) -> None:
+    """Every inverter in the device list should get its own lifetime energy sensors."""
+    coordinator = SimpleNamespace(
+        site={"name": "Home Site"},
+        metrics={},
+        devices=[
+            {"id": "7", "inverterSn": "INV-001"},
+            {"id": "8", "inverterSn": "INV-002"},
+        ],
+        async_add_listener=Mock(),
+        data=LivoltekSnapshot(
+            generation={"INV-001": DeviceGeneration("7", 812.5, 640.1, timestamp=1)}
+        ),
+    )
+    hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
+    entities = []
+
+    await async_setup_entry(hass, livoltek_entry, entities.extend)
+
+    entity_map = {entity.unique_id: entity for entity in entities}
+    assert set(entity_map) == {
+        "INV-001-pv_produce_electric",
+        "INV-001-load_customer_electric",
+        "INV-002-pv_produce_electric",
+        "INV-002-load_customer_electric",
+    }
+    sensor = entity_map["INV-001-pv_produce_electric"]
+    assert sensor.native_value == 812.5
+    assert sensor.state_class == "total_increasing"
+    assert sensor.device_info["identifiers"] == {(DOMAIN, "7")}
+    assert entity_map["INV-002-pv_produce_electric"].native_value is None
+    assert entity_map["INV-002-pv_produce_electric"].device_info["identifiers"] == {
+        (DOMAIN, "8")
+    }
+
+    # A later refresh that lists a new inverter adds only its sensors.
+    coordinator.devices = [*coordinator.devices, {"id": "9", "inverterSn": "INV-003"}]
+    entities.clear()
+    coordinator.async_add_listener.call_args.args[0]()
+    assert {entity.unique_id for entity in entities} == {
+        "INV-003-pv_produce_electric",
+        "INV-003-load_customer_electric",
+    }
+
+
+@pytest.mark.asyncio
+async def test_async_setup_entry_adds_disabled_metric_sensors_per_endpoint(
+    hass, livoltek_entry
+) -> None:
+    """Every endpoint should get request metric sensors that start disabled."""
+    metrics = EndpointMetrics()
+    metrics.record(0.8, 1200, None, dt.datetime(2024, 5, 1, tzinfo=dt.UTC))
+    metrics.record(20.5, 0, TimeoutError(), dt.datetime(2024, 5, 1, tzinfo=dt.UTC))
+    coordinator = SimpleNamespace(
+        site={"name": "Home Site"},
+        metrics={ENDPOINT_POWER_FLOW: metrics},
+        devices=[],
+        async_add_listener=Mock(),
+        data=LivoltekSnapshot(),
+    )
+    hass.data[DOMAIN] = {livoltek_entry.entry_id: coordinator}
+    entities = []
+
+    await async_setup_entry(hass, livoltek_entry, entities.extend)
+
+    entity_map = {entity.unique_id: entity for entity in entities}
+    assert set(entity_map) == {
+        f"site-123-power_flow-{description.key}" for description in METRIC_SENSORS
+    }
+    assert all(
+        not entity.entity_registry_enabled_default
+        and entity.entity_category == EntityCategory.DIAGNOSTIC
+        for entity in entities
+    )
+    assert entity_map["site-123-power_flow-requests"].native_value == 2
+    errors = entity_map["site-123-power_flow-errors"]
+    assert errors.native_value == 1
+    assert errors.extra_state_attributes == {"TimeoutError": 1}
+    latency = entity_map["site-123-power_flow-latency"]
+    assert latency.native_value == 20.5
+    assert latency.extra_state_attributes["<=1s"] == 1
+    assert latency.extra_state_attributes[">20s"] == 1
+    assert entity_map["site-123-power_flow-response_size"].native_value == 0
+    assert latency.translation_placeholders == {"endpoint": "Power Flow"}
+
+
+@pytest.mark.asyncio
+async def test_metric_sensors_update_when_the_data_is_unchanged(
+    hass, livoltek_entry, monkeypatch
+) -> None:
+    """Request metrics change on every refresh, even with an equal snapshot."""
+    coordinator = LivoltekDataUpdateCoordinator(hass, livoltek_entry)
+    for name in (
+        "async_get_site",
+        "async_get_device_list",
+        "async_get_cur_power_flow",
+        "async_get_energy_storage",
+        "async_get_recent_grid",
+        "async_get_recent_solar",
+    ):
+        monkeypatch.setattr(
+            f"custom_components.livoltek.coordinator.{name}",
+            AsyncMock(return_value=[{"inverterSn": "INV-001"}]),
+        )
+    now = 0.0
+    monkeypatch.setattr(
+        "custom_components.livoltek.coordinator.monotonic", lambda: now
+    )
+    sensor = LivoltekMetricSensor(
+        coordinator,
+        "site-123",
+        ENDPOINT_DEVICES,
+        next(d for d in METRIC_SENSORS if d.key == "requests"),
+    )
+    sensor.hass = hass
+    sensor.async_write_ha_state = Mock()
+    await sensor.async_added_to_hass()
+
+    await coordinator.async_refresh()
+    now = 86400.0
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert sensor.async_write_ha_state.call_count == 2
+    assert sensor.native_value == 2
+    await coordinator.async_shutdown()
@@ -0,0 +1,271 @@
+"""Tests for the long-term statistics import."""
+from __future__ import annotations
+
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.livoltek import statistics
+from custom_components.livoltek.models import (
+    DailyEnergy,
+    DailyEnergyBuffer,
+    EnergyStorageIndex,
+)
+from custom_components.livoltek.statistics import (
+    STATISTICS_BATCH_SIZE,
+    LivoltekStatistics,
+    daily_values,
+    hourly_statistics,
+    reconcile_rows,
+    statistic_id,
+)
+
+HOUR = 3_600_000
+START = int(dt.datetime(2024, 5, 1, tzinfo=dt.UTC).timestamp() * 1000)
+
+
+def _index(hours: int, samples_per_hour: int = 2) -> EnergyStorageIndex:
+    """Build an /ESS index with evenly spaced samples."""
+    step = HOUR // samples_per_hour
+    history = {
+        str(START + i * step): {
+            "energyPower": "1.5",
+            "energySoc": str(i),
+            "energyVolage": "52",
+        }
+        for i in range(hours * samples_per_hour)
+    }
+    return EnergyStorageIndex.from_payload({"historyMap": history})
+
+
+def test_statistic_id_is_a_valid_external_id() -> None:
+    """Site IDs are slugified into the object part of the statistic ID."""
+    assert statistic_id("Site-123", "battery_soc") == "livoltek:site_123_battery_soc"
+
+
+def test_hourly_statistics_aggregate_samples_within_bounds() -> None:
+    """Samples should be grouped per hour and limited to the requested window."""
+    times = [START, START + HOUR // 2, START + HOUR, START + 2 * HOUR]
+    rows = hourly_statistics(times, [10.0, 20.0, None, 40.0], START, START + 2 * HOUR)
+
+    assert rows == [
+        {
+            "start": dt.datetime(2024, 5, 1, tzinfo=dt.UTC),
+            "mean": 15.0,
+            "min": 10.0,
+            "max": 20.0,
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_energy_storage_import_is_batched_and_incremental(
+    hass, monkeypatch
+) -> None:
+    """Each import should only write hours completed since the watermark."""
+    writes: list[tuple[str, list]] = []
+    monkeypatch.setattr(
+        statistics,
+        "async_add_external_statistics",
+        lambda hass, metadata, rows: writes.append((metadata["statistic_id"], rows)),
+    )
+    importer = LivoltekStatistics(hass, "entry-123", "site-123")
+    index = _index(hours=STATISTICS_BATCH_SIZE + 3)
+    now = dt.datetime.fromtimestamp(
+        (START + (STATISTICS_BATCH_SIZE + 2) * HOUR) / 1000, dt.UTC
+    ) + dt.timedelta(minutes=10)
+
+    assert await importer.async_import_energy_storage(index, now) == (
+        STATISTICS_BATCH_SIZE + 2
+    )
+    soc_writes = [rows for key, rows in writes if key.endswith("battery_soc")]
+    assert [len(rows) for rows in soc_writes] == [STATISTICS_BATCH_SIZE, 2]
+    assert soc_writes[0][0]["mean"] == 0.5
+    assert len(writes) == 6
+
+    writes.clear()
+    assert await importer.async_import_energy_storage(index, now) == 0
+    assert writes == []
+
+    later = now + dt.timedelta(hours=1)
+    assert await importer.async_import_energy_storage(index, later) == 1
+    assert {key for key, _ in writes} == {
+        "livoltek:site_123_battery_soc",
+        "livoltek:site_123_battery_power",
+        "livoltek:site_123_battery_voltage",
+    }
+
+    reloaded = LivoltekStatistics(hass, "entry-123", "site-123")
+    reloaded._store = importer._store
+    await importer._store.async_save(importer.watermarks)
+    await reloaded.async_load()
+    assert reloaded.watermarks == importer.watermarks
+
+
+def _day(day: int) -> dt.datetime:
+    """Return the statistics start of a local day in May 2024."""
+    return dt.datetime(2024, 5, day, tzinfo=dt.UTC)
+
+
+def test_daily_values_start_at_the_site_midnight() -> None:
+    """Days should start at the site's midnight and skip missing values."""
+    daily = DailyEnergyBuffer(
+        dt.date(2024, 5, 3),
+        {
+            dt.date(2024, 5, 3): DailyEnergy(grid_import=1.25),
+            dt.date(2024, 5, 1): DailyEnergy(grid_import=3.5),
+            dt.date(2024, 5, 2): DailyEnergy(grid_export=2.0),
+        },
+    )
+    sydney = dt.timezone(dt.timedelta(hours=10))
+
+    assert daily_values(daily, "grid_import", sydney) == [
+        (_day(1) - dt.timedelta(hours=10), 3.5),
+        (_day(3) - dt.timedelta(hours=10), 1.25),
+    ]
+
+
+def test_reconcile_rows_only_returns_missing_or_changed_days() -> None:
+    """Matching days are skipped; a revised day rewrites the sums after it."""
+    existing = [
+        {"start": _day(1).timestamp() - 86400, "state": 4.0, "sum": 100.0},
+        {"start": _day(1).timestamp(), "state": 3.0, "sum": 103.0},
+        {"start": _day(2).timestamp(), "state": 2.0, "sum": 105.0},
+        {"start": _day(3).timestamp(), "state": 1.0, "sum": 106.0},
+    ]
+
+    assert reconcile_rows([(_day(1), 3.0), (_day(2), 2.0)], existing) == []
+
+    rows = reconcile_rows(
+        [(_day(1), 3.0), (_day(2), 2.5), (_day(3), 1.0), (_day(4), 0.5)], existing
+    )
+    assert rows == [
+        {"start": _day(2), "state": 2.5, "sum": 105.5},
+        {"start": _day(3), "state": 1.0, "sum": 106.5},
+        {"start": _day(4), "state": 0.5, "sum": 107.0},
+    ]
+
+
+def _rows_between(stored, start, end, ids):
+    """Return the stored rows of ``ids`` from ``start`` up to ``end``."""
+    return {
+        statistic: selected
+        for statistic in ids
+        if (
+            selected := [
+                row
+                for row in stored.get(statistic, [])
+                if start.timestamp() <= row["start"]
+                and (end is None or row["start"] < end.timestamp())
+            ]
+        )
+    }
+
+
+@pytest.mark.asyncio
+async def test_daily_energy_reconciliation_writes_only_changes(
+    hass, monkeypatch
+) -> None:
+    """Stored statistics are read once and only differing rows are written."""
+    writes: list[tuple[dict, list]] = []
+    monkeypatch.setattr(
+        statistics,
+        "async_add_external_statistics",
+        lambda hass, metadata, rows: writes.append((metadata, rows)),
+    )
+    stored = {
+        "livoltek:site_123_grid_import_energy": [
+            {"start": _day(1).timestamp(), "state": 3.0, "sum": 3.0}
+        ],
+        "livoltek:site_123_solar_generation_energy": [
+            {"start": _day(1).timestamp(), "state": 8.0, "sum": 8.0}
+        ],
+    }
+    queries = []
+
+    def _during_period(hass, start, end, ids, period, units, types):
+        queries.append((start, end, ids, period))
+        return _rows_between(stored, start, end, ids)
+
+    async def _run(func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(statistics, "statistics_during_period", _during_period)
+    monkeypatch.setattr(
+        statistics,
+        "get_instance",
+        lambda hass: SimpleNamespace(async_add_executor_job=_run),
+    )
+    importer = LivoltekStatistics(hass, "entry-123", "site-123")
+    daily = DailyEnergyBuffer(
+        dt.date(2024, 5, 1),
+        {
+            dt.date(2024, 5, 1): DailyEnergy(
+                grid_import=3.0, grid_export=1.0, solar_generation=8.5
+            )
+        },
+    )
+
+    written = await importer.async_reconcile_daily_energy(daily, dt.UTC)
+
+    assert written == 2
+    ids = {
+        "livoltek:site_123_grid_import_energy",
+        "livoltek:site_123_grid_export_energy",
+        "livoltek:site_123_solar_generation_energy",
+    }
+    assert queries == [
+        (_day(1) - statistics.RECONCILE_LOOKBACK, None, ids, "hour"),
+        (dt.datetime(1970, 1, 1, tzinfo=dt.UTC), _day(1), ids, "hour"),
+    ]
+    by_id = {metadata["statistic_id"]: (metadata, rows) for metadata, rows in writes}
+    assert set(by_id) == {
+        "livoltek:site_123_grid_export_energy",
+        "livoltek:site_123_solar_generation_energy",
+    }
+    metadata, rows = by_id["livoltek:site_123_solar_generation_energy"]
+    assert metadata["has_sum"] and not metadata["has_mean"]
+    assert metadata["unit_of_measurement"] == "kWh"
+    assert rows == [{"start": _day(1), "state": 8.5, "sum": 8.5}]
+
+
+@pytest.mark.asyncio
+async def test_daily_energy_reconciliation_continues_the_sum_after_a_long_gap(
+    hass, monkeypatch
+) -> None:
+    """A sum last stored before the lookback window is still continued."""
+    writes: list[tuple[dict, list]] = []
+    monkeypatch.setattr(
+        statistics,
+        "async_add_external_statistics",
+        lambda hass, metadata, rows: writes.append((metadata, rows)),
+    )
+    long_ago = _day(1) - statistics.RECONCILE_LOOKBACK - dt.timedelta(days=30)
+    stored = {
+        "livoltek:site_123_grid_import_energy": [
+            {"start": long_ago.timestamp() - 86400, "state": 2.0, "sum": 498.0},
+            {"start": long_ago.timestamp(), "state": 2.0, "sum": 500.0},
+        ]
+    }
+
+    async def _run(func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(
+        statistics,
+        "statistics_during_period",
+        lambda hass, start, end, ids, *args: _rows_between(stored, start, end, ids),
+    )
+    monkeypatch.setattr(
+        statistics,
+        "get_instance",
+        lambda hass: SimpleNamespace(async_add_executor_job=_run),
+    )
+    importer = LivoltekStatistics(hass, "entry-123", "site-123")
+    daily = DailyEnergyBuffer(
+        dt.date(2024, 5, 1), {dt.date(2024, 5, 1): DailyEnergy(grid_import=3.0)}
+    )
+
+    assert await importer.async_reconcile_daily_energy(daily, dt.UTC) == 1
+    assert writes[0][1] == [{"start": _day(1), "state": 3.0, "sum": 503.0}]